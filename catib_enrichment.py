@@ -1,87 +1,97 @@
 """Converts the POS tags and DEPREL labels to their Arabic equivalent.
 
 Usage:
-    catib_enrichment (-i <input> | --input=<input>)
+    catib_enrichment (-i <input> | --input=<input> | --manifest=<manifest>)
+        [-r | --recursive] [--include=<glob>]... [--exclude=<glob>]...
         (-o <output> | --output=<output>)
         [-m <map_version> | --map_version=<map_version>]
+        [-j <jobs> | --jobs=<jobs>]
+        [--shards=<shards>]
+        [--compress=<format>]
     catib_enrichment (-h | --help)
 
 Options:
     -i <input> --input=<input>
         A CoNLL-U/X file or a directory containing CoNLL-U/X files
+    --manifest=<manifest>
+        A file listing the CoNLL-U/X files to process, one path per line
+        (relative paths are relative to the manifest's directory); used instead of --input
+    -r --recursive
+        Also process the CoNLL-U/X files in subdirectories of the input directory
+    --include=<glob>
+        Only process files whose name or relative path matches this pattern (can be repeated)
+    --exclude=<glob>
+        Skip files and subdirectories whose name or relative path matches this pattern (can be repeated)
     -o <output> --output=<output>
         The directory to fixed CoNLL files
     -m <map_version> --map_version=<map_version>
         tsv file containing POS and DEPREL mappings [default: 5]
+    -j <jobs> --jobs=<jobs>
+        Number of files to process in parallel; 0 uses one process per CPU core [default: 1]
+    --shards=<shards>
+        Split each file at sentence boundaries into this many parts, processed as separate jobs
+        (use with --jobs for single large files; parts are always read one sentence at a time) [default: 1]
+    --compress=<format>
+        Compress the output files with gz, bz2, xz, or zst (zst requires the zstandard package)
     -h --help
         Show this screen.
 """
 from pathlib import Path
 import sys
-import pandas as pd
 from docopt import docopt
 
-from conllx_df.conllx_df import ConllxDf
-from utils.dir_utils import get_conll_files
-from catib_enrichment.tree_functions import add_order, add_parent_details, get_token_details
-from catib_enrichment.mapper import get_catib_plus, update_tree
+from utils.conll_io import write_conll_sentences
+from utils.conll_shards import FileShard, concatenate_parts, get_file_shards, get_part_path, get_shard_count, group_shard_results, remove_parts
+from utils.dir_utils import get_input_files, get_mirrored_input_dir, get_output_dir
+from utils.file_compression import get_compression_format_suffix, remove_compression_suffix
+from utils.parallel import exit_if_failed, get_jobs, report_error, run_file_jobs
+from catib_enrichment.enrichment import enrich_sentences, get_map_df
 
 arguments = docopt(__doc__)
 
-def get_new_token_tag_and_label(token_details, sen_df, map_df, print_all_possibilities):
-    try:
-        if token_details.lex == 'ROOT':
-            return '', ''
-    except:
-        import pdb; pdb.set_trace()
-    # parent details and order required before getting catib plus feature values
-    add_parent_details(sen_df, token_details)
-    add_order(token_details)
+# set up once per process by init_map_df
+map_df = None
 
-    return get_catib_plus(token_details, map_df, 'POS', print_all_possibilities), get_catib_plus(token_details, map_df, 'REL', print_all_possibilities)
+def init_map_df(map_version: str):
+    global map_df
+    map_df = get_map_df(map_version)
 
-def get_new_tree_tags_and_labels(sen_df, map_df, print_all_possibilities=False):
-    new_values = []
-    # tokens
-    for _, row in sen_df.iterrows():
-        # token details
-        token_details = get_token_details(sen_df, row['ID'])
-        
-        new_pos_value, new_rel_value = get_new_token_tag_and_label(token_details, sen_df, map_df, print_all_possibilities)
-
-        if new_pos_value and new_rel_value:
-            new_values.append({'new_upos': new_pos_value, 'new_deprel': new_rel_value})
-    return new_values
-
-
-def main():
-    map_version = arguments['--map_version']
-    input_dir = Path(arguments['--input'])
-    output_dir = Path(arguments['--output'])
-
-    files = get_conll_files(arguments['--input'])
-
-    map_df = pd.read_csv(f'catib_enrichment/map_files/CATiB_plus_map_v{map_version}.tsv', sep='\t')
-
-    # ensures that the exact_matches column is up to date
-    # the exact_matches column counts the number of non-* values in each row
-    features = ['lex', 'catib_pos', 'mada_pos', 'parent_lex', 'parent_catib_pos', 'parent_mada_pos', 'rel', 'order']
-    map_df['exact_matches'] = 8 - (map_df[features] == '*').sum(axis=1)
+def get_output_file_path(file: str) -> Path:
+    # compressed inputs are written uncompressed unless --compress is passed
+    file_name = remove_compression_suffix(Path(file).name) + get_compression_format_suffix(arguments['--compress'])
+    # with --recursive, in the same subdirectory of the output directory as the file
+    return get_output_dir(arguments['--output'], file, get_mirrored_input_dir(arguments)) / file_name
 
+def enrich_file(shard: FileShard):
     print_all_possibilities = True
+    file = shard.file_path
 
-    for file in files:
+    if shard.shard_id == 0:
         print(file)
-        conll = ConllxDf(input_dir / file)
+    output_file_path = get_output_file_path(file)
+    if not shard.is_whole_file():
+        # the parts are concatenated once all shards of the file are enriched
+        output_file_path = get_part_path(output_file_path, shard.shard_id)
 
-        # sentences
-        for sen_idx in range(conll.get_sentence_count()):
-            sen_df = conll.get_df_by_id(sen_idx)
-            # print(conll.get_comments_by_id(sen_idx)[0])
-            new_values = get_new_tree_tags_and_labels(sen_df, map_df, print_all_possibilities)
-            update_tree(sen_df, new_values)
+    write_conll_sentences(output_file_path, enrich_sentences(shard.read_sentences(), map_df, print_all_possibilities))
 
-        conll.write(Path(output_dir))
+def main():
+    files = get_input_files(arguments, unique_output_names=True)
+    shards = get_file_shards(files, get_shard_count(arguments))
+
+    file_results = run_file_jobs(enrich_file, shards, get_jobs(arguments),
+                                 initializer=init_map_df, initargs=(arguments['--map_version'],))
+    failed_files = 0
+    for file, shard_results, failed_shards in group_shard_results(file_results):
+        output_file_path = get_output_file_path(file)
+        if failed_shards:
+            for file_result in failed_shards:
+                report_error(file_result)
+            remove_parts(output_file_path, len(shard_results))
+            failed_files += 1
+        elif len(shard_results) > 1:
+            concatenate_parts(output_file_path, len(shard_results))
+    exit_if_failed(failed_files)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
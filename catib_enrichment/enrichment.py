@@ -0,0 +1,51 @@
+"""Functions that convert the POS tags and DEPREL labels of dependency trees
+to their CATiB+ equivalent, using a map file.
+"""
+import pandas as pd
+
+from catib_enrichment.tree_functions import add_order, add_parent_details, get_token_details
+from catib_enrichment.mapper import get_catib_plus, update_tree
+
+def get_new_token_tag_and_label(token_details, sen_df, map_df, print_all_possibilities):
+    # get_token_details returns an empty dict for an ID that is not in the sentence
+    if not token_details:
+        raise ValueError(f'Token not found in the sentence:\n{sen_df.to_string()}')
+    if token_details.lex == 'ROOT':
+        return '', ''
+    # parent details and order required before getting catib plus feature values
+    add_parent_details(sen_df, token_details)
+    add_order(token_details)
+
+    return get_catib_plus(token_details, map_df, 'POS', print_all_possibilities), get_catib_plus(token_details, map_df, 'REL', print_all_possibilities)
+
+def get_new_tree_tags_and_labels(sen_df, map_df, print_all_possibilities=False):
+    new_values = []
+    # tokens
+    for _, row in sen_df.iterrows():
+        # token details
+        token_details = get_token_details(sen_df, row['ID'])
+        
+        new_pos_value, new_rel_value = get_new_token_tag_and_label(token_details, sen_df, map_df, print_all_possibilities)
+
+        if new_pos_value and new_rel_value:
+            new_values.append({'new_upos': new_pos_value, 'new_deprel': new_rel_value})
+    return new_values
+
+def enrich_sentence(sentence, map_df, print_all_possibilities=False):
+    new_values = get_new_tree_tags_and_labels(sentence.df, map_df, print_all_possibilities)
+    update_tree(sentence.df, new_values)
+    return sentence
+
+def enrich_sentences(sentences, map_df, print_all_possibilities=False):
+    # enriches one sentence at a time, so that each one can be written as soon as it is enriched
+    for sentence in sentences:
+        yield enrich_sentence(sentence, map_df, print_all_possibilities)
+
+def get_map_df(map_version: str) -> pd.DataFrame:
+    map_df = pd.read_csv(f'catib_enrichment/map_files/CATiB_plus_map_v{map_version}.tsv', sep='\t')
+
+    # ensures that the exact_matches column is up to date
+    # the exact_matches column counts the number of non-* values in each row
+    features = ['lex', 'catib_pos', 'mada_pos', 'parent_lex', 'parent_catib_pos', 'parent_mada_pos', 'rel', 'order']
+    map_df['exact_matches'] = 8 - (map_df[features] == '*').sum(axis=1)
+    return map_df
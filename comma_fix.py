@@ -2,212 +2,97 @@
 This script connects the comma to the correct token before it.
 
 Usage:
-    text_to_conll_cli (-i <input> | --input=<input>)
+    text_to_conll_cli (-i <input> | --input=<input> | --manifest=<manifest>)
+        [-r | --recursive] [--include=<glob>]... [--exclude=<glob>]...
         (-o <output> | --output=<output>)
+        [-j <jobs> | --jobs=<jobs>]
+        [--shards=<shards>]
+        [--compress=<format>]
     text_to_conll_cli (-h | --help)
 
 Options:
     -i <input> --input=<input>
         A CoNLL-U/X file or a directory containing CoNLL-U/X files
+    --manifest=<manifest>
+        A file listing the CoNLL-U/X files to process, one path per line
+        (relative paths are relative to the manifest's directory); used instead of --input
+    -r --recursive
+        Also process the CoNLL-U/X files in subdirectories of the input directory
+    --include=<glob>
+        Only process files whose name or relative path matches this pattern (can be repeated)
+    --exclude=<glob>
+        Skip files and subdirectories whose name or relative path matches this pattern (can be repeated)
     -o <output> --output=<output>
         The directory to save the fixed CoNLL files
+    -j <jobs> --jobs=<jobs>
+        Number of files to process in parallel; 0 uses one process per CPU core [default: 1]
+    --shards=<shards>
+        Split each file at sentence boundaries into this many parts, processed as separate jobs
+        (use with --jobs for single large files; parts are always read one sentence at a time) [default: 1]
+    --compress=<format>
+        Compress the output files with gz, bz2, xz, or zst (zst requires the zstandard package)
     -h --help
         Show this screen.
 """
 import os
 import pathlib
-from typing import List, Union
-from pandas import concat, DataFrame
+from collections import Counter
 from docopt import docopt
 
-from utils.dir_utils import get_conll_files, remove_file_name_extension
-from utils.projectivity import projective_checker
-from utils.prt_token_pos import get_prt_token_pos_dict
-from conllx_df.conllx_df import ConllxDf
+from comma_fix.tree_fix import fix_conllx_sentences, get_failure_summary
+from utils.conll_io import write_conll_sentences
+from utils.conll_shards import FileShard, concatenate_parts, get_file_shards, get_part_path, get_shard_count, group_shard_results, remove_parts
+from utils.dir_utils import get_input_files, get_mirrored_input_dir, get_output_dir, remove_file_name_extension
+from utils.file_compression import get_compression_format_suffix, remove_compression_suffix
+from utils.parallel import exit_if_failed, get_jobs, report_error, run_file_jobs
 
 arguments = docopt(__doc__)
 
-# from wellformedness.projectivity_check import projective_checker
-
-# from lib.class_conllx import Conllx
-
-
-################################################################
-### Fix comma functions
-################################################################
-def is_possible_parent_behind(token_id: int, conllx_df: DataFrame) -> bool:
-    # checks if the comma is connected to the token ahead of it
-    token_dict = conllx_df[conllx_df['ID'] == token_id].to_dict('records')[0]
-    return token_dict['ID'] < int(token_dict['HEAD'])
-
-def can_move_token(token_id, new_parent_id, conllx_df: DataFrame) -> bool:
-    # sourcery skip: return-identity
-    # performs the following checks:
-    # is the the token a root?
-    if new_parent_id == 0:
-        return False
-    # is the the token ahead of the comma?
-    if new_parent_id > token_id:
-        return False
-    # does connecting to the token cause non-projectivity?
-    temp_df = conllx_df.copy()
-    temp_df = update_comma_head(token_id, new_parent_id, temp_df)
-    if projective_checker(temp_df):
-        return False
-    
-    return True
-
-def get_parent_id(current_token_id: int, conllx_df: DataFrame) -> int:
-    """gets the id of the parent of the curent token
-
-    Args:
-        current_token_id (int): token id
-        conllx_df (DataFrame): dependency tree
-
-    Returns:
-        int: parent id
-    """
-    if current_token_id == 0: # the comma is the first token, so parent is an invalid ID of 0
-        # keep the comma pointing to current token
-        return int(conllx_df[conllx_df['ID'] == 1].to_dict('records')[0]['HEAD'])
-
-    return int(conllx_df[conllx_df['ID'] == current_token_id].to_dict('records')[0]['HEAD'])
-
-def update_comma_head(comma_id: int, new_parent_id: int, conllx_df: DataFrame) -> DataFrame:
-    """attaches the comma to the new parent
-
-    Args:
-        comma_id (int): token id
-        new_parent_id (int): the id of the new parent of the comma token
-        conllx_df (DataFrame): dependency tree
-
-    Returns:
-        DataFrame: updated dependency tree
-    """
-
-    conllx_df.iloc[comma_id-1, conllx_df.columns.get_loc('HEAD')] = new_parent_id
-    return conllx_df
-
-def get_comma_id_list(conllx_df: DataFrame) -> List[int]:
-    """Gets all commas in the sentence
-
-    Args:
-        conllx_df (DataFrame): dependency tree DataFrame
-
-    Returns:
-        List[int]: list of comma token ids
-    """
-    comma_tokens = conllx_df[(conllx_df['FORM'] == ',') | (conllx_df['FORM'] == '،')]
-    return list(comma_tokens['ID'])
-
-# def fix_comma(comma_id: int, conllx_df: DataFrame) -> Union[DataFrame, Exception]:
-def fix_comma(comma_id: int, conllx_df: DataFrame) -> Union[DataFrame, bool]:
-    """The algorithm is as follows:
-    check if the tree is projective, otherwise raise an exception
-    get the token before it
-        is the the token a root?
-        is the the token ahead of the comma?
-        does connecting to the token cause non-projectivity?
-    if it is false for all three, connect to the token.
-    """
-    # tree is not projective (an error list is returned), 
-    # so return conllx_df without fixing commas
-    if projective_checker(conllx_df):
-        # return conllx_df
-        raise Exception('tree is not projective')
-    # initial new parent is the token before the comma token
-    new_parent_id = comma_id - 1
-
-    # the default will be the previous token.
-    # if the comma is the first token in the sentence, don't change the parent.
-    while True:
-        # test the parent of the previous token
-        possible_parent_id = get_parent_id(new_parent_id, conllx_df)
-        if not can_move_token(comma_id, possible_parent_id, conllx_df):
-            break # we can no longer move the token
-        else:
-            # if we can move the token, update the new parent id
-            new_parent_id = possible_parent_id
-    
-    # conllx_df = update_comma_head(comma_id, new_parent_id, conllx_df)
-    return update_comma_head(comma_id, new_parent_id, conllx_df)
-
-def fix_commas(tree_df):
-    comma_list = get_comma_id_list(tree_df)
-    for comma_id in comma_list:
-        try:
-            data = fix_comma(comma_id, tree_df)
-        except:
-            return tree_df
-    return data
-
-################################################################
-### End of fix comma functions
-################################################################
-
-def fix_sentence_commas(tree_df):
-    # for sentence in sen_list:
-    try:
-        data = fix_commas(tree_df)
-    except:
-        return tree_df
-    return data
-
-def fix_tags_and_labels(df):
-    """Obtain the regex version of particles and pronouns,
-    and use them to replace the POS tags of particle and pronoun tokens.
-
-    Args:
-        df (DataFrame): sentence dependency tree
-    """
-    for i, row in df.iterrows():
-        if row['FORM'] in get_prt_token_pos_dict() and \
-            row['UPOS'] not in get_prt_token_pos_dict()[row['FORM']]:
-                df.loc[i, 'UPOS'] = get_prt_token_pos_dict()[row['FORM']][0]
-    # expr = get_regex_expression_by_tag('PRT')
-    # df.loc[df.FORM.str.match(expr), 'UPOS'] = 'PRT'
-    # expr = get_regex_expression_by_tag('NOM')
-    # df.loc[df.FORM.str.match(expr), 'UPOS'] = 'NOM'
-
-def is_comma_only_root_att(tree_df):
-    # checks to see if the only tokens that attach to the root are commas.
-    # If that is the case, do not fix commas in the tree, since no other tokens with attach to root
-    # after the commas are fixed.
-    tokens_attached_to_root = tree_df[tree_df.HEAD == 0].FORM.tolist()
-    if all(token in [',', '،'] for token in tokens_attached_to_root):
-        return True
-    return False
-
-def fix_conllx_sentences(conllx):
-    
-    fixed_df_list = []
-    for tree_id in range(conllx.get_sentence_count()):
-        tree_df = conllx.get_df_by_id(tree_id)
-        if not is_comma_only_root_att(tree_df):
-            tree_df = fix_sentence_commas(tree_df)
-        # else:
-        #     print(f"{conllx.file_path.name}\t{tree_id}")
-        
-        fix_tags_and_labels(tree_df)
-        fixed_df_list.append(tree_df)
-    return concat(fixed_df_list, axis=0)
+def get_output_file_path(conll_file: str) -> pathlib.Path:
+    full_path = pathlib.Path(conll_file)
+    # with --recursive, in the same subdirectory of the output directory as the file
+    output_dir = get_output_dir(arguments['--output'], conll_file, get_mirrored_input_dir(arguments))
+    compression_suffix = get_compression_format_suffix(arguments['--compress'])
+    # same directory (however the paths are written), change name to avoid overwriting original
+    if full_path.parent.resolve() == output_dir.resolve():
+        return output_dir / f"{remove_file_name_extension(full_path.name)}_comma_fixed.conllx{compression_suffix}"
+    # compressed inputs are written uncompressed unless --compress is passed
+    return output_dir / f"{remove_compression_suffix(full_path.name)}{compression_suffix}"
+
+def fix_file(shard: FileShard) -> Counter:
+    full_path = pathlib.Path(shard.file_path)
+    if shard.shard_id == 0:
+        print(f'Processing file {full_path.name}')
+
+    output_file_path = get_output_file_path(shard.file_path)
+    if not shard.is_whole_file():
+        # the parts are concatenated once all shards of the file are fixed
+        output_file_path = get_part_path(output_file_path, shard.shard_id)
+
+    # sentences whose commas could not all be fixed, by reason
+    failure_counts = Counter()
+    write_conll_sentences(output_file_path, fix_conllx_sentences(shard.read_sentences(), failure_counts))
+    return failure_counts
 
 if __name__ == '__main__':
     output_path = pathlib.Path(arguments['--output'])
     assert os.path.isdir(output_path), 'The output path passed is not a directory. Please specify a directory.'
 
-    files = get_conll_files(arguments['--input'])
-
-    for conll_file in files:
-        full_path = pathlib.Path(conll_file)
-        file_name = full_path.name
-        print(f'Processing file {file_name}')
-        conllx = ConllxDf(file_path=conll_file)
-        conllx.file_data = fix_conllx_sentences(conllx)
-
-        if full_path.parent == output_path: # same path, change name to avoid overwriting original
-            file_name = f"{remove_file_name_extension(file_name)}_comma_fixed.conllx"
-        else:
-            file_name = ''
-        
-        conllx.write(pathlib.Path(output_path), file_name)
\ No newline at end of file
+    files = get_input_files(arguments, unique_output_names=True)
+    shards = get_file_shards(files, get_shard_count(arguments))
+
+    failed_files = 0
+    for conll_file, shard_results, failed_shards in group_shard_results(run_file_jobs(fix_file, shards, get_jobs(arguments))):
+        output_file_path = get_output_file_path(conll_file)
+        if failed_shards:
+            for file_result in failed_shards:
+                report_error(file_result)
+            remove_parts(output_file_path, len(shard_results))
+            failed_files += 1
+            continue
+        if len(shard_results) > 1:
+            concatenate_parts(output_file_path, len(shard_results))
+        failure_counts = sum(shard_results, Counter())
+        if failure_counts:
+            print(f'{sum(failure_counts.values())} sentences of {pathlib.Path(conll_file).name} were not fully comma-fixed ({get_failure_summary(failure_counts)})')
+    exit_if_failed(failed_files)
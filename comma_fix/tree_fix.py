@@ -0,0 +1,204 @@
+"""Functions that reattach commas to the correct token before them and fix
+the tags of particles and pronouns, one dependency tree at a time.
+"""
+from collections import Counter
+from typing import Iterable, Iterator, List
+from pandas import DataFrame
+
+from utils.conll_io import ConllSentence
+from utils.projectivity import ProjectivityIndex
+from utils.prt_token_pos import get_clitic_pos_fixes
+
+################################################################
+### Fix comma functions
+################################################################
+COMMA_FORMS = [',', '،']
+
+class CommaFixError(Exception):
+    """Raised when the commas of a tree cannot all be fixed.
+    The commas fixed before the error keep their new heads.
+    """
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class CommaTree:
+    """Parent-pointer model of a dependency tree, in which all commas are fixed
+    without going back to the DataFrame.
+
+    Heads are read by token ID and written by position (the token with ID i
+    is expected at position i - 1), as the DataFrame version did.
+    """
+    def __init__(self, ids: List[int], heads: List[int], forms: List[str]):
+        self.ids = ids
+        self.heads = heads
+        self.forms = forms
+        # position of the first token with each ID
+        self.positions = {}
+        for position, token_id in enumerate(ids):
+            self.positions.setdefault(token_id, position)
+        self.projectivity_index = ProjectivityIndex(ids, heads)
+
+    @classmethod
+    def from_df(cls, conllx_df: DataFrame) -> 'CommaTree':
+        return cls(conllx_df['ID'].tolist(), conllx_df['HEAD'].tolist(), conllx_df['FORM'].tolist())
+
+    def get_comma_ids(self) -> List[int]:
+        return [token_id for token_id, form in zip(self.ids, self.forms) if form in COMMA_FORMS]
+
+    def get_parent_id(self, current_token_id: int) -> int:
+        """gets the id of the parent of the curent token
+
+        Args:
+            current_token_id (int): token id
+
+        Raises:
+            CommaFixError: if there is no token with this id
+
+        Returns:
+            int: parent id
+        """
+        if current_token_id == 0: # the comma is the first token, so parent is an invalid ID of 0
+            # keep the comma pointing to current token
+            current_token_id = 1
+        if current_token_id not in self.positions:
+            raise CommaFixError('missing_token')
+        return int(self.heads[self.positions[current_token_id]])
+
+    def can_move_token(self, token_id: int, new_parent_id: int) -> bool:
+        # performs the following checks:
+        # is the the token a root?
+        if new_parent_id == 0:
+            return False
+        # is the the token ahead of the comma?
+        if new_parent_id > token_id:
+            return False
+        # does connecting to the token cause non-projectivity?
+        return self.projectivity_index.can_attach(token_id, new_parent_id)
+
+    def set_head(self, token_id: int, new_parent_id: int):
+        self.projectivity_index.attach(token_id, new_parent_id)
+        self.heads[token_id - 1] = new_parent_id
+
+    def fix_comma(self, comma_id: int):
+        """The algorithm is as follows:
+        check if the tree is projective, otherwise raise an exception
+        get the token before it
+            is the the token a root?
+            is the the token ahead of the comma?
+            does connecting to the token cause non-projectivity?
+        if it is false for all three, connect to the token.
+
+        Raises:
+            CommaFixError: if the tree is not projective, a parent is missing,
+                or the parents of the token before the comma form a cycle
+        """
+        if not self.projectivity_index.projective:
+            raise CommaFixError('nonprojective')
+        # the default will be the previous token.
+        # if the comma is the first token in the sentence, don't change the parent.
+        new_parent_id = comma_id - 1
+        visited_ids = {new_parent_id}
+        while True:
+            # test the parent of the previous token
+            possible_parent_id = self.get_parent_id(new_parent_id)
+            if not self.can_move_token(comma_id, possible_parent_id):
+                break # we can no longer move the token
+            if possible_parent_id in visited_ids:
+                # the comma would be moved around the cycle forever
+                raise CommaFixError('cycle')
+            visited_ids.add(possible_parent_id)
+            new_parent_id = possible_parent_id
+
+        self.set_head(comma_id, new_parent_id)
+
+    def fix_commas(self):
+        """Fixes the commas in sentence order, stopping at the first one that cannot be fixed."""
+        for comma_id in self.get_comma_ids():
+            self.fix_comma(comma_id)
+
+def fix_commas(tree_df: DataFrame) -> DataFrame:
+    """Fixes all the commas of a tree, and updates its HEAD column.
+
+    Raises:
+        CommaFixError: if a comma cannot be fixed; tree_df is still updated
+            with the commas fixed before it
+    """
+    comma_tree = CommaTree.from_df(tree_df)
+    try:
+        comma_tree.fix_commas()
+    finally:
+        if comma_tree.heads != tree_df['HEAD'].tolist():
+            tree_df['HEAD'] = comma_tree.heads
+    return tree_df
+
+################################################################
+### End of fix comma functions
+################################################################
+
+def fix_sentence_commas(tree_df: DataFrame, failure_counts: Counter = None) -> DataFrame:
+    """Fixes the commas of a tree, counting the reason in failure_counts
+    when they cannot all be fixed (the tree is returned either way).
+    """
+    try:
+        return fix_commas(tree_df)
+    except Exception as e:
+        if failure_counts is not None:
+            failure_counts[e.reason if isinstance(e, CommaFixError) else type(e).__name__] += 1
+        return tree_df
+
+def fix_tags_and_labels(df):
+    """Obtain the regex version of particles and pronouns,
+    and use them to replace the POS tags of particle and pronoun tokens.
+
+    The tags of all the tokens are looked up at once. The fixed tags are
+    assigned by index label, so the index of df has to be unique (as it is
+    for a sentence DataFrame).
+
+    Args:
+        df (DataFrame): sentence dependency tree
+    """
+    pos_fixes = get_clitic_pos_fixes(df['FORM'], df['UPOS'])
+    if not pos_fixes.empty:
+        df.loc[pos_fixes.index, 'UPOS'] = pos_fixes
+    # expr = get_regex_expression_by_tag('PRT')
+    # df.loc[df.FORM.str.match(expr), 'UPOS'] = 'PRT'
+    # expr = get_regex_expression_by_tag('NOM')
+    # df.loc[df.FORM.str.match(expr), 'UPOS'] = 'NOM'
+
+def is_comma_only_root_att(tree_df):
+    # checks to see if the only tokens that attach to the root are commas.
+    # If that is the case, do not fix commas in the tree, since no other tokens with attach to root
+    # after the commas are fixed.
+    tokens_attached_to_root = tree_df[tree_df.HEAD == 0].FORM.tolist()
+    if all(token in [',', '،'] for token in tokens_attached_to_root):
+        return True
+    return False
+
+def fix_tree(tree_df: DataFrame, failure_counts: Counter = None) -> DataFrame:
+    """Fixes the commas and clitic tags of a single dependency tree.
+
+    Args:
+        tree_df (DataFrame): the tree, which is updated in place
+        failure_counts (Counter, optional): counts the trees whose commas could
+            not all be fixed, by reason. Defaults to None.
+
+    Returns:
+        DataFrame: the fixed tree
+    """
+    if not is_comma_only_root_att(tree_df):
+        tree_df = fix_sentence_commas(tree_df, failure_counts)
+    # else:
+    #     print(f"{conllx.file_path.name}\t{tree_id}")
+    
+    fix_tags_and_labels(tree_df)
+    return tree_df
+
+def fix_conllx_sentences(sentences: Iterable[ConllSentence], failure_counts: Counter = None) -> Iterator[ConllSentence]:
+    # fixes one sentence at a time, so that each one can be written as soon as it is fixed
+    for sentence in sentences:
+        sentence.df = fix_tree(sentence.df, failure_counts)
+        yield sentence
+
+def get_failure_summary(failure_counts: Counter) -> str:
+    return ', '.join(f'{reason}: {count}' for reason, count in sorted(failure_counts.items()))
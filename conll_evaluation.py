@@ -7,6 +7,8 @@ Usage:
         [-x | --transliterate_pnx]
         [-n | --transliterate_num]
         [-a | --normalize_alef_yeh_ta]
+        [--stream | --cache]
+        [-j <jobs> | --jobs=<jobs>]
         [((-o <output_path> | --output_path=<output_path>) <output_file_name>)]
     evaluate_conllx_driver (-h | --help)
 
@@ -21,6 +23,13 @@ Options:
         Transliterate numbers to Roman script (numbers will always match regardless of script)
     -a --normalize_alef_yeh_ta
         Normalizes alef, alef maksura, and teh marbuta
+    --stream
+        Compare one pair of sentences at a time instead of loading whole files into memory
+    --cache
+        Same as --stream, but read sentences from a parsed copy kept in a <file name>.cache
+        directory next to each file, so that unchanged files are not parsed again on the next run
+    -j <jobs> --jobs=<jobs>
+        Number of file pairs to evaluate in parallel; 0 uses one process per CPU core [default: 1]
     -o <output_path> --output_path=<output_path>
         Output path to save the tsv counts file. If not specified, output will be printed to stdout.
     <output_file_name>
@@ -36,9 +45,13 @@ from pandas import DataFrame
 
 from conllx_df.conllx_df import ConllxDf
 
-from utils.dir_utils import get_conll_files
-from conll_evaluation.tree_evaluation import compare_conll_trees
-from conll_evaluation.normalization import transliterate_and_normalize
+from utils.conll_io import read_conll_sentences
+from utils.corpus_cache import load_conll_corpus
+from utils.dir_utils import get_conll_files, remove_file_name_extension
+from utils.file_compression import is_compressed, remove_compression_suffix
+from utils.parallel import exit_if_failed, get_jobs, report_error, run_file_jobs
+from conll_evaluation.tree_evaluation import compare_conll_trees, compare_streamed_trees
+from conll_evaluation.normalization import transliterate_and_normalize, transliterate_and_normalize_df
 
 arguments = docopt(__doc__)
 
@@ -47,7 +60,8 @@ def get_synced_file_names(gold_files, parsed_files):
     parsed_file_names = [pathlib.Path(file_path).name for file_path in parsed_files]
     tuple_list = []
     for gold_file in gold_file_names:
-        parsed_file = [x for x in parsed_file_names if x == gold_file][0]
+        # a compressed file can be compared with an uncompressed one
+        parsed_file = [x for x in parsed_file_names if remove_compression_suffix(x) == remove_compression_suffix(gold_file)][0]
         tuple_list.append((gold_file, parsed_file))
     return tuple_list
 
@@ -57,6 +71,34 @@ def get_file_path_details(file_path):
     file_name = full_path.name
     return dir_path, file_name
 
+def get_streamed_trees(conll_file, arguments):
+    # normalization is applied to each sentence as it is read
+    if arguments['--cache']:
+        sentences = load_conll_corpus(conll_file, use_cache=True).get_conll_sentences()
+    else:
+        sentences = read_conll_sentences(conll_file)
+    for sentence in sentences:
+        transliterate_and_normalize_df(arguments, sentence.df)
+        yield sentence.df
+
+def get_file_scores(file_pair: tuple) -> dict:
+    gold_file, parsed_file = file_pair
+    # ConllxDf cannot read compressed files
+    if arguments['--stream'] or arguments['--cache'] or is_compressed(gold_file) or is_compressed(parsed_file):
+        file_scores = compare_streamed_trees(get_streamed_trees(gold_file, arguments),
+                                             get_streamed_trees(parsed_file, arguments))
+    else:
+        gold_conllx = ConllxDf(gold_file)
+        parsed_conllx = ConllxDf(parsed_file)
+
+        transliterate_and_normalize(arguments, gold_conllx, parsed_conllx)
+        file_scores = compare_conll_trees(gold_conllx, parsed_conllx)
+    
+    return {
+        'file_name': remove_file_name_extension(gold_file.name),
+        **file_scores
+    }
+
 def main():
     gold_files = get_conll_files(arguments["--gold"])
     parsed_files = get_conll_files(arguments["--parsed"])
@@ -76,17 +118,14 @@ def main():
     num_sentences_list = []
 
     conll_scores_list = []
-    for gold_file, parsed_file in tuple_list:
-        gold_conllx = ConllxDf(gold_path / gold_file)
-        parsed_conllx = ConllxDf(parsed_path / parsed_file)
-
-        transliterate_and_normalize(arguments, gold_conllx, parsed_conllx)
-        
-        conll_scores = {
-            'file_name': '.'.join(gold_file.split('.')[:-1]),
-            **compare_conll_trees(gold_conllx, parsed_conllx)
-        }
-        conll_scores_list.append(conll_scores)
+    file_pairs = [(gold_path / gold_file, parsed_path / parsed_file) for gold_file, parsed_file in tuple_list]
+    failed_files = 0
+    for file_result in run_file_jobs(get_file_scores, file_pairs, get_jobs(arguments)):
+        if file_result.error:
+            report_error(file_result)
+            failed_files += 1
+            continue
+        conll_scores_list.append(file_result.result)
 
     scores_df = DataFrame(conll_scores_list).round(3)
 
@@ -96,6 +135,7 @@ def main():
         scores_df.to_csv(f"{arguments['--output_path']}/{arguments['<output_file_name>']}.tsv", sep='\t', index=False)
     else:
         print(scores_df)
+    exit_if_failed(failed_files)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
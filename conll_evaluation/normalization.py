@@ -43,12 +43,14 @@ def normalize_alef_yeh_ta(df):
     df.FORM = df.FORM.apply(normalize_alef_yeh_ta_line)
 
 def transliterate_and_normalize(arguments, gold_conllx, parsed_conllx):
+    transliterate_and_normalize_df(arguments, gold_conllx.df)
+    transliterate_and_normalize_df(arguments, parsed_conllx.df)
+
+def transliterate_and_normalize_df(arguments, conll_df):
+    # conll_df can be a whole file or a single sentence
     if arguments['--transliterate_pnx']:
-        bw2ar_map_lines(gold_conllx.df, 'punctuation')
-        bw2ar_map_lines(parsed_conllx.df, 'punctuation')
+        bw2ar_map_lines(conll_df, 'punctuation')
     if arguments['--transliterate_num']:
-        bw2ar_map_lines(gold_conllx.df, 'numbers')
-        bw2ar_map_lines(parsed_conllx.df, 'numbers')
+        bw2ar_map_lines(conll_df, 'numbers')
     if arguments['--normalize_alef_yeh_ta']:
-        normalize_alef_yeh_ta(gold_conllx.df)
-        normalize_alef_yeh_ta(parsed_conllx.df)
\ No newline at end of file
+        normalize_alef_yeh_ta(conll_df)
\ No newline at end of file
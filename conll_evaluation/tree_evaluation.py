@@ -1,3 +1,5 @@
+from itertools import zip_longest
+from typing import Iterable
 import pandas as pd
 
 from conllx_df.conllx_df import ConllxDf
@@ -80,6 +82,33 @@ def get_aligned_trees(ref_conll, pred_conll):
     
     return aligned_df_gold_list, aligned_df_pred_list, total_ref_tree_token_count, total_pred_tree_token_count
 
+def get_match_counts(gold_df, pred_df):
+    """Counts the matching tokens, tags, labels, and heads of two aligned trees."""
+    return {
+        'FORM': (gold_df['FORM'] == pred_df['FORM']).sum(),
+        'UPOS': (gold_df['UPOS'] == pred_df['UPOS']).sum(),
+        'DEPREL': (gold_df['DEPREL'] == pred_df['DEPREL']).sum(),
+        'HEAD': (gold_df['HEAD'] == pred_df['HEAD']).sum(),
+        'LAS': ((gold_df['HEAD'] == pred_df['HEAD']) & (gold_df['DEPREL'] == pred_df['DEPREL'])).sum(),
+    }
+
+def get_final_scores(scores_combined):
+    # converting to pandas and manually setting values to be able to use numpys round function later
+    final_scores = pd.Series(scores_combined)
+    return {
+        'tokenization_f1_score': final_scores.tokenization_f1_score,
+        'tokenization_precision': final_scores.tokenization_precision,
+        'tokenization_recall': final_scores.tokenization_recall,
+        'word_accuracy': final_scores.word_accuracy,
+        'pos': final_scores.pos,
+        'uas_score': final_scores.uas_score,
+        'label_score': final_scores.label_score,
+        'las_score': final_scores.las_score,
+        'pp_uas_score': final_scores.pp_uas_score,
+        'pp_label_score': final_scores.pp_label_score,
+        'pp_las_score': final_scores.pp_las_score
+    }
+
 def compare_conll_trees(ref_conll: ConllxDf, pred_conll: ConllxDf):
     assert ref_conll.get_sentence_count() == pred_conll.get_sentence_count()
 
@@ -100,20 +129,56 @@ def compare_conll_trees(ref_conll: ConllxDf, pred_conll: ConllxDf):
 
     perfectly_parsed = evaluate_perfectly_parsed_trees(aligned_df_gold_list, aligned_df_pred_list)
 
-    # converting to pandas and manually setting values to be able to use numpys round function later
     scores_combined = {**tokenization_scores, **pos_score, **attachment_scores, **perfectly_parsed, **word_accuracy}
-    final_scores = pd.Series(scores_combined)
-    return {
-        'tokenization_f1_score': final_scores.tokenization_f1_score,
-        'tokenization_precision': final_scores.tokenization_precision,
-        'tokenization_recall': final_scores.tokenization_recall,
-        'word_accuracy': final_scores.word_accuracy,
-        'pos': final_scores.pos,
-        'uas_score': final_scores.uas_score,
-        'label_score': final_scores.label_score,
-        'las_score': final_scores.las_score,
-        'pp_uas_score': final_scores.pp_uas_score,
-        'pp_label_score': final_scores.pp_label_score,
-        'pp_las_score': final_scores.pp_las_score
-    }
+    return get_final_scores(scores_combined)
+
+def compare_streamed_trees(ref_trees: Iterable[pd.DataFrame], pred_trees: Iterable[pd.DataFrame]):
+    """Same scores as compare_conll_trees, but computed one pair of trees at a time.
+
+    Token-level matches are summed as the trees are read, so the aligned
+    trees are never concatenated. Only one score per sentence is kept
+    for the word accuracy and perfectly parsed averages.
+
+    Args:
+        ref_trees (Iterable[DataFrame]): gold trees
+        pred_trees (Iterable[DataFrame]): parsed trees, in the same order as the gold trees
+
+    Returns:
+        dict: evaluation scores
+    """
+    total_ref_tree_token_count = 0
+    total_pred_tree_token_count = 0
+    match_counts = dict.fromkeys(['FORM', 'UPOS', 'DEPREL', 'HEAD', 'LAS'], 0)
+    word_scores = []
+    pp_scores = []
+    for ref_tree, pred_tree in zip_longest(ref_trees, pred_trees):
+        assert ref_tree is not None and pred_tree is not None, 'Gold and parsed files have a different number of sentences.'
+        total_ref_tree_token_count += ref_tree.shape[0]
+        total_pred_tree_token_count += pred_tree.shape[0]
+        word_scores.append({
+            'word_accuracy': evaluate_words(ref_tree['FORM'], pred_tree['FORM']) * 100
+        })
 
+        gold_df, pred_df = align_trees(ref_tree, pred_tree)
+        for column, count in get_match_counts(gold_df, pred_df).items():
+            match_counts[column] += count
+        pp_scores.append({
+            'pp_label_score': evaluate_columns(gold_df['DEPREL'], pred_df['DEPREL'], 0, True),
+            'pp_uas_score': evaluate_columns(gold_df['HEAD'], pred_df['HEAD'], 0, True),
+            'pp_las_score': evaluate_las(gold_df, pred_df, 0, True)
+        })
+
+    token_recall = match_counts['FORM'] / total_ref_tree_token_count
+    token_precision = match_counts['FORM'] / total_pred_tree_token_count
+    scores_combined = {
+        'tokenization_f1_score': (2*token_precision*token_recall / (token_precision+token_recall))*100,
+        'tokenization_recall': token_recall*100,
+        'tokenization_precision': token_precision*100,
+        'pos': 100 * (match_counts['UPOS'] / total_ref_tree_token_count),
+        'label_score': 100 * (match_counts['DEPREL'] / total_ref_tree_token_count),
+        'uas_score': 100 * (match_counts['HEAD'] / total_ref_tree_token_count),
+        'las_score': 100 * (match_counts['LAS'] / total_ref_tree_token_count),
+        **pd.DataFrame(pp_scores).mean().to_dict(),
+        **pd.DataFrame(word_scores).mean().to_dict(),
+    }
+    return get_final_scores(scores_combined)
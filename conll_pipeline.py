@@ -0,0 +1,122 @@
+"""Reads each CoNLL-U/X file once and passes every sentence through a chain of
+stages, instead of running comma_fix, catib_enrichment, conll_stats, and
+wellformedness_checker one after the other.
+
+Usage:
+    conll_pipeline (-i <input> | --input=<input> | --manifest=<manifest>)
+        [-r | --recursive] [--include=<glob>]... [--exclude=<glob>]...
+        (-o <output> | --output=<output>)
+        [-s <stages> | --stages=<stages>]
+        [-m <map_version> | --map_version=<map_version>]
+        [-b <morphology_db_type> | --morphology_db_type=<morphology_db_type>]
+        [-j <jobs> | --jobs=<jobs>]
+        [--compress=<format>]
+    conll_pipeline (-h | --help)
+
+Options:
+    -i <input> --input=<input>
+        A CoNLL-U/X file or a directory containing CoNLL-U/X files
+    --manifest=<manifest>
+        A file listing the CoNLL-U/X files to process, one path per line
+        (relative paths are relative to the manifest's directory); used instead of --input
+    -r --recursive
+        Also process the CoNLL-U/X files in subdirectories of the input directory
+    --include=<glob>
+        Only process files whose name or relative path matches this pattern (can be repeated)
+    --exclude=<glob>
+        Skip files and subdirectories whose name or relative path matches this pattern (can be repeated)
+    -o <output> --output=<output>
+        The directory to save the outputs in; each stage writes to its own subdirectory
+    -s <stages> --stages=<stages>
+        Comma-separated stages, run in the given order on each sentence. Stages see the
+        sentence as changed by the stages before them. Available stages:
+            comma_fix: fix commas and particle/pronoun tags (as comma_fix.py)
+            tags: only fix particle/pronoun tags
+            catib_enrichment: convert tags and labels to CATiB+ (as catib_enrichment.py)
+            stats: counts of all files in stats/counts.tsv (as conll_stats.py)
+            wellformedness: error reports (as wellformedness_checker.py)
+        [default: comma_fix,stats,wellformedness]
+    -m <map_version> --map_version=<map_version>
+        Version of the CATiB+ map file used by catib_enrichment [default: 5]
+    -b <morphology_db_type> --morphology_db_type=<morphology_db_type>
+        The morphology database used by wellformedness; will use camel_tools built-in by default [default: r13]
+    -j <jobs> --jobs=<jobs>
+        Number of files to process in parallel; 0 uses one process per CPU core [default: 1]
+    --compress=<format>
+        Compress the CoNLL outputs with gz, bz2, xz, or zst (zst requires the zstandard package)
+    -h --help
+        Show this screen.
+"""
+import os
+from pathlib import Path
+from typing import List
+from docopt import docopt
+
+from conll_pipeline.stages import PipelineStage, get_stages
+from utils.conll_io import read_conll_sentences
+from utils.dir_utils import get_input_files, get_mirrored_input_dir
+from utils.parallel import exit_if_failed, get_jobs, report_error, run_file_jobs
+
+arguments = docopt(__doc__)
+
+def create_stages() -> List[PipelineStage]:
+    return get_stages(arguments['--stages'], Path(arguments['--output']), arguments['--compress'],
+                      arguments['--map_version'], arguments['--morphology_db_type'], get_mirrored_input_dir(arguments))
+
+# set up once per process by init_stages
+stages = None
+
+def init_stages():
+    global stages
+    stages = create_stages()
+    for stage in stages:
+        stage.set_up()
+
+def run_file(file_path: str) -> list:
+    """Reads a file one sentence at a time and passes each sentence through all stages.
+
+    Args:
+        file_path (str): path of the CoNLL file
+
+    Returns:
+        list: the end_file result of each stage
+    """
+    print(f'Processing file {Path(file_path).name}')
+    completed = False
+    try:
+        for stage in stages:
+            stage.start_file(file_path)
+        for sentence in read_conll_sentences(file_path):
+            for stage in stages:
+                sentence = stage.process_sentence(sentence)
+        file_results = [stage.end_file() for stage in stages]
+        completed = True
+        return file_results
+    finally:
+        for stage in stages:
+            stage.close_file(completed)
+
+def main():
+    output_stages = create_stages()
+    for stage in output_stages:
+        os.makedirs(stage.output_path, exist_ok=True)
+
+    files = get_input_files(arguments, unique_output_names=True)
+    stage_results = [[] for _ in output_stages]
+    failed_files = 0
+    for file_result in run_file_jobs(run_file, files, get_jobs(arguments), initializer=init_stages):
+        if file_result.error:
+            report_error(file_result)
+            failed_files += 1
+            continue
+        for results, file_stage_result in zip(stage_results, file_result.result):
+            results.append((file_result.item, file_stage_result))
+
+    for stage, results in zip(output_stages, stage_results):
+        # nothing to save if every file failed
+        if results:
+            stage.save_results(results)
+    exit_if_failed(failed_files)
+
+if __name__ == '__main__':
+    main()
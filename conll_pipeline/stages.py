@@ -0,0 +1,242 @@
+"""Stages of the single-pass pipeline.
+
+Every stage sees the sentences of a file one at a time, in order, as left
+by the stages before it. Transforming stages (comma fixing, tag
+normalization, enrichment) change the sentence and write it to their own
+CoNLL file, while the others (statistics, wellformedness) only accumulate
+results, which are saved by the main process once all files are done.
+
+Each stage writes to <output>/<stage name>, with the same file names and
+report formats as the standalone script of the stage.
+"""
+from abc import ABC, abstractmethod
+from collections import Counter
+from pathlib import Path
+from typing import List, Tuple
+
+from pandas import concat, DataFrame
+
+from catib_enrichment.enrichment import enrich_sentence, get_map_df
+from comma_fix.tree_fix import fix_tags_and_labels, fix_tree, get_failure_summary
+from conll_stats.counts_table import adjust_df, get_full_column_list
+from conll_stats.df_counts_functions import get_deprel_label_counts, get_leading_count_series, get_pos_tag_counts, get_word_level_counts_series, get_sentence_level_counts_series
+from conll_stats.enum_classes import DataFrameStringHeaders
+from conll_stats.streamed_counts import StreamedFileCounter
+from utils.analyzer import set_up_analyzer
+from utils.conll_io import ConllSentence, ConllWriter
+from utils.dir_utils import get_output_dir, get_relative_output_dir
+from utils.file_compression import get_compression_format_suffix, remove_compression_suffix
+from wellformedness.get_conllu_wellformedness_stats import save_stats
+from wellformedness.sentence_errors import get_sentence_all_errors, save_file_errors, update_conllx_counts
+
+class PipelineStage:
+    """Base class of the stages; by default a stage does nothing."""
+    name = ''
+
+    def __init__(self, output_path: Path):
+        self.output_path = output_path / self.name
+        # input directory whose subdirectories are mirrored in the outputs (see get_mirrored_input_dir)
+        self.input_dir = None
+
+    def set_up(self):
+        """Loads what the stage needs (e.g. a morphological analyzer), once per process."""
+
+    def start_file(self, file_path: str):
+        pass
+
+    def process_sentence(self, sentence: ConllSentence) -> ConllSentence:
+        return sentence
+
+    def end_file(self):
+        """Returns the results of the file, which are passed to save_results (they have to be picklable)."""
+        return None
+
+    def close_file(self, completed: bool = True):
+        """Releases what start_file opened; also called when processing the file fails (completed is then False)."""
+
+    def save_results(self, file_results: List[Tuple[str, object]]):
+        """Saves the (file path, end_file result) pairs of all files, in the main process."""
+
+class ConllOutputStage(PipelineStage, ABC):
+    """A stage that changes each sentence, then writes it to its CoNLL output file."""
+    def __init__(self, output_path: Path, compress: str = None):
+        super().__init__(output_path)
+        self.compression_suffix = get_compression_format_suffix(compress)
+        self.writer = None
+
+    def get_output_file_path(self, file_path: str) -> Path:
+        # compressed inputs are written uncompressed unless --compress is passed
+        return get_output_dir(self.output_path, file_path, self.input_dir) / f'{remove_compression_suffix(Path(file_path).name)}{self.compression_suffix}'
+
+    def start_file(self, file_path: str):
+        self.writer = ConllWriter(self.get_output_file_path(file_path))
+
+    def process_sentence(self, sentence: ConllSentence) -> ConllSentence:
+        sentence = self.transform(sentence)
+        self.writer.write(sentence)
+        return sentence
+
+    @abstractmethod
+    def transform(self, sentence: ConllSentence) -> ConllSentence:
+        """Changes the sentence before it is written; every output stage has to define it."""
+
+    def close_file(self, completed: bool = True):
+        if self.writer is not None:
+            # an incomplete output is not left under the output file name
+            if completed:
+                self.writer.close()
+            else:
+                self.writer.discard()
+            self.writer = None
+
+class CommaFixStage(ConllOutputStage):
+    """Same as comma_fix.py: reattaches commas, then normalizes particle and pronoun tags."""
+    name = 'comma_fix'
+
+    def start_file(self, file_path: str):
+        super().start_file(file_path)
+        self.failure_counts = Counter()
+
+    def transform(self, sentence: ConllSentence) -> ConllSentence:
+        sentence.df = fix_tree(sentence.df, self.failure_counts)
+        return sentence
+
+    def end_file(self) -> Counter:
+        return self.failure_counts
+
+    def save_results(self, file_results: List[Tuple[str, Counter]]):
+        for file_path, failure_counts in file_results:
+            if failure_counts:
+                print(f'{sum(failure_counts.values())} sentences of {Path(file_path).name} were not fully comma-fixed ({get_failure_summary(failure_counts)})')
+
+class TagNormalizationStage(ConllOutputStage):
+    """Normalizes particle and pronoun tags only (comma_fix already does it after fixing commas)."""
+    name = 'tags'
+
+    def transform(self, sentence: ConllSentence) -> ConllSentence:
+        fix_tags_and_labels(sentence.df)
+        return sentence
+
+class EnrichmentStage(ConllOutputStage):
+    """Same as catib_enrichment.py: converts tags and labels to CATiB+."""
+    name = 'catib_enrichment'
+
+    def __init__(self, output_path: Path, compress: str = None, map_version: str = '5'):
+        super().__init__(output_path, compress)
+        self.map_version = map_version
+        self.map_df = None
+
+    def set_up(self):
+        self.map_df = get_map_df(self.map_version)
+
+    def transform(self, sentence: ConllSentence) -> ConllSentence:
+        return enrich_sentence(sentence, self.map_df, print_all_possibilities=True)
+
+class StatsStage(PipelineStage):
+    """Same counts as conll_stats.py with all flags, saved to stats/counts.tsv."""
+    name = 'stats'
+    flag_functions = [get_pos_tag_counts, get_deprel_label_counts, get_word_level_counts_series,
+                      get_sentence_level_counts_series, get_leading_count_series]
+
+    def start_file(self, file_path: str):
+        self.file_counter = StreamedFileCounter(self.flag_functions)
+
+    def process_sentence(self, sentence: ConllSentence) -> ConllSentence:
+        self.file_counter.update(sentence.df)
+        return sentence
+
+    def end_file(self) -> DataFrame:
+        return self.file_counter.get_counts()
+
+    def save_results(self, file_results: List[Tuple[str, DataFrame]]):
+        df = DataFrame()
+        for file_path, file_df in file_results:
+            file_df['file_name'] = Path(file_path).name
+            df = concat([df, file_df])
+        df = adjust_df(df, {ev.value for ev in DataFrameStringHeaders}, get_full_column_list())
+        df.to_csv(self.output_path / 'counts.tsv', sep='\t', index=False)
+
+class WellformednessStage(PipelineStage):
+    """Same reports as wellformedness_checker.py."""
+    name = 'wellformedness'
+
+    def __init__(self, output_path: Path, morphology_db_type: str = 'r13'):
+        super().__init__(output_path)
+        self.morphology_db_type = morphology_db_type
+        self.analyzer = None
+
+    def set_up(self):
+        self.analyzer = set_up_analyzer(self.morphology_db_type)
+
+    def start_file(self, file_path: str):
+        self.all_errors = []
+        self.sentence_texts = {}
+        self.conllx_counts = {"sentence_count": 0, "token_count": 0, "word_count": 0}
+
+    def process_sentence(self, sentence: ConllSentence) -> ConllSentence:
+        sentence_errors = get_sentence_all_errors(sentence, self.analyzer)
+        if sentence_errors:
+            self.sentence_texts[sentence.sentence_id + 1] = sentence.text_line
+        self.all_errors += sentence_errors
+        update_conllx_counts(self.conllx_counts, sentence.df)
+        return sentence
+
+    def end_file(self) -> dict:
+        return {
+            "conllx_errors": self.all_errors,
+            "sentence_texts": self.sentence_texts,
+            "conllx_counts": self.conllx_counts
+            }
+
+    def save_results(self, file_results: List[Tuple[str, dict]]):
+        df_list, stats_dict_list = [], []
+        for file_path, errors_and_stats in file_results:
+            df, stats_dict = save_file_errors(file_path, errors_and_stats, self.output_path,
+                                              get_relative_output_dir(file_path, self.input_dir))
+            df_list.append(df)
+            stats_dict_list.append(stats_dict)
+        if df_list:
+            save_stats(self.output_path, df_list, stats_dict_list)
+
+STAGES = {
+    'comma_fix': CommaFixStage,
+    'tags': TagNormalizationStage,
+    'catib_enrichment': EnrichmentStage,
+    'stats': StatsStage,
+    'wellformedness': WellformednessStage,
+}
+
+def get_stages(stage_names: str, output_path: Path, compress: str = None,
+               map_version: str = '5', morphology_db_type: str = 'r13', input_dir: str = None) -> List[PipelineStage]:
+    """Creates the stages named in a comma-separated list, in the same order.
+
+    Args:
+        stage_names (str): e.g. comma_fix,stats,wellformedness
+        output_path (Path): directory under which each stage writes to its own directory
+        compress (str, optional): compression format of the CoNLL outputs. Defaults to None.
+        map_version (str, optional): version of the CATiB+ map file. Defaults to '5'.
+        morphology_db_type (str, optional): morphology database of the analyzer. Defaults to 'r13'.
+        input_dir (str, optional): input directory whose subdirectories are mirrored in the
+            outputs of each stage, see get_mirrored_input_dir. Defaults to None.
+
+    Returns:
+        List[PipelineStage]: the stages, not set up yet
+    """
+    stages = []
+    for stage_name in stage_names.split(','):
+        stage_name = stage_name.strip()
+        if stage_name not in STAGES:
+            raise ValueError(f'Unknown stage {stage_name}. Use one of: {", ".join(STAGES)}')
+        if stage_name in [stage.name for stage in stages]:
+            raise ValueError(f'Stage {stage_name} is listed more than once.')
+        stage_class = STAGES[stage_name]
+        if issubclass(stage_class, EnrichmentStage):
+            stages.append(stage_class(output_path, compress, map_version))
+        elif issubclass(stage_class, ConllOutputStage):
+            stages.append(stage_class(output_path, compress))
+        elif issubclass(stage_class, WellformednessStage):
+            stages.append(stage_class(output_path, morphology_db_type))
+        else:
+            stages.append(stage_class(output_path))
+        stages[-1].input_dir = input_dir
+    return stages
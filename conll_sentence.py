@@ -0,0 +1,56 @@
+"""Prints single sentences of a CoNLL file, e.g. the sentences flagged in a
+wellformedness report, without reading the whole file.
+
+A sentence index is saved next to the file the first time it is used
+(<file name>.index.npz), and rebuilt whenever the file changes.
+
+Usage:
+    conll_sentence (-i <input> | --input=<input>)
+        (-n <sentence_number> | --sentence_number=<sentence_number> | --sent_id=<sent_id>)...
+    conll_sentence (-h | --help)
+
+Options:
+    -i <input> --input=<input>
+        A CoNLL-U/X file
+    -n <sentence_number> --sentence_number=<sentence_number>
+        The number of the sentence, starting from 1, as in the sentence_number column of the wellformedness reports
+    --sent_id=<sent_id>
+        The sent_id comment of the sentence
+    -h --help
+        Show this screen.
+"""
+import sys
+
+from docopt import docopt
+
+from utils.conll_io import format_conll_sentence
+from utils.sentence_index import load_sentence_index
+
+arguments = docopt(__doc__)
+
+def main():
+    sentence_index = load_sentence_index(arguments['--input'])
+
+    sentence_count = sentence_index.get_sentence_count()
+    sentence_ids, not_found = [], []
+    for sentence_number in arguments['--sentence_number']:
+        if sentence_number.isdigit() and 1 <= int(sentence_number) <= sentence_count:
+            sentence_ids.append(int(sentence_number) - 1)
+        else:
+            not_found.append(f'sentence number {sentence_number} (the file has {sentence_count} sentences)')
+    for sent_id in arguments['--sent_id']:
+        try:
+            sentence_ids.append(sentence_index.get_sentence_id(sent_id))
+        except KeyError:
+            not_found.append(f'sent_id {sent_id}')
+
+    for sentence_id in sentence_ids:
+        sentence = sentence_index.get_sentence(sentence_id)
+        print(format_conll_sentence(sentence.comments, sentence.df), end='')
+    for sentence in not_found:
+        print(f'Sentence not found in {arguments["--input"]}: {sentence}', file=sys.stderr)
+    if not_found:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
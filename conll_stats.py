@@ -2,18 +2,30 @@
 Conll counts CLI.
 
 Usage:
-    counts_main (-i <input> | --input=<input>)
+    counts_main (-i <input> | --input=<input> | --manifest=<manifest>)
+                [-r | --recursive] [--include=<glob>]... [--exclude=<glob>]...
                 [-w | --words]
                 [-s | --sentences]
                 [-p | --pos_tags]
                 [-d | --deprel_labels]
                 [-l | --leading]
+                [--stream | --columnar | --cache]
+                [-j <jobs> | --jobs=<jobs>]
                 [((-o <output_path> | --output_path=<output_path>) <output_file_name>)]
     counts_main (-h | --help)
 
 Options:
     -i <input> --input=<input>
         A CoNLL-U/X file or a directory containing CoNLL-U/X files
+    --manifest=<manifest>
+        A file listing the CoNLL-U/X files to process, one path per line
+        (relative paths are relative to the manifest's directory); used instead of --input
+    -r --recursive
+        Also process the CoNLL-U/X files in subdirectories of the input directory
+    --include=<glob>
+        Only process files whose name or relative path matches this pattern (can be repeated)
+    --exclude=<glob>
+        Skip files and subdirectories whose name or relative path matches this pattern (can be repeated)
     
     Flags that specify which counts to produce (default: all):
         -w --words
@@ -27,6 +39,16 @@ Options:
         -l --leading
             get the counts for P-C and C-P (child-leading vs parent-leading)
 
+    --stream
+        Count one sentence at a time instead of loading whole files into memory
+    --columnar
+        Load each file into an array-backed corpus and count with array operations
+    --cache
+        Same as --columnar, but keep the parsed corpus in a <file name>.cache directory next to
+        each file, so that unchanged files are not parsed again on the next run
+    -j <jobs> --jobs=<jobs>
+        Number of files to process in parallel; 0 uses one process per CPU core [default: 1]
+
     -o <output_path> --output_path=<output_path>
         Output path to save the tsv counts file. If not specified, output will be printed to stdout.
     <output_file_name>
@@ -34,26 +56,41 @@ Options:
     -h --help
         Show this screen.
 """
-from typing import Callable, List, Set
-from pandas import concat, DataFrame, Series
+from typing import Callable, Iterable, List
+from pandas import concat, DataFrame
 from docopt import docopt
 
 from conllx_df.conllx_df import ConllxDf
 
-from conll_stats.enum_classes import DataFrameStringHeaders, DeprelLabels, PosTags, LeadTypes, SentenceLevelHeaders, WordLevelHeaders
+from conll_stats.counts_table import adjust_df, get_full_column_list
+from conll_stats.enum_classes import DataFrameStringHeaders
 from conll_stats.df_counts_functions import get_deprel_label_counts, get_leading_count_series, get_pos_tag_counts, get_word_level_counts_series, get_sentence_level_counts_series
-from utils.dir_utils import get_conll_files
-from utils.df_utils import set_numeric_columns_to_int, update_column_order
+from conll_stats.streamed_counts import StreamedFileCounter
+import conll_stats.corpus_counts_functions as corpus_counts
+from utils.corpus_cache import load_conll_corpus
+from utils.conll_io import read_conll_sentences
+from utils.dir_utils import get_input_files
+from utils.file_compression import is_compressed
+from utils.parallel import exit_if_failed, get_jobs, report_error, run_file_jobs
 arguments = docopt(__doc__)
 
 def get_flag_functions(arguments) -> List[Callable]:
-    flags_to_item_map = {
-        '--pos_tags': get_pos_tag_counts,
-        '--deprel_labels': get_deprel_label_counts,
-        '--words': get_word_level_counts_series,
-        '--sentences': get_sentence_level_counts_series,
-        '--leading': get_leading_count_series,
-    }
+    if arguments['--columnar'] or arguments['--cache']:
+        flags_to_item_map = {
+            '--pos_tags': corpus_counts.get_pos_tag_counts,
+            '--deprel_labels': corpus_counts.get_deprel_label_counts,
+            '--words': corpus_counts.get_word_level_counts_series,
+            '--sentences': corpus_counts.get_sentence_level_counts_series,
+            '--leading': corpus_counts.get_leading_count_series,
+        }
+    else:
+        flags_to_item_map = {
+            '--pos_tags': get_pos_tag_counts,
+            '--deprel_labels': get_deprel_label_counts,
+            '--words': get_word_level_counts_series,
+            '--sentences': get_sentence_level_counts_series,
+            '--leading': get_leading_count_series,
+        }
     
     # gets values from flags_to_item_map if user selected flags,
     # otherwise return all of the above values.
@@ -66,7 +103,7 @@ def get_file_counts(conll_df: DataFrame, flag_functions: List[Callable]) -> Data
     If POS and/or DEPREL labels are specified, add missing columns.
 
     Args:
-        conll_df (DataFrame): The DataFrame to get counts from
+        conll_df (DataFrame): The DataFrame (or ConllCorpus, for --columnar) to get counts from
         flags (List[Callable]): Functions of the desired flags
 
     Returns:
@@ -78,46 +115,51 @@ def get_file_counts(conll_df: DataFrame, flag_functions: List[Callable]) -> Data
 
     return DataFrame(concat(series_stats_list)).transpose()
 
-def get_full_column_list():
-    column_lists = [
-        [ev.value for ev in DataFrameStringHeaders],
-        [ev.value for ev in WordLevelHeaders],
-        [ev.value for ev in SentenceLevelHeaders],
-        [ev.value for ev in PosTags],
-        [ev.value for ev in DeprelLabels],
-        [ev.value for ev in LeadTypes],
-    ]
-    
-    # return single_columns + pos_tags + deprel_labels
-    return [header for sublist in column_lists for header in sublist]
-
-def adjust_df(df: DataFrame, string_columns: Set[str], full_column_list: List[str]) -> DataFrame:
-    """_summary_
+def get_streamed_file_counts(sen_dfs: Iterable[DataFrame], flag_functions: List[Callable]) -> DataFrame:
+    """Get counts of the selected flags one sentence at a time.
 
     Args:
-        df (DataFrame): _description_
-        string_columns (:obj:`Set`[:obj:`str`]): _description_
+        sen_dfs (Iterable[DataFrame]): the sentences to get counts from
+        flag_functions (List[Callable]): Functions of the desired flags
 
     Returns:
-        DataFrame: _description_
+        DataFrame: counts of the desired flags
     """
-    df.reset_index(inplace=True, drop=True)
-    df = set_numeric_columns_to_int(df, string_columns)
-    
-    return update_column_order(df, full_column_list)
+    file_counter = StreamedFileCounter(flag_functions)
+    for sen_df in sen_dfs:
+        file_counter.update(sen_df)
+    return file_counter.get_counts()
 
-def main():
-    ## get file(s) and flag functions
-    files = get_conll_files(arguments['--input'])
+def get_counts_of_file(file: str) -> DataFrame:
     flag_functions = get_flag_functions(arguments)
+    if arguments['--stream'] or (is_compressed(file) and not (arguments['--columnar'] or arguments['--cache'])):
+        # ConllxDf cannot read compressed files
+        sen_dfs = (sentence.df for sentence in read_conll_sentences(file))
+        file_df = get_streamed_file_counts(sen_dfs, flag_functions)
+    elif arguments['--columnar'] or arguments['--cache']:
+        file_df = get_file_counts(load_conll_corpus(file, arguments['--cache']), flag_functions)
+    else:
+        conll = ConllxDf(file)
+        file_df = get_file_counts(conll.df, flag_functions)
+    file_df['file_name'] = file.split('/')[-1]
+    return file_df
+
+def main():
+    ## get file(s)
+    files = get_input_files(arguments)
 
     ## set up counts DataFrame.
     df = DataFrame()
-    for file in files:
-        conll = ConllxDf(file)
-        file_df = get_file_counts(conll.df, flag_functions)
-        file_df['file_name'] = file.split('/')[-1]
-        df = concat([df, file_df])
+    failed_files = 0
+    for file_result in run_file_jobs(get_counts_of_file, files, get_jobs(arguments)):
+        if file_result.error:
+            report_error(file_result)
+            failed_files += 1
+            continue
+        df = concat([df, file_result.result])
+    # there is nothing to count if every file failed
+    if df.empty:
+        exit_if_failed(failed_files)
 
     df = adjust_df(df, {ev.value for ev in DataFrameStringHeaders}, get_full_column_list())
 
@@ -126,6 +168,7 @@ def main():
         df.to_csv(f"{arguments['--output_path']}/{arguments['<output_file_name>']}.tsv", sep='\t', index=False)
     else:
         print(df)
+    exit_if_failed(failed_files)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
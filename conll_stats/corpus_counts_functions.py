@@ -0,0 +1,105 @@
+"""Counts functions computed on a ConllCorpus.
+
+They give the same results as the functions in df_counts_functions, but
+work on integer arrays, and string tests (e.g. whether a form is a clitic)
+are run once per vocabulary entry rather than once per token.
+"""
+import re
+from typing import List
+
+import numpy as np
+from pandas import Series
+
+from conll_stats.df_counts_functions import add_missing_columns, get_sentence_length_series
+from conll_stats.enum_classes import DeprelLabels, PosTags, LeadTypes
+from utils.conll_corpus import ConllCorpus
+
+CLITIC_RE = re.compile(r'^\+(?:\w+|[،-٩]+)$|^(?:\w+|[،-٩]+)\+$')
+PLUS_TOKEN_RE = re.compile(r'^\++$')
+
+### base functions
+
+def get_vocab_mask(corpus: ConllCorpus, column_name: str, predicate) -> np.ndarray:
+    """Evaluates predicate once per vocabulary entry of a column, and returns
+    the result for every token in the corpus.
+    """
+    vocab_mask = np.fromiter((predicate(string) for string in corpus.vocabs[column_name].strings),
+                             dtype=bool, count=len(corpus.vocabs[column_name]))
+    return vocab_mask[corpus.columns[column_name]]
+
+def get_column_value_counts(corpus: ConllCorpus, column_name: str, values: List[str]) -> Series:
+    vocab = corpus.vocabs[column_name]
+    code_counts = np.bincount(corpus.columns[column_name], minlength=len(vocab))
+    counts = Series(code_counts, index=vocab.strings)
+    counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+    add_missing_columns(counts, values)
+    return counts
+
+def get_token_count(corpus: ConllCorpus) -> int:
+    return len(corpus)
+
+def get_word_count(corpus: ConllCorpus, word_column: str='FORM') -> int:
+    # excludes pro/enclitics, but not strings that contain the + sign i.e. +++
+    return int((~get_vocab_mask(corpus, word_column, lambda form: bool(CLITIC_RE.search(form)))).sum())
+
+def get_tokenized_word_count(corpus: ConllCorpus, word_column: str='FORM') -> int:
+    """Same as df_counts_functions.get_tokenized_word_count: a token is merged
+    with the previous one if the previous token ends with a + or the current
+    token starts with one, and merged words that contain a + are counted.
+    """
+    if not len(corpus):
+        return 0
+    # tokens that are only pluses eg. + or +++ are not merged with their neighbours
+    is_plus_token = get_vocab_mask(corpus, word_column, lambda form: bool(PLUS_TOKEN_RE.match(form)))
+    starts_with_plus = get_vocab_mask(corpus, word_column, lambda form: form.startswith('+')) & ~is_plus_token
+    ends_with_plus = get_vocab_mask(corpus, word_column, lambda form: form.endswith('+')) & ~is_plus_token
+    has_plus = get_vocab_mask(corpus, word_column, lambda form: '+' in form) & ~is_plus_token
+
+    word_starts = np.ones(len(corpus), dtype=bool)
+    word_starts[1:] = ~(ends_with_plus[:-1] | starts_with_plus[1:])
+    return int(np.logical_or.reduceat(has_plus, np.flatnonzero(word_starts)).sum())
+
+def get_sentence_count(corpus: ConllCorpus) -> int:
+    # the beginning of each tree is extracted (ID = 1), then counted
+    return int((corpus.ids == 1).sum())
+
+def get_sentence_lengths(corpus: ConllCorpus) -> List[int]:
+    # the ID of the token before each ID = 1 is the length of the previous tree,
+    # and the one before the first tree wraps around to the last token of the file.
+    last_items = corpus.ids[np.flatnonzero(corpus.ids == 1) - 1].tolist()
+    return last_items[1:] + [last_items[0]]
+
+################
+
+### extending base functions. These functions are specific to our data.
+
+def get_pos_tag_counts(corpus: ConllCorpus) -> Series:
+    column_values = [ev.value for ev in PosTags]
+    return get_column_value_counts(corpus, 'UPOS', column_values)
+
+def get_deprel_label_counts(corpus: ConllCorpus) -> Series:
+    column_values = [ev.value for ev in DeprelLabels]
+    return get_column_value_counts(corpus, 'DEPREL', column_values)
+
+def get_word_level_counts_series(corpus: ConllCorpus) -> Series:
+    return Series({'word_count': get_word_count(corpus),
+                'token_count': get_token_count(corpus),
+                'tokenized_word_count': get_tokenized_word_count(corpus)})
+
+def get_sentence_level_counts_series(corpus: ConllCorpus) -> Series:
+    sent_count = get_sentence_count(corpus)
+    sen_lengths = get_sentence_lengths(corpus)
+    return get_sentence_length_series(sent_count, max(sen_lengths), min(sen_lengths), sum(sen_lengths), len(sen_lengths))
+
+def get_leading_count_series(corpus: ConllCorpus) -> Series:
+    # if the childs ID is less than its parent ID, then the child leads the relationship.
+    c_p_count = int((corpus.ids < corpus.heads).sum())
+    counts = Series({'P-C': len(corpus) - c_p_count, 'C-P': c_p_count})
+    counts = counts[counts > 0]
+
+    column_values = [ev.value for ev in LeadTypes]
+
+    add_missing_columns(counts, column_values)
+    return counts
+
+################
@@ -0,0 +1,34 @@
+"""Combining the counts of several files into a single table."""
+from typing import List, Set
+from pandas import DataFrame
+
+from conll_stats.enum_classes import DataFrameStringHeaders, DeprelLabels, PosTags, LeadTypes, SentenceLevelHeaders, WordLevelHeaders
+from utils.df_utils import set_numeric_columns_to_int, update_column_order
+
+def get_full_column_list():
+    column_lists = [
+        [ev.value for ev in DataFrameStringHeaders],
+        [ev.value for ev in WordLevelHeaders],
+        [ev.value for ev in SentenceLevelHeaders],
+        [ev.value for ev in PosTags],
+        [ev.value for ev in DeprelLabels],
+        [ev.value for ev in LeadTypes],
+    ]
+    
+    # return single_columns + pos_tags + deprel_labels
+    return [header for sublist in column_lists for header in sublist]
+
+def adjust_df(df: DataFrame, string_columns: Set[str], full_column_list: List[str]) -> DataFrame:
+    """_summary_
+
+    Args:
+        df (DataFrame): _description_
+        string_columns (:obj:`Set`[:obj:`str`]): _description_
+
+    Returns:
+        DataFrame: _description_
+    """
+    df.reset_index(inplace=True, drop=True)
+    df = set_numeric_columns_to_int(df, string_columns)
+    
+    return update_column_order(df, full_column_list)
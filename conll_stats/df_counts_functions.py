@@ -1,3 +1,4 @@
+import re
 from typing import List
 from pandas import DataFrame, Series
 
@@ -45,6 +46,31 @@ def get_tokenized_word_count(df: DataFrame, word_column: str='FORM') -> int:
 
     return merged_tokens_series.str.contains('\+').sum()
 
+class TokenizedWordCounter:
+    """Counts tokenized words one sentence at a time.
+
+    Gives the same count as get_tokenized_word_count on the whole file:
+    a token is merged with the previous one if the previous token ends with
+    a + or the current token starts with one, including across sentences.
+    """
+    def __init__(self):
+        self.count = 0
+        self._prev_ends_with_plus = False
+        self._word_has_plus = None # None until the first token is seen
+
+    def update(self, forms: List[str]):
+        for form in forms:
+            if re.match(r'^\++$', form):
+                form = 'PLUS_TOKEN'
+            if self._word_has_plus is None or not (self._prev_ends_with_plus or form.startswith('+')):
+                self.count += int(bool(self._word_has_plus))
+                self._word_has_plus = False
+            self._word_has_plus = self._word_has_plus or '+' in form
+            self._prev_ends_with_plus = form.endswith('+')
+
+    def get_count(self) -> int:
+        return self.count + int(bool(self._word_has_plus))
+
 def get_sentence_count(df: DataFrame) -> int:
         """Get the number of sentences in the CoNLL-U/X file.
         The beginning of each tree is extracted (ID = 1), then counted
@@ -88,11 +114,17 @@ def get_word_level_counts_series(df: DataFrame) -> Series:
 def get_sentence_level_counts_series(df: DataFrame) -> Series:
     sent_count = get_sentence_count(df)
     sen_lengths = get_sentence_lengths(df)
+    return get_sentence_length_series(sent_count, max(sen_lengths), min(sen_lengths), sum(sen_lengths), len(sen_lengths))
+
+def get_sentence_length_series(sent_count: int, max_length: int, min_length: int, total_length: int, length_count: int) -> Series:
+    """Builds the sentence-level counts from running totals, so that they
+    can also be computed one sentence at a time.
+    """
     return Series({
         'sentence_count': sent_count,
-        'max_sentence_length': max(sen_lengths),
-        'min_sentence_length': min(sen_lengths),
-        'mean_sentence_length': sum(sen_lengths) / len(sen_lengths),
+        'max_sentence_length': max_length,
+        'min_sentence_length': min_length,
+        'mean_sentence_length': total_length / length_count,
     })
 
 
@@ -0,0 +1,55 @@
+"""Counting a CoNLL-U/X file one sentence at a time, so that memory does not
+grow with the size of the file.
+"""
+from typing import Callable, List
+from pandas import concat, DataFrame, Series
+
+from conll_stats.df_counts_functions import get_sentence_count, get_sentence_lengths, get_sentence_length_series, get_sentence_level_counts_series, get_word_level_counts_series, TokenizedWordCounter
+
+class StreamedFileCounter:
+    """Accumulates the counts of the selected flags over the sentences of a file.
+
+    Counts are summed over sentences, while sentence lengths are kept as
+    running totals. get_counts gives the same counts as calling the flag
+    functions on the DataFrame of the whole file.
+    """
+    def __init__(self, flag_functions: List[Callable]):
+        self.flag_functions = flag_functions
+        self.count_lengths = get_sentence_level_counts_series in flag_functions
+        # tokenized words can span sentences, so they are counted separately
+        self.word_counter = TokenizedWordCounter() if get_word_level_counts_series in flag_functions else None
+        self.summed_functions = [fn for fn in flag_functions if fn is not get_sentence_level_counts_series]
+        self.summed_counts = [Series(dtype=float) for _ in self.summed_functions]
+        self.sent_count, self.max_length, self.min_length, self.total_length, self.length_count = 0, 0, None, 0, 0
+
+    def update(self, sen_df: DataFrame):
+        for i, fn in enumerate(self.summed_functions):
+            self.summed_counts[i] = self.summed_counts[i].add(fn(sen_df), fill_value=0)
+        if self.word_counter is not None:
+            self.word_counter.update(list(sen_df['FORM']))
+        if not self.count_lengths:
+            return
+        self.sent_count += get_sentence_count(sen_df)
+        for sen_length in get_sentence_lengths(sen_df):
+            self.max_length = max(self.max_length, sen_length)
+            self.min_length = sen_length if self.min_length is None else min(self.min_length, sen_length)
+            self.total_length += sen_length
+            self.length_count += 1
+
+    def get_counts(self) -> DataFrame:
+        """Returns the counts of the sentences seen so far.
+
+        Returns:
+            DataFrame: counts of the desired flags
+        """
+        series_stats_list = []
+        for fn in self.flag_functions:
+            if fn is get_sentence_level_counts_series:
+                series_stats_list.append(get_sentence_length_series(self.sent_count, self.max_length, self.min_length, self.total_length, self.length_count))
+            else:
+                series_stats_list.append(self.summed_counts[self.summed_functions.index(fn)])
+        if self.word_counter is not None:
+            word_level_counts = self.summed_counts[self.summed_functions.index(get_word_level_counts_series)]
+            word_level_counts['tokenized_word_count'] = self.word_counter.get_count()
+
+        return DataFrame(concat(series_stats_list)).transpose()
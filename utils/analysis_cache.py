@@ -0,0 +1,99 @@
+"""Persistent cache of the morphological analyses of forms.
+
+Analyzing a form with camel_tools is by far the slowest part of the FORM/UPOS
+check, and the Analyzer's own cache is lost when the process exits. This cache
+keeps, for every form analyzed so far, the (atbtok, catib6) pairs of its
+analyses, which are all the FORM/UPOS check needs. It is stored as a JSON
+file per morphology database and camel_tools version, under
+~/.cache/camel_conll/analyses by default, and shared by all runs and workers.
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import camel_tools
+from camel_tools.morphology.analyzer import Analyzer
+
+from utils.analyzer import set_up_analyzer
+
+ANALYSIS_CACHE_VERSION = 1
+DEFAULT_ANALYSIS_CACHE_DIR = Path.home() / '.cache' / 'camel_conll' / 'analyses'
+
+def get_analysis_cache_path(morphology_db: str, cache_dir=None) -> Path:
+    """Returns the cache file of a morphology database; analyses of other
+    databases or camel_tools versions (whose databases can differ) are kept apart.
+    """
+    camel_tools_version = getattr(camel_tools, '__version__', 'unknown')
+    return Path(cache_dir or DEFAULT_ANALYSIS_CACHE_DIR) / f'{morphology_db}-{camel_tools_version}.json'
+
+def read_analysis_cache(cache_path: Path) -> Dict[str, List[Tuple[str, str]]]:
+    try:
+        with open(cache_path, encoding='utf-8') as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != ANALYSIS_CACHE_VERSION:
+        return {}
+    return {form: [tuple(pair) for pair in pairs] for form, pairs in cache['analyses'].items()}
+
+class FormAnalysisCache:
+    """The analyses of forms, looked up in a persistent cache and computed
+    with the analyzer only for the forms the cache does not have yet.
+
+    Args:
+        analyzer (Analyzer): cameltools analyzer
+        cache_path (Path): the cache file, as returned by get_analysis_cache_path
+    """
+    def __init__(self, analyzer: Analyzer, cache_path: Path):
+        self.analyzer = analyzer
+        self.cache_path = Path(cache_path)
+        self.analyses = read_analysis_cache(self.cache_path)
+        self.new_forms = set()
+
+    def analyze_form(self, form: str) -> List[Tuple[str, str]]:
+        pairs = {(analysis['atbtok'], analysis['catib6']) for analysis in self.analyzer.analyze(form)}
+        self.analyses[form] = sorted(pairs)
+        self.new_forms.add(form)
+        return self.analyses[form]
+
+    def get_analyses(self, form: str) -> List[Tuple[str, str]]:
+        """Returns the (atbtok, catib6) pairs of the analyses of form; an empty list means no analysis."""
+        analyses = self.analyses.get(form)
+        return analyses if analyses is not None else self.analyze_form(form)
+
+    def add_forms(self, forms: Iterable[str]) -> int:
+        """Analyzes the forms that are not in the cache yet, e.g. the unique forms of a file.
+
+        Returns:
+            int: the number of forms analyzed
+        """
+        missing_forms = [form for form in set(forms) if form not in self.analyses]
+        for form in missing_forms:
+            self.analyze_form(form)
+        return len(missing_forms)
+
+    def save(self):
+        """Writes the new analyses to the cache file. Entries written by other
+        processes in the meantime are kept, and the file is replaced in one
+        step, so a concurrent run never reads a partial file.
+        """
+        if not self.new_forms:
+            return
+        analyses = read_analysis_cache(self.cache_path)
+        analyses.update({form: self.analyses[form] for form in self.new_forms})
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(prefix=f'.{self.cache_path.name}.', dir=self.cache_path.parent)
+        try:
+            with os.fdopen(file_descriptor, 'w', encoding='utf-8') as cache_file:
+                json.dump({'version': ANALYSIS_CACHE_VERSION, 'analyses': analyses}, cache_file, ensure_ascii=False)
+            os.replace(temp_path, self.cache_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.analyses.update(analyses)
+        self.new_forms.clear()
+
+def set_up_analysis_cache(morphology_db: str, cache_dir=None) -> FormAnalysisCache:
+    return FormAnalysisCache(set_up_analyzer(morphology_db), get_analysis_cache_path(morphology_db, cache_dir))
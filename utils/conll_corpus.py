@@ -0,0 +1,326 @@
+"""Columnar, array-backed representation of a CoNLL-U/X corpus.
+
+ID and HEAD are stored as contiguous int32 arrays, and every other column
+as int32 codes into an interned Vocabulary, so a token costs a few dozen
+bytes instead of ten Python string objects in a DataFrame row.
+Sentences are delimited by sentence_offsets (sentence i spans tokens
+sentence_offsets[i]:sentence_offsets[i+1]), which gives zero-copy
+per-sentence views through numpy slicing.
+"""
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from utils.conll_io import CONLL_COLUMNS, ConllSentence, format_conll_sentence_lines, get_text_line, iter_sentence_lines
+from utils.file_compression import open_conll_file
+
+INT_COLUMNS = ['ID', 'HEAD']
+STRING_COLUMNS = [col for col in CONLL_COLUMNS if col not in INT_COLUMNS]
+ROOT_TOKEN_DETAILS = {"ID": 0, "FORM": "ROOT", "UPOS": "ROOT", "HEAD": -1, "DEPREL": "---"}
+# positions returned by get_head_positions for heads that are not tokens
+ROOT_HEAD_POSITION = -1
+MISSING_HEAD_POSITION = -2
+
+def get_head_positions(ids: np.ndarray, heads: np.ndarray, sentence_ids: np.ndarray) -> np.ndarray:
+    """Returns the position of the head of every token, i.e. of the first token
+    of the same sentence whose ID is the token's HEAD, as get_token_details finds it.
+
+    Args:
+        ids (np.ndarray): ID of every token
+        heads (np.ndarray): HEAD of every token
+        sentence_ids (np.ndarray): sentence of every token; tokens of a sentence are contiguous
+
+    Returns:
+        np.ndarray: the positions, or ROOT_HEAD_POSITION for heads that match no ID
+            and are 0, and MISSING_HEAD_POSITION for other heads that match no ID
+    """
+    if not len(ids):
+        return np.empty(0, dtype=np.int64)
+    sentence_ids, ids, heads = sentence_ids.astype(np.int64), ids.astype(np.int64), heads.astype(np.int64)
+    # (sentence, id) keys that do not collide between sentences
+    low = min(ids.min(), heads.min())
+    span = max(ids.max(), heads.max()) - low + 1
+    id_keys, first_positions = np.unique(sentence_ids * span + ids - low, return_index=True)
+    head_keys = sentence_ids * span + heads - low
+    key_index = np.minimum(np.searchsorted(id_keys, head_keys), len(id_keys) - 1)
+    return np.where(id_keys[key_index] == head_keys, first_positions[key_index],
+                    np.where(heads == 0, ROOT_HEAD_POSITION, MISSING_HEAD_POSITION))
+
+class Vocabulary:
+    """Interns the strings of a column, mapping each unique string to an
+    integer code in order of first appearance.
+    """
+    def __init__(self, strings: Iterable[str] = None):
+        self.strings: List[str] = []
+        self.codes: Dict[str, int] = {}
+        for string in strings or []:
+            self.get_code(string)
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def get_code(self, string: str) -> int:
+        """Returns the code of string, adding it to the vocabulary if it is new."""
+        code = self.codes.get(string)
+        if code is None:
+            code = self.codes[string] = len(self.strings)
+            self.strings.append(string)
+        return code
+
+    def lookup(self, string: str) -> int:
+        """Returns the code of string, or -1 if it is not in the vocabulary."""
+        return self.codes.get(string, -1)
+
+    def encode(self, strings: List[str]) -> array:
+        return array('i', [self.get_code(string) for string in strings])
+
+    def decode(self, codes: np.ndarray) -> List[str]:
+        strings = self.strings
+        return [strings[code] for code in codes.tolist()]
+
+    def get_string_array(self) -> np.ndarray:
+        """Returns the vocabulary as an object array, to decode codes in bulk with fancy indexing."""
+        return np.array(self.strings, dtype=object)
+
+@dataclass
+class CorpusSentence:
+    """A zero-copy view of one sentence of a ConllCorpus."""
+    corpus: 'ConllCorpus'
+    sentence_id: int
+    start: int
+    end: int
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.corpus.ids[self.start:self.end]
+
+    @property
+    def heads(self) -> np.ndarray:
+        return self.corpus.heads[self.start:self.end]
+
+    @property
+    def comments(self) -> List[str]:
+        return self.corpus.comments[self.sentence_id]
+
+    @property
+    def text_line(self) -> str:
+        return get_text_line(self.comments)
+
+    def get_codes(self, column_name: str) -> np.ndarray:
+        return self.corpus.columns[column_name][self.start:self.end]
+
+    def get_strings(self, column_name: str) -> List[str]:
+        if column_name in INT_COLUMNS:
+            return [str(value) for value in self.corpus.get_int_column(column_name)[self.start:self.end].tolist()]
+        return self.corpus.vocabs[column_name].decode(self.get_codes(column_name))
+
+    def get_token_index(self, token_id: int) -> int:
+        """Returns the position of the token with the given ID within the
+        sentence, or -1 if there is none.
+
+        IDs are normally 1..n, so the token is looked up directly, falling
+        back to a search when the IDs are not in order.
+        """
+        ids = self.ids
+        if 0 < token_id <= len(ids) and ids[token_id - 1] == token_id:
+            return token_id - 1
+        matches = np.flatnonzero(ids == token_id)
+        return int(matches[0]) if len(matches) else -1
+
+    def get_token_details(self, token_id: int) -> dict:
+        """Same as get_token_details in wellformedness.common_functions, without filtering a DataFrame."""
+        index = self.get_token_index(token_id)
+        if index != -1:
+            position = self.start + index
+            details = {col: self.corpus.vocabs[col].strings[self.corpus.columns[col][position]] for col in STRING_COLUMNS}
+            details['ID'] = int(self.corpus.ids[position])
+            details['HEAD'] = int(self.corpus.heads[position])
+            return {col: details[col] for col in CONLL_COLUMNS}
+        elif token_id == 0:
+            return dict(ROOT_TOKEN_DETAILS)
+        else:
+            return {}
+
+    def get_children_ids_of(self, token_id: int) -> List[int]:
+        return self.ids[self.heads == token_id].tolist()
+
+    def to_df(self) -> DataFrame:
+        """Returns the sentence as a DataFrame, in the same format as ConllxDf.get_df_by_id."""
+        return DataFrame({col: self.ids.astype(np.int64) if col == 'ID'
+                            else self.heads.astype(np.int64) if col == 'HEAD'
+                            else self.get_strings(col)
+                          for col in CONLL_COLUMNS})
+
+    def to_conll_sentence(self) -> ConllSentence:
+        return ConllSentence(self.sentence_id, self.comments, self.to_df())
+
+@dataclass
+class ConllCorpus:
+    """A CoNLL-U/X corpus stored column by column in numpy arrays.
+
+    Attributes:
+        ids (np.ndarray): int32 ID of every token in the corpus
+        heads (np.ndarray): int32 HEAD of every token in the corpus
+        columns (Dict[str, np.ndarray]): int32 codes of the string columns (FORM, LEMMA, UPOS, ...)
+        vocabs (Dict[str, Vocabulary]): vocabulary of each string column
+        sentence_offsets (np.ndarray): index of the first token of each sentence, plus the token count
+        comments (List[List[str]]): comment lines of each sentence
+    """
+    ids: np.ndarray
+    heads: np.ndarray
+    columns: Dict[str, np.ndarray]
+    vocabs: Dict[str, Vocabulary]
+    sentence_offsets: np.ndarray
+    comments: List[List[str]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the token arrays in bytes, excluding vocabularies and comments."""
+        return self.ids.nbytes + self.heads.nbytes + self.sentence_offsets.nbytes\
+            + sum(codes.nbytes for codes in self.columns.values())
+
+    def get_sentence_count(self) -> int:
+        return len(self.sentence_offsets) - 1
+
+    def get_sentence_lengths(self) -> np.ndarray:
+        return np.diff(self.sentence_offsets)
+
+    def get_token_sentence_ids(self) -> np.ndarray:
+        """Returns the sentence id of every token, for grouping tokens by sentence."""
+        return np.repeat(np.arange(self.get_sentence_count()), self.get_sentence_lengths())
+
+    def get_token_indexes(self) -> np.ndarray:
+        """Returns the position of every token within its sentence, starting from 0."""
+        return np.arange(len(self.ids)) - np.repeat(self.sentence_offsets[:-1], self.get_sentence_lengths())
+
+    def get_int_column(self, column_name: str) -> np.ndarray:
+        return self.ids if column_name == 'ID' else self.heads
+
+    def get_head_positions(self) -> np.ndarray:
+        """Returns the position in the corpus of the head of every token (see get_head_positions)."""
+        return get_head_positions(self.ids, self.heads, self.get_token_sentence_ids())
+
+    def get_strings(self, column_name: str) -> np.ndarray:
+        """Decodes a whole string column into an object array."""
+        return self.vocabs[column_name].get_string_array()[self.columns[column_name]]
+
+    def get_sentence(self, sentence_id: int) -> CorpusSentence:
+        start, end = self.sentence_offsets[sentence_id:sentence_id + 2].tolist()
+        return CorpusSentence(self, sentence_id, start, end)
+
+    def iter_sentences(self) -> Iterator[CorpusSentence]:
+        offsets = self.sentence_offsets.tolist()
+        for sentence_id in range(self.get_sentence_count()):
+            yield CorpusSentence(self, sentence_id, offsets[sentence_id], offsets[sentence_id + 1])
+
+    def select_sentences(self, sentence_ids: np.ndarray) -> 'ConllCorpus':
+        """Returns a corpus of some of the sentences, sharing the vocabularies of this one.
+
+        Args:
+            sentence_ids (np.ndarray): ids of the sentences, in increasing order; sentence i
+                of the new corpus is sentence sentence_ids[i] of this one
+        """
+        sentence_ids = np.asarray(sentence_ids, dtype=np.int64)
+        is_selected = np.zeros(self.get_sentence_count(), dtype=bool)
+        is_selected[sentence_ids] = True
+        is_selected_token = np.repeat(is_selected, self.get_sentence_lengths())
+        return ConllCorpus(ids=self.ids[is_selected_token],
+                           heads=self.heads[is_selected_token],
+                           columns={col: codes[is_selected_token] for col, codes in self.columns.items()},
+                           vocabs=self.vocabs,
+                           sentence_offsets=np.concatenate([[0], np.cumsum(self.get_sentence_lengths()[sentence_ids])]).astype(np.int64),
+                           comments=[self.comments[sentence_id] for sentence_id in sentence_ids.tolist()])
+
+    def get_conll_sentences(self) -> Iterator[ConllSentence]:
+        """Yields the sentences as ConllSentence objects, for code that works on DataFrames."""
+        for sentence in self.iter_sentences():
+            yield sentence.to_conll_sentence()
+
+    ## same accessors as ConllxDf
+    def get_df_by_id(self, sentence_id: int) -> DataFrame:
+        return self.get_sentence(sentence_id).to_df()
+
+    def get_comments_by_id(self, sentence_id: int) -> List[str]:
+        return self.comments[sentence_id]
+
+    def get_text_line_by_id(self, sentence_id: int) -> str:
+        return get_text_line(self.comments[sentence_id])
+
+    def to_df(self) -> DataFrame:
+        """Returns the whole corpus as a single DataFrame, like ConllxDf.df."""
+        return DataFrame({col: self.get_int_column(col).astype(np.int64) if col in INT_COLUMNS
+                            else self.get_strings(col)
+                          for col in CONLL_COLUMNS})
+
+    def write(self, file_path):
+        with open_conll_file(file_path, 'wt') as conll_file:
+            for sentence in self.iter_sentences():
+                token_rows = zip(*[sentence.get_strings(col) for col in CONLL_COLUMNS])
+                conll_file.write(format_conll_sentence_lines(sentence.comments, token_rows))
+
+    ## construction
+    @classmethod
+    def from_sentence_lines(cls, sentence_lines: Iterable[Tuple[List[str], List[str]]], vocabs: Dict[str, Vocabulary] = None) -> 'ConllCorpus':
+        """Builds a corpus from (comment lines, token lines) pairs, as yielded by iter_sentence_lines.
+
+        Args:
+            sentence_lines (Iterable[Tuple[List[str], List[str]]]): sentences as raw lines
+            vocabs (Dict[str, Vocabulary], optional): vocabularies to share with
+                other corpora, so that codes are comparable between them. Defaults to None.
+        """
+        return cls.from_token_rows(((comments, [line.split('\t') for line in token_lines])
+                                    for comments, token_lines in sentence_lines), vocabs)
+
+    @classmethod
+    def from_sentences(cls, sentences: Iterable[ConllSentence], vocabs: Dict[str, Vocabulary] = None) -> 'ConllCorpus':
+        """Builds a corpus from ConllSentence objects, e.g. from get_conll_sentences."""
+        return cls.from_token_rows(((sentence.comments, sentence.df[CONLL_COLUMNS].astype(str).values.tolist())
+                                    for sentence in sentences), vocabs)
+
+    @classmethod
+    def from_token_rows(cls, sentence_rows: Iterable[Tuple[List[str], List[List[str]]]], vocabs: Dict[str, Vocabulary] = None) -> 'ConllCorpus':
+        vocabs = vocabs if vocabs is not None else {col: Vocabulary() for col in STRING_COLUMNS}
+        int_values = {col: array('i') for col in INT_COLUMNS}
+        codes = {col: array('i') for col in STRING_COLUMNS}
+        offsets, comments = array('q', [0]), []
+        for sentence_comments, token_rows in sentence_rows:
+            for row in token_rows:
+                if len(row) != len(CONLL_COLUMNS):
+                    raise ValueError(f'Expected {len(CONLL_COLUMNS)} columns, found {len(row)}: {row}')
+            for col, values in zip(CONLL_COLUMNS, zip(*token_rows)):
+                if col in INT_COLUMNS:
+                    int_values[col].extend(int(value) for value in values)
+                else:
+                    codes[col].extend(vocabs[col].encode(values))
+            offsets.append(offsets[-1] + len(token_rows))
+            comments.append(sentence_comments)
+
+        return cls(ids=np.frombuffer(int_values['ID'], dtype=np.int32),
+                   heads=np.frombuffer(int_values['HEAD'], dtype=np.int32),
+                   columns={col: np.frombuffer(codes[col], dtype=np.int32) for col in STRING_COLUMNS},
+                   vocabs=vocabs,
+                   sentence_offsets=np.frombuffer(offsets, dtype=np.int64),
+                   comments=comments)
+
+def read_conll_corpus(file_path, vocabs: Dict[str, Vocabulary] = None) -> ConllCorpus:
+    """Reads a CoNLL-U/X file into a ConllCorpus, one sentence at a time.
+
+    Args:
+        file_path (str): path of the CoNLL-U/X file
+        vocabs (Dict[str, Vocabulary], optional): vocabularies to share with
+            other corpora. Defaults to None.
+
+    Returns:
+        ConllCorpus: the columnar corpus
+    """
+    with open_conll_file(file_path) as conll_file:
+        return ConllCorpus.from_sentence_lines(iter_sentence_lines(conll_file), vocabs)
@@ -0,0 +1,237 @@
+"""Sentence-at-a-time reading and writing of CoNLL-U/X files.
+
+Unlike ConllxDf, which loads the whole file into a single DataFrame, the
+functions below yield one sentence at a time, so memory stays bounded by
+the largest sentence in the file.
+"""
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+from pandas import DataFrame
+from conllx_df.conllx_df import ConllxDf
+
+from utils.file_compression import get_compression_suffix, is_compressed, open_conll_file, remove_compression_suffix
+
+CONLL_COLUMNS = ['ID', 'FORM', 'LEMMA', 'UPOS', 'XPOS', 'FEATS', 'HEAD', 'DEPREL', 'DEPS', 'MISC']
+
+@dataclass
+class ConllSentence:
+    """A single dependency tree along with its comment lines.
+
+    sentence_id is 0-based, matching the ids used by ConllxDf.get_df_by_id.
+    """
+    sentence_id: int
+    comments: List[str]
+    df: DataFrame
+    text_line: str = field(default=None)
+
+    def __post_init__(self):
+        if self.text_line is None:
+            self.text_line = get_text_line(self.comments)
+
+def get_text_line(comments: List[str]) -> str:
+    """Returns the sentence text from the '# text = ...' comment, if it exists.
+
+    Args:
+        comments (List[str]): comment lines of a sentence
+
+    Returns:
+        str: the sentence text, or an empty string if there is no text comment
+    """
+    for comment in comments:
+        if comment.startswith('# text'):
+            return comment.split('=', 1)[-1].strip()
+    return ''
+
+def get_sentence_df(token_lines: List[str]) -> DataFrame:
+    """Builds a sentence DataFrame from raw token lines.
+
+    Args:
+        token_lines (List[str]): tab-separated token lines of a single sentence
+
+    Returns:
+        DataFrame: sentence tokens, with integer ID and HEAD columns
+    """
+    df = DataFrame([line.split('\t') for line in token_lines], columns=CONLL_COLUMNS)
+    df['ID'] = df['ID'].astype(int)
+    df['HEAD'] = df['HEAD'].astype(int)
+    return df
+
+def iter_sentence_lines(conll_file: Iterable[str]) -> Iterator[tuple]:
+    """Yields the comment and token lines of each sentence in an open CoNLL file.
+
+    Args:
+        conll_file (Iterable[str]): an open CoNLL-U/X file, or any iterable of its lines
+
+    Yields:
+        tuple: (comment lines, token lines) of a single sentence
+    """
+    comments, token_lines = [], []
+    for line in conll_file:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            if token_lines:
+                yield comments, token_lines
+            comments, token_lines = [], []
+        elif line.startswith('#') and not token_lines:
+            comments.append(line)
+        else:
+            token_lines.append(line)
+    if token_lines:
+        yield comments, token_lines
+
+def iter_byte_range_lines(file_path, start: int, end: int = None) -> Iterator[str]:
+    """Yields the lines of a file between two byte offsets, which should be at line starts.
+
+    Args:
+        file_path (str): path of the file
+        start (int): offset of the first line
+        end (int, optional): offset to stop at. Defaults to the end of the file.
+
+    Yields:
+        str: the next decoded line
+    """
+    with open(file_path, 'rb') as binary_file:
+        binary_file.seek(start)
+        position = start
+        for line in binary_file:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            yield line.decode('utf-8')
+
+def read_conll_sentences(file_path, start: int = 0, end: int = None) -> Iterator[ConllSentence]:
+    """Reads a CoNLL-U/X file one sentence at a time.
+
+    Args:
+        file_path (str): path of the CoNLL-U/X file
+        start (int, optional): byte offset to start reading from, at a sentence boundary. Defaults to 0.
+        end (int, optional): byte offset to stop reading at, at a sentence boundary. Defaults to None.
+
+    Yields:
+        ConllSentence: the next sentence in the file; sentence ids start from 0 at start
+    """
+    if start == 0 and end is None:
+        with open_conll_file(file_path) as conll_file:
+            yield from get_sentences_from_lines(conll_file)
+    elif is_compressed(file_path):
+        raise ValueError(f'Cannot read a byte range of the compressed file {file_path}.')
+    else:
+        yield from get_sentences_from_lines(iter_byte_range_lines(file_path, start, end))
+
+def get_sentences_from_lines(lines: Iterable[str]) -> Iterator[ConllSentence]:
+    for sentence_id, (comments, token_lines) in enumerate(iter_sentence_lines(lines)):
+        yield ConllSentence(sentence_id, comments, get_sentence_df(token_lines))
+
+def get_conllx_df_sentences(conllx) -> Iterator[ConllSentence]:
+    """Yields the sentences of an already loaded ConllxDf object.
+
+    Allows tools to process ConllxDf and streamed input with the same code.
+
+    Args:
+        conllx (ConllxDf): a loaded CoNLL file
+
+    Yields:
+        ConllSentence: the next sentence in the file
+    """
+    for sentence_id in range(conllx.get_sentence_count()):
+        yield ConllSentence(sentence_id,
+                            conllx.get_comments_by_id(sentence_id),
+                            conllx.get_df_by_id(sentence_id),
+                            conllx.get_text_line_by_id(sentence_id))
+
+def get_conll_sentences(file_path, stream: bool = False) -> Iterator[ConllSentence]:
+    """Yields the sentences of a CoNLL file, either streamed or through ConllxDf.
+
+    Args:
+        file_path (str): path of the CoNLL-U/X file
+        stream (bool, optional): read one sentence at a time instead of loading
+            the whole file. Compressed files are always streamed. Defaults to False.
+
+    Yields:
+        ConllSentence: the next sentence in the file
+    """
+    if stream or is_compressed(file_path):
+        yield from read_conll_sentences(file_path)
+    else:
+        yield from get_conllx_df_sentences(ConllxDf(file_path))
+
+def format_conll_sentence_lines(comments: List[str], token_rows: Iterable) -> str:
+    """Returns a sentence in CoNLL format, including the blank line that ends it."""
+    token_lines = ['\t'.join(str(value) for value in row) for row in token_rows]
+    return '\n'.join(comments + token_lines) + '\n\n'
+
+def format_conll_sentence(comments: List[str], df: DataFrame) -> str:
+    return format_conll_sentence_lines(comments, df[CONLL_COLUMNS].itertuples(index=False))
+
+def get_partial_path(file_path) -> Path:
+    """Returns the file an output is written to until it is complete. It is hidden, so
+    that a directory of outputs is not read as input, and keeps the compression extension.
+    """
+    file_path = Path(file_path)
+    return file_path.parent / f'.{remove_compression_suffix(file_path.name)}.partial{get_compression_suffix(file_path)}'
+
+class ConllWriter:
+    """Writes sentences to a CoNLL file one at a time.
+
+    Sentences are written to a partial file next to file_path (see
+    get_partial_path), which replaces file_path when the writer is closed.
+    So file_path only ever holds a complete output, and it can be the file
+    the sentences are being read from. If writing fails, the partial file
+    is removed. The output is compressed if file_path has a compression
+    extension (e.g. .gz).
+
+    Usage:
+        with ConllWriter(file_path) as writer:
+            for sentence in sentences:
+                writer.write(sentence)
+    """
+    def __init__(self, file_path):
+        """
+        Args:
+            file_path (str): path of the output file
+        """
+        self.file_path = Path(file_path)
+        self.partial_path = get_partial_path(self.file_path)
+        self.sentence_count = 0
+        self._conll_file = open_conll_file(self.partial_path, 'wt')
+
+    def __enter__(self) -> 'ConllWriter':
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write(self, sentence: ConllSentence):
+        self.write_lines(format_conll_sentence(sentence.comments, sentence.df))
+
+    def write_lines(self, sentence_lines: str):
+        """Writes a sentence that is already formatted, e.g. by format_conll_sentence."""
+        self._conll_file.write(sentence_lines)
+        self.sentence_count += 1
+
+    def close(self):
+        """Finishes the output: the partial file replaces file_path."""
+        self._conll_file.close()
+        os.replace(self.partial_path, self.file_path)
+
+    def discard(self):
+        """Abandons the output, leaving file_path as it was."""
+        self._conll_file.close()
+        self.partial_path.unlink(missing_ok=True)
+
+def write_conll_sentences(file_path, sentences: Iterable[ConllSentence]):
+    """Writes sentences to a CoNLL file as they are produced.
+
+    Args:
+        file_path (str): path of the output file
+        sentences (Iterable[ConllSentence]): sentences to write
+    """
+    with ConllWriter(file_path) as writer:
+        for sentence in sentences:
+            writer.write(sentence)
@@ -0,0 +1,129 @@
+"""Splitting single CoNLL files into shards that can be processed in parallel.
+
+A file is split at blank lines (sentence boundaries) close to equally
+spaced byte offsets. Each shard is read with read_conll_sentences(file,
+start, end), and its sentence ids start from 0, so callers that report
+sentence numbers offset them by the sentence counts of the previous shards
+when merging.
+"""
+import os
+import shutil
+from dataclasses import dataclass
+from itertools import groupby
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+from utils.conll_io import ConllSentence, get_partial_path, read_conll_sentences
+from utils.file_compression import is_compressed, open_conll_file
+from utils.parallel import FileResult
+
+@dataclass
+class FileShard:
+    file_path: str
+    shard_id: int
+    shard_count: int
+    start: int = 0
+    end: int = None
+
+    def is_whole_file(self) -> bool:
+        return self.shard_count == 1
+
+    def read_sentences(self) -> Iterator[ConllSentence]:
+        return read_conll_sentences(self.file_path, self.start, self.end)
+
+    def __str__(self) -> str:
+        return str(self.file_path) if self.is_whole_file() else f'{self.file_path} (shard {self.shard_id + 1}/{self.shard_count})'
+
+def get_shard_count(arguments) -> int:
+    shard_count = int(arguments['--shards'])
+    if shard_count < 1:
+        raise ValueError('--shards should be a positive number.')
+    return shard_count
+
+def get_shard_offsets(file_path, shard_count: int) -> List[int]:
+    """Returns the byte offsets that split a file into at most shard_count shards.
+
+    Each offset, except the first and last, is right after the first blank
+    line found from an equally spaced position in the file.
+
+    Args:
+        file_path (str): path of the CoNLL file
+        shard_count (int): number of shards to aim for
+
+    Returns:
+        List[int]: increasing offsets, starting with 0 and ending with the file size
+    """
+    file_size = os.path.getsize(file_path)
+    offsets = [0]
+    with open(file_path, 'rb') as binary_file:
+        for shard_id in range(1, shard_count):
+            target = max(file_size * shard_id // shard_count, offsets[-1])
+            binary_file.seek(target)
+            # skip the (possibly partial) line at the target, then find the end of the sentence
+            binary_file.readline()
+            for line in iter(binary_file.readline, b''):
+                if not line.strip():
+                    break
+            offset = binary_file.tell()
+            if offsets[-1] < offset < file_size:
+                offsets.append(offset)
+    offsets.append(file_size)
+    return offsets
+
+def get_file_shards(files: Iterable[str], shard_count: int = 1) -> Iterator[FileShard]:
+    """Lazily splits every file into shards, keeping the order of the files.
+
+    Args:
+        files (Iterable[str]): paths of the CoNLL files
+        shard_count (int, optional): number of shards per file. Defaults to 1 (no splitting).
+            Compressed files cannot be read from an offset, so they are never split.
+
+    Yields:
+        FileShard: the next shard
+    """
+    for file_path in files:
+        if shard_count == 1 or is_compressed(file_path):
+            yield FileShard(file_path, 0, 1)
+            continue
+        offsets = get_shard_offsets(file_path, shard_count)
+        for shard_id, (start, end) in enumerate(zip(offsets, offsets[1:])):
+            yield FileShard(file_path, shard_id, len(offsets) - 1, start, end)
+
+def group_shard_results(shard_results: Iterable[FileResult]) -> Iterator[Tuple[str, List, List[FileResult]]]:
+    """Groups the results of consecutive shards of the same file.
+
+    Args:
+        shard_results (Iterable[FileResult]): results of run_file_jobs over FileShard items
+
+    Yields:
+        Tuple[str, List, List[FileResult]]: file path, results of its shards in order,
+            and the failed shards (the results are incomplete if there are any)
+    """
+    for file_path, file_results in groupby(shard_results, key=lambda file_result: file_result.item.file_path):
+        file_results = list(file_results)
+        yield file_path, [file_result.result for file_result in file_results], \
+            [file_result for file_result in file_results if file_result.error]
+
+def get_part_path(output_path: Path, shard_id: int) -> Path:
+    # hidden, so that a directory of outputs is not read as input if processing is interrupted
+    return output_path.parent / f'.{output_path.name}.part{shard_id}'
+
+def concatenate_parts(output_path: Path, shard_count: int):
+    """Concatenates the output files of the shards of a file into output_path, then deletes them.
+    The parts are never compressed, while output_path is if it has a compression extension.
+    Like ConllWriter, output_path is only replaced once the whole output is written.
+    """
+    partial_path = get_partial_path(output_path)
+    try:
+        with open_conll_file(partial_path, 'wb') as output_file:
+            for shard_id in range(shard_count):
+                with open(get_part_path(output_path, shard_id), 'rb') as part_file:
+                    shutil.copyfileobj(part_file, output_file)
+        os.replace(partial_path, output_path)
+    finally:
+        partial_path.unlink(missing_ok=True)
+    remove_parts(output_path, shard_count)
+
+def remove_parts(output_path: Path, shard_count: int):
+    for shard_id in range(shard_count):
+        get_part_path(output_path, shard_id).unlink(missing_ok=True)
@@ -0,0 +1,145 @@
+"""On-disk cache of parsed ConllCorpus objects.
+
+Each CoNLL file gets a sidecar directory (<file name>.cache, next to the
+file by default) holding its columnar arrays as .npy files, which are
+memory-mapped on load, and a meta.json with the vocabularies, comments and
+the size/mtime/hash of the file they were parsed from.
+
+A cache entry is used when the file's size and mtime match. If only the
+mtime changed (e.g. the file was copied or touched), the content hash is
+compared before deciding to re-parse.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from utils.conll_corpus import STRING_COLUMNS, ConllCorpus, Vocabulary, read_conll_corpus
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = '.cache'
+META_FILE_NAME = 'meta.json'
+
+def get_cache_path(file_path, cache_dir=None) -> Path:
+    file_path = Path(file_path)
+    return Path(cache_dir or file_path.parent) / f'{file_path.name}{CACHE_SUFFIX}'
+
+def get_file_hash(file_path) -> str:
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as conll_file:
+        for chunk in iter(lambda: conll_file.read(1 << 20), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+def read_cache_meta(cache_path: Path) -> dict:
+    try:
+        with open(cache_path / META_FILE_NAME, encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == CACHE_VERSION else None
+
+def is_cache_valid(meta: dict, file_path, cache_path: Path) -> bool:
+    """Checks whether a cache entry was built from the current content of file_path.
+
+    Args:
+        meta (dict): cache metadata, as read by read_cache_meta
+        file_path (str): path of the CoNLL file
+        cache_path (Path): cache directory of the file
+
+    Returns:
+        bool: True if the cache can be used
+    """
+    file_stat = os.stat(file_path)
+    if meta is None or meta['size'] != file_stat.st_size:
+        return False
+    if meta['mtime_ns'] == file_stat.st_mtime_ns:
+        return True
+    if meta['hash'] != get_file_hash(file_path):
+        return False
+    # same content, so only the recorded mtime needs updating
+    meta['mtime_ns'] = file_stat.st_mtime_ns
+    try:
+        write_cache_meta(cache_path, meta)
+    except OSError:
+        pass
+    return True
+
+def write_cache_meta(cache_path: Path, meta: dict):
+    with open(cache_path / META_FILE_NAME, 'w', encoding='utf-8') as meta_file:
+        json.dump(meta, meta_file, ensure_ascii=False)
+
+def load_cached_corpus(cache_path: Path, meta: dict) -> ConllCorpus:
+    def load_array(name):
+        return np.load(cache_path / f'{name}.npy', mmap_mode='r')
+
+    return ConllCorpus(ids=load_array('ID'),
+                       heads=load_array('HEAD'),
+                       columns={col: load_array(col) for col in STRING_COLUMNS},
+                       vocabs={col: Vocabulary(meta['vocabs'][col]) for col in STRING_COLUMNS},
+                       sentence_offsets=load_array('sentence_offsets'),
+                       comments=meta['comments'])
+
+def save_corpus_cache(corpus: ConllCorpus, file_path, cache_path: Path, file_stat: os.stat_result):
+    """Writes the cache of a corpus. The entry is written to a temporary
+    directory first, then moved into place, so a concurrent or interrupted
+    run never sees a partial entry.
+
+    Args:
+        corpus (ConllCorpus): the parsed file
+        file_path (str): path of the CoNLL file
+        cache_path (Path): cache directory of the file
+        file_stat (os.stat_result): stat of the file taken before it was parsed
+    """
+    meta = {
+        'version': CACHE_VERSION,
+        'size': file_stat.st_size,
+        'mtime_ns': file_stat.st_mtime_ns,
+        'hash': get_file_hash(file_path),
+        'vocabs': {col: corpus.vocabs[col].strings for col in STRING_COLUMNS},
+        'comments': corpus.comments,
+    }
+    arrays = {'ID': corpus.ids, 'HEAD': corpus.heads, 'sentence_offsets': corpus.sentence_offsets, **corpus.columns}
+
+    temp_path = Path(tempfile.mkdtemp(prefix=f'.{cache_path.name}.', dir=cache_path.parent))
+    try:
+        for name, values in arrays.items():
+            np.save(temp_path / f'{name}.npy', values)
+        write_cache_meta(temp_path, meta)
+        shutil.rmtree(cache_path, ignore_errors=True)
+        os.replace(temp_path, cache_path)
+    finally:
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+def load_conll_corpus(file_path, use_cache: bool = False, cache_dir=None) -> ConllCorpus:
+    """Loads a CoNLL file as a ConllCorpus, using the on-disk cache if requested.
+
+    Args:
+        file_path (str): path of the CoNLL-U/X file
+        use_cache (bool, optional): load from, and save to, the cache. Defaults to False.
+        cache_dir (str, optional): directory to keep cache entries in,
+            instead of next to the CoNLL file. Defaults to None.
+
+    Returns:
+        ConllCorpus: the parsed corpus; arrays loaded from the cache are read-only memory maps
+    """
+    if not use_cache:
+        return read_conll_corpus(file_path)
+
+    cache_path = get_cache_path(file_path, cache_dir)
+    meta = read_cache_meta(cache_path)
+    if is_cache_valid(meta, file_path, cache_path):
+        return load_cached_corpus(cache_path, meta)
+
+    file_stat = os.stat(file_path)
+    corpus = read_conll_corpus(file_path)
+    try:
+        save_corpus_cache(corpus, file_path, cache_path, file_stat)
+    except OSError as e:
+        # e.g. a read-only corpus directory; the corpus is still usable
+        print(f'Could not write cache for {file_path}: {e}')
+    return corpus
@@ -1,6 +1,10 @@
 
 import os
-from typing import List
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Iterator, List
+
+from utils.file_compression import remove_compression_suffix
 
 def get_files(input_path: str) -> List[str]:
     # return one or more file_paths in a list,
@@ -13,6 +17,8 @@ def get_files(input_path: str) -> List[str]:
         return [input_path]
 
 def is_conll(f: str) -> bool:
+    # compressed files, e.g. .conllx.gz, are also accepted
+    f = remove_compression_suffix(f)
     return f.endswith('.conllx') or f.endswith('.conllu')
 
 def get_conll_files(input_arg: str) -> List[str]:
@@ -20,6 +26,135 @@ def get_conll_files(input_arg: str) -> List[str]:
     all_files = [input_arg] if os.path.isfile(input_arg) else get_files(input_arg)
     return [file for file in all_files if is_conll(file)]
 
+def matches_any(relative_path: str, patterns: List[str]) -> bool:
+    # a pattern can match either the path relative to the input directory or the file name
+    return any(fnmatch(relative_path, pattern) or fnmatch(os.path.basename(relative_path), pattern)
+               for pattern in patterns)
+
+def is_selected(relative_path: str, include: List[str], exclude: List[str]) -> bool:
+    return (not include or matches_any(relative_path, include)) and not matches_any(relative_path, exclude)
+
+def iter_dir_files(dir_path: str, recursive: bool = False, exclude: List[str] = None, relative_dir: str = '') -> Iterator[str]:
+    """Lazily yields the files of a directory, sorted by name within each directory.
+
+    Uses os.scandir, so file types are usually known without a stat per entry,
+    and files are yielded before subdirectories are listed.
+
+    Args:
+        dir_path (str): the directory
+        recursive (bool, optional): also yield the files of subdirectories. Defaults to False.
+        exclude (List[str], optional): glob patterns of subdirectories to skip. Defaults to None.
+        relative_dir (str, optional): path of dir_path relative to the top directory, used to match exclude.
+
+    Yields:
+        str: the next file path
+    """
+    with os.scandir(dir_path) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+    sub_dirs = []
+    for entry in entries:
+        if entry.is_file():
+            yield entry.path
+        elif recursive and entry.is_dir() and not entry.name.startswith('.'):
+            sub_dirs.append(entry)
+    for entry in sub_dirs:
+        relative_path = os.path.join(relative_dir, entry.name)
+        if not matches_any(relative_path, exclude or []):
+            yield from iter_dir_files(entry.path, recursive, exclude, relative_path)
+
+def read_manifest(manifest_path: str) -> Iterator[str]:
+    """Yields the file paths listed in a manifest, one per line, as they are written.
+    Blank lines and lines starting with # are skipped.
+    """
+    with open(manifest_path, encoding='utf-8') as manifest_file:
+        for line in manifest_file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+def iter_conll_files(input_arg: str = None, recursive: bool = False, include: List[str] = None,
+                     exclude: List[str] = None, manifest: str = None) -> Iterator[str]:
+    """Lazily yields the CoNLL files of a file, directory, or manifest, so that
+    processing can start before the whole directory tree is listed.
+
+    Args:
+        input_arg (str, optional): a CoNLL file or a directory. Defaults to None.
+        recursive (bool, optional): include files in subdirectories. Defaults to False.
+        include (List[str], optional): only yield files matching one of these glob patterns. Defaults to None.
+        exclude (List[str], optional): skip files and subdirectories matching one of these glob patterns. Defaults to None.
+        manifest (str, optional): a file listing the files to yield, used instead of input_arg. Defaults to None.
+
+    Yields:
+        str: the next file path
+    """
+    include, exclude = include or [], exclude or []
+    if manifest:
+        # the manifest is trusted to list CoNLL files;
+        # relative paths are relative to the directory of the manifest
+        manifest_dir = Path(manifest).parent
+        for file in read_manifest(manifest):
+            if is_selected(file, include, exclude):
+                yield str(manifest_dir / file)
+    elif os.path.isfile(input_arg):
+        if is_conll(input_arg) and is_selected(os.path.basename(input_arg), include, exclude):
+            yield input_arg
+    else:
+        for file in iter_dir_files(input_arg, recursive, exclude):
+            if is_conll(file) and is_selected(os.path.relpath(file, input_arg), include, exclude):
+                yield file
+
+def get_mirrored_input_dir(arguments) -> str:
+    """Returns the input directory whose subdirectories are mirrored in the output
+    directory by tools with per-file outputs: --input with --recursive, otherwise None.
+    """
+    if arguments['--recursive'] and not arguments['--manifest'] and os.path.isdir(arguments['--input']):
+        return arguments['--input']
+    return None
+
+def get_relative_output_dir(file: str, input_dir: str = None) -> str:
+    """Returns the directory of file relative to input_dir (as returned by get_mirrored_input_dir),
+    which is where its outputs go within the output directory; '' for files directly under it.
+    """
+    if input_dir is None:
+        return ''
+    relative_dir = os.path.relpath(os.path.dirname(file), input_dir)
+    return '' if relative_dir == os.curdir else relative_dir
+
+def get_output_dir(output_path, file: str, input_dir: str = None) -> Path:
+    """Returns (and creates) the directory of the outputs of an input file, see get_relative_output_dir."""
+    output_dir = Path(output_path) / get_relative_output_dir(file, input_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return output_dir
+
+def get_input_files(arguments, unique_output_names: bool = False) -> Iterator[str]:
+    """Lazily yields the input files selected by the discovery options of a CLI
+    (--input, --recursive, --include, --exclude and --manifest).
+
+    Args:
+        arguments (dict): the docopt arguments
+        unique_output_names (bool, optional): for tools that write outputs named after
+            each input file (without its extensions, see remove_file_name_extension), in
+            the output directory or, with --recursive, in the same subdirectory of it as
+            the input file (see get_output_dir). A file whose outputs would overwrite those
+            of an earlier one, e.g. x.conllx and x.conllx.gz, or two files of the same name
+            in a manifest, raises a ValueError. Defaults to False.
+
+    Raises:
+        ValueError: if two files have the same outputs
+    """
+    input_dir = get_mirrored_input_dir(arguments) if unique_output_names else None
+    seen_names = {}
+    for file in iter_conll_files(arguments['--input'], arguments['--recursive'], arguments['--include'],
+                                 arguments['--exclude'], arguments['--manifest']):
+        if unique_output_names:
+            output_name = os.path.join(get_relative_output_dir(file, input_dir), remove_file_name_extension(os.path.basename(file)))
+            if output_name in seen_names:
+                raise ValueError(f'{file} and {seen_names[output_name]} would have the same outputs ({output_name}); '
+                                 'rename one of them or select one with --include/--exclude.')
+            seen_names[output_name] = file
+        yield file
+
 def remove_file_name_extension(file_name):
     # remove the extension, taking into account multiple . found in the name
-    return '.'.join(file_name.split('.')[:-1])
\ No newline at end of file
+    # and a compression extension, e.g. .conllx.gz
+    return '.'.join(remove_compression_suffix(file_name).split('.')[:-1])
\ No newline at end of file
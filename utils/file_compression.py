@@ -0,0 +1,70 @@
+"""Reading and writing compressed CoNLL files (.gz, .bz2, .xz and .zst).
+
+The compression format is chosen from the file extension, e.g.
+train.conllx.gz. Files are decompressed as they are read, so there is
+no need to decompress them to disk first.
+zstandard is only needed for .zst files (pip install zstandard).
+"""
+import bz2
+import gzip
+import lzma
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_SUFFIXES = ['.gz', '.bz2', '.xz', '.zst']
+
+def get_compression_suffix(file_path) -> str:
+    """Returns the compression extension of a file, or an empty string if it is not compressed."""
+    suffix = Path(file_path).suffix
+    return suffix if suffix in COMPRESSION_SUFFIXES else ''
+
+def is_compressed(file_path) -> bool:
+    return bool(get_compression_suffix(file_path))
+
+def remove_compression_suffix(file_name: str) -> str:
+    suffix = get_compression_suffix(file_name)
+    return file_name[:-len(suffix)] if suffix else file_name
+
+def get_compression_format_suffix(compression_format: str) -> str:
+    """Returns the file extension of a compression format passed on the command line (e.g. gz or .gz).
+
+    Args:
+        compression_format (str): the compression format, or None for uncompressed files
+
+    Returns:
+        str: the extension, or an empty string for uncompressed files
+    """
+    if not compression_format:
+        return ''
+    suffix = compression_format if compression_format.startswith('.') else f'.{compression_format}'
+    if suffix not in COMPRESSION_SUFFIXES:
+        raise ValueError(f'Unknown compression format {compression_format}. Use one of: {", ".join(s[1:] for s in COMPRESSION_SUFFIXES)}')
+    return suffix
+
+def open_conll_file(file_path, mode: str = 'rt'):
+    """Opens a file, compressed or not, depending on its extension.
+
+    Args:
+        file_path (str): path of the file
+        mode (str, optional): 'rt', 'wt', 'rb' or 'wb'. Defaults to 'rt'.
+
+    Returns:
+        file object: text modes use utf-8
+    """
+    encoding = 'utf-8' if 't' in mode else None
+    suffix = get_compression_suffix(file_path)
+    if suffix == '.gz':
+        return gzip.open(file_path, mode, encoding=encoding)
+    elif suffix == '.bz2':
+        return bz2.open(file_path, mode, encoding=encoding)
+    elif suffix == '.xz':
+        return lzma.open(file_path, mode, encoding=encoding)
+    elif suffix == '.zst':
+        if zstandard is None:
+            raise ImportError(f'zstandard is required to read or write {file_path}. Install it with: pip install zstandard')
+        return zstandard.open(file_path, mode, encoding=encoding)
+    return open(file_path, mode, encoding=encoding)
@@ -0,0 +1,88 @@
+"""File-level parallelism shared by the CLIs.
+
+run_file_jobs applies a function to every file, in a process pool when more
+than one job is requested, and yields the results in input order so that
+outputs aggregated by the caller are identical to a serial run.
+An exception raised while processing a file is recorded in that file's
+result instead of stopping the batch.
+"""
+import os
+import sys
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator
+
+@dataclass
+class FileResult:
+    item: Any
+    result: Any = None
+    error: str = None
+
+def get_jobs(arguments) -> int:
+    """Returns the number of processes requested with --jobs (0 means one per core)."""
+    jobs = int(arguments['--jobs'])
+    if jobs < 0:
+        raise ValueError('--jobs should be 0 or a positive number.')
+    return jobs
+
+def get_file_result(fn: Callable, item) -> FileResult:
+    try:
+        return FileResult(item, result=fn(item))
+    except Exception:
+        return FileResult(item, error=traceback.format_exc())
+
+def report_error(file_result: FileResult):
+    print(f'Error processing {file_result.item}:\n{file_result.error}', file=sys.stderr)
+
+def exit_if_failed(failed_files: int):
+    """Exits with status 1 if any file failed, once the other files are done, so that scripted runs notice."""
+    if failed_files:
+        print(f'{failed_files} file(s) could not be processed, see the errors above.', file=sys.stderr)
+        sys.exit(1)
+
+def run_file_jobs(fn: Callable, items: Iterable, jobs: int = 1,
+                  initializer: Callable = None, initargs: tuple = ()) -> Iterator[FileResult]:
+    """Applies fn to every item (usually a file path) and yields the results in order.
+
+    Args:
+        fn (Callable): a module-level function (it has to be picklable) taking a single item
+        items (Iterable): the items to process
+        jobs (int, optional): number of processes; 1 runs in the current process,
+            and 0 uses one process per core. Defaults to 1.
+        initializer (Callable, optional): called once in each process before any item,
+            e.g. to load a morphological analyzer. Defaults to None.
+        initargs (tuple, optional): arguments of initializer. Defaults to ().
+
+    Yields:
+        FileResult: the result of fn, or the traceback of the error it raised, for each item
+    """
+    if jobs == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for item in items:
+            yield get_file_result(fn, item)
+        return
+
+    workers = jobs or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        # only a few items per process are submitted ahead,
+        # so that results waiting to be yielded do not pile up in memory
+        max_pending = 2 * workers
+        pending = deque()
+
+        def next_result():
+            item, future = pending.popleft()
+            try:
+                return future.result()
+            except Exception:
+                # the worker process died, e.g. it ran out of memory
+                return FileResult(item, error=traceback.format_exc())
+
+        for item in items:
+            pending.append((item, executor.submit(get_file_result, fn, item)))
+            if len(pending) >= max_pending:
+                yield next_result()
+        while pending:
+            yield next_result()
@@ -8,8 +8,12 @@
         Missing numbers from projectivity list
     - Child should not point to itself
     - Every token has to be a child of something (see last point of root)
+
+The checks work on the ID and HEAD columns as plain sequences and visit
+each token once, without recursion, so they take linear time and do not
+hit the recursion limit on long sentences.
 """
-from typing import List
+from typing import Dict, List, Sequence, Tuple
 from pandas import DataFrame
 
 def get_children_ids_of(current_token_id, conllx_df) -> List[int]:
@@ -25,73 +29,244 @@ def get_children_ids_of(current_token_id, conllx_df) -> List[int]:
     # return list(conllx_df[conllx_df['HEAD'] == str(current_token_id)]["ID"])
     return list(conllx_df[conllx_df['HEAD'] == current_token_id]["ID"])
 
-def update_ordered_tokens(
-    parent_token_id: int,
-    children_ids: List[int], 
-    ordered_tokens: List[int]
-    ) -> List[int]:
-    """Update ordered_tokens list by first combining the parent and children
-    ids, sorting them, then replacing the parent in ordered_tokens with the 
-    result.
+def get_children_index(ids: Sequence[int], heads: Sequence[int]) -> Dict[int, List[int]]:
+    """Maps each head to the ids of its children, in sentence order."""
+    children_index = {}
+    for token_id, head in zip(ids, heads):
+        children_index.setdefault(head, []).append(token_id)
+    return children_index
+
+def get_tree_order(ids: Sequence[int], heads: Sequence[int]) -> Tuple[List[int], Dict[int, int]]:
+    """Visits the tokens reachable from the root (0), parents before children.
 
     Args:
-        parent_token_id (int): parent id
-        children_ids (List[int]): children ids
-        ordered_tokens (List[int]): list of ids to determine projectivity
+        ids (Sequence[int]): ID of each token
+        heads (Sequence[int]): HEAD of each token
 
     Returns:
-        List[int]: new ordered_tokens list
+        Tuple[List[int], Dict[int, int]]: the reachable ids in visiting order,
+            starting with 0, and the parent of each of them. The order is None
+            if a token is reached twice (a duplicate ID, or a cycle through the root).
     """
-    parent_and_children_ids = children_ids.copy()
-    parent_and_children_ids.append(parent_token_id)
-    temp_list = sorted(parent_and_children_ids)
-    p_tok_location = ordered_tokens.index(parent_token_id)
-    return ordered_tokens[:p_tok_location] + temp_list + ordered_tokens[p_tok_location+1:]
-
-def get_projectivity_list(current_token_id: int, conllx_df: DataFrame, ordered_tokens: List[int] = None) -> List[int]:
-    """projectivity algorithm
-    let ordered_tokens be the final list to check for projectivity
-    let root be p_tok (for parent token)
-    let children of p_tok be c_tok_list
-    if c_tok_list is empty
-        return the list of ordered_tokens
-    else
-        get order of p_tok and c_tok_list and update ordered_tokens
-        run alg on each child, passing ordered_tokens
-        the return value is ordered_tokens
+    children_index = get_children_index(ids, heads)
+    order, parents = [0], {0: None}
+    for token_id in order: # order grows while it is iterated
+        for child_id in children_index.get(token_id, []):
+            if child_id in parents:
+                return None, parents
+            parents[child_id] = token_id
+            order.append(child_id)
+    return order, parents
+
+def get_subtree_spans(order: List[int], parents: Dict[int, int]) -> Dict[int, Tuple[int, int, int]]:
+    """Returns the (first id, last id, size) of the subtree of every token in order."""
+    spans = {token_id: (token_id, token_id, 1) for token_id in order}
+    # children come after their parents in order, so each subtree is complete when its root is reached
+    for token_id in reversed(order[1:]):
+        first, last, size = spans[token_id]
+        parent_first, parent_last, parent_size = spans[parents[token_id]]
+        spans[parents[token_id]] = (min(first, parent_first), max(last, parent_last), size + parent_size)
+    return spans
+
+def is_projective(ids: Sequence[int], heads: Sequence[int]) -> bool:
+    """A tree is projective if the tokens reachable from the root have the ids
+    0 (the root) to n, and the subtree of each of them covers consecutive ids.
+    Tokens that cannot be reached from the root (e.g. in a cycle) are ignored
+    as long as the reachable ids are consecutive.
 
     Args:
-        current_token_id (int): parent id
-        conllx_df (DataFrame): dependency tree DataFrame
-        ordered_tokens (List[int], optional): list of tokens in projective order. Defaults to [0].
+        ids (Sequence[int]): ID of each token
+        heads (Sequence[int]): HEAD of each token
 
     Returns:
-        List[int]: [description]
+        bool: whether the tree is projective
     """
-    if ordered_tokens is None:
-        ordered_tokens = [0]
-    children = get_children_ids_of(current_token_id, conllx_df)
-    if not children:
-        return ordered_tokens
-    ordered_tokens = update_ordered_tokens(current_token_id, children, ordered_tokens)
-    for child in children:
-        ordered_tokens = get_projectivity_list(child, conllx_df, ordered_tokens)
-    return ordered_tokens
-    
-
-def projective_checker(conllx_df: DataFrame) -> dict:
+    order, parents = get_tree_order(list(ids), list(heads))
+    if order is None or set(order) != set(range(len(order))):
+        return False
+    return all(last - first + 1 == size for first, last, size in get_subtree_spans(order, parents).values())
+
+def get_nonprojective_arcs(ids: Sequence[int], heads: Sequence[int]) -> List[Tuple[int, int]]:
+    """Returns the arcs whose span contains a token that is not a descendant
+    of the arc's head, i.e. the arcs that cross another arc.
+
+    Descendants are found with their position in a depth-first traversal,
+    and the positions of the tokens in the span of each arc are compared
+    through a sparse table of range minimums and maximums, so the arcs
+    are checked in O(n log n).
+
+    Args:
+        ids (Sequence[int]): ID of each token, from 1 to n
+        heads (Sequence[int]): HEAD of each token
+
+    Returns:
+        List[Tuple[int, int]]: (head, dependent) ids of the non-projective arcs,
+            in sentence order of the dependents. Tokens that cannot be reached
+            from the root are left out.
+    """
+    ids, heads = list(ids), list(heads)
+    children_index = get_children_index(ids, heads)
+    # depth-first positions; descendants of a token have positions in [enter, leave)
+    enter, leave = {}, {}
+    stack = [(0, False)]
+    while stack:
+        token_id, is_done = stack.pop()
+        if is_done:
+            leave[token_id] = len(enter)
+            continue
+        if token_id in enter:
+            continue
+        enter[token_id] = len(enter)
+        stack.append((token_id, True))
+        stack.extend((child_id, False) for child_id in reversed(children_index.get(token_id, [])))
+
+    # positions by id; ids that are not reached get positions that never fall in a subtree
+    max_id = max([token_id for token_id in ids if isinstance(token_id, int)] + [0])
+    positions = [enter.get(token_id, -1) for token_id in range(max_id + 1)]
+    min_table, max_table = [positions], [positions]
+    width = 1
+    while 2 * width <= len(positions):
+        previous_min, previous_max = min_table[-1], max_table[-1]
+        min_table.append([min(previous_min[i], previous_min[i + width]) for i in range(len(positions) - 2 * width + 1)])
+        max_table.append([max(previous_max[i], previous_max[i + width]) for i in range(len(positions) - 2 * width + 1)])
+        width *= 2
+
+    nonprojective_arcs = []
+    for token_id, head in zip(ids, heads):
+        if token_id not in enter or head not in enter or min(token_id, head) < 0:
+            continue
+        first, last = min(token_id, head) + 1, max(token_id, head) - 1
+        if first > last:
+            continue
+        level = (last - first + 1).bit_length() - 1
+        width = 1 << level
+        span_min = min(min_table[level][first], min_table[level][last - width + 1])
+        span_max = max(max_table[level][first], max_table[level][last - width + 1])
+        if span_min < enter[head] or span_max >= leave[head]:
+            nonprojective_arcs.append((head, token_id))
+    return nonprojective_arcs
+
+def projective_checker(conllx_df: DataFrame, report_arcs: bool = False) -> List[dict]:
     """Given a tree DataFrame, determine whether or not it is projective.
 
     Args:
         conllx_df (DataFrame): a dependency tree DataFrame
+        report_arcs (bool, optional): also list the (head, dependent) arcs that are
+            not projective under nonprojective_arcs. Defaults to False.
 
     Returns:
-        dict: key is PROJECTIVITY, value is true or false
+        List[dict]: a FLAG_NONPROJECTIVE error, or an empty list if the tree is projective
     """
-    proj_list = get_projectivity_list(0, conllx_df)
-    # return {'PROJECTIVITY': list(range(len(proj_list))) == proj_list}
-    if proj_list != list(range(len(proj_list))):
-        return [{"flagged_issue": "FLAG_NONPROJECTIVE"}]
-    else:
+    ids, heads = conllx_df['ID'].tolist(), conllx_df['HEAD'].tolist()
+    if is_projective(ids, heads):
         return []
-    # return list(range(len(proj_list))) == proj_list
+    if report_arcs:
+        return [{"flagged_issue": "FLAG_NONPROJECTIVE", "nonprojective_arcs": get_nonprojective_arcs(ids, heads)}]
+    return [{"flagged_issue": "FLAG_NONPROJECTIVE"}]
+
+class ProjectivityIndex:
+    """Checks whether attaching a token to a new head keeps a tree projective,
+    without copying the tree or checking it again as a whole.
+
+    With the root at position 0, a tree is projective if no two arcs cross.
+    So in a projective tree, the new arc between a token and its new head
+    keeps it projective if no token strictly between them is linked (as a
+    child or as a head) to a token outside of them, and if the new head is
+    not a descendant of the token. The leftmost and rightmost token each
+    token is linked to are kept in two segment trees, so both checks take
+    O(log n) (plus the depth of the new head), and an attachment updates
+    them in O(log n).
+
+    Trees that are not projective, or whose IDs are not 1 to n in order with
+    every token reachable from the root, are checked as a whole instead.
+    """
+    def __init__(self, ids: Sequence[int], heads: Sequence[int]):
+        self.ids, self.heads = list(ids), list(heads)
+        self.projective = is_projective(self.ids, self.heads)
+        order, _ = get_tree_order(self.ids, self.heads)
+        token_count = len(self.ids)
+        self.is_incremental = self.projective and self.ids == list(range(1, token_count + 1)) and len(order) == token_count + 1
+        if not self.is_incremental:
+            return
+
+        # heads and children by id; 0 is the root
+        self.token_heads = [None] + self.heads
+        self.children = [[] for _ in range(token_count + 1)]
+        for token_id, head in zip(self.ids, self.heads):
+            self.children[head].append(token_id)
+        self.size = 1
+        while self.size < token_count + 1:
+            self.size *= 2
+        self.min_tree = [token_count + 1] * (2 * self.size)
+        self.max_tree = [-1] * (2 * self.size)
+        for token_id in range(1, token_count + 1):
+            self._update_links(token_id)
+
+    def _update_links(self, token_id: int):
+        linked_ids = self.children[token_id] + [self.token_heads[token_id]]
+        position = self.size + token_id
+        self.min_tree[position], self.max_tree[position] = min(linked_ids), max(linked_ids)
+        position //= 2
+        while position:
+            self.min_tree[position] = min(self.min_tree[2 * position], self.min_tree[2 * position + 1])
+            self.max_tree[position] = max(self.max_tree[2 * position], self.max_tree[2 * position + 1])
+            position //= 2
+
+    def _get_linked_range(self, first: int, last: int) -> Tuple[int, int]:
+        """Returns the leftmost and rightmost ids linked to the tokens first to last."""
+        min_id, max_id = len(self.ids) + 1, -1
+        first, last = first + self.size, last + self.size + 1
+        while first < last:
+            if first % 2:
+                min_id, max_id = min(min_id, self.min_tree[first]), max(max_id, self.max_tree[first])
+                first += 1
+            if last % 2:
+                last -= 1
+                min_id, max_id = min(min_id, self.min_tree[last]), max(max_id, self.max_tree[last])
+            first //= 2
+            last //= 2
+        return min_id, max_id
+
+    def _is_descendant(self, token_id: int, ancestor_id: int) -> bool:
+        while token_id != 0:
+            if token_id == ancestor_id:
+                return True
+            token_id = self.token_heads[token_id]
+        return False
+
+    def _get_heads_with(self, token_id: int, new_head_id: int) -> List[int]:
+        # same as setting the HEAD of the row at position token_id - 1 in the DataFrame
+        heads = self.heads.copy()
+        heads[token_id - 1] = new_head_id
+        return heads
+
+    def _keeps_tokens_reachable(self, token_id: int, new_head_id: int) -> bool:
+        return 0 <= new_head_id <= len(self.ids) and not self._is_descendant(new_head_id, token_id)
+
+    def can_attach(self, token_id: int, new_head_id: int) -> bool:
+        """Returns whether the tree is projective once token_id is attached to new_head_id."""
+        if not (self.is_incremental and self._keeps_tokens_reachable(token_id, new_head_id)):
+            # e.g. a cycle, which leaves the subtree of the token out of the tree
+            return is_projective(self.ids, self._get_heads_with(token_id, new_head_id))
+        first, last = min(token_id, new_head_id), max(token_id, new_head_id)
+        if last - first < 2:
+            return True
+        min_id, max_id = self._get_linked_range(first + 1, last - 1)
+        return first <= min_id and max_id <= last
+
+    def attach(self, token_id: int, new_head_id: int):
+        """Attaches token_id to new_head_id, whether or not the tree stays projective."""
+        if not (self.is_incremental and self._keeps_tokens_reachable(token_id, new_head_id)
+                and self.can_attach(token_id, new_head_id)):
+            # from now on the tree is checked as a whole
+            self.heads = self._get_heads_with(token_id, new_head_id)
+            self.projective = is_projective(self.ids, self.heads)
+            self.is_incremental = False
+            return
+        old_head_id = self.token_heads[token_id]
+        self.heads[token_id - 1] = self.token_heads[token_id] = new_head_id
+        self.children[old_head_id].remove(token_id)
+        self.children[new_head_id].append(token_id)
+        for linked_id in (token_id, old_head_id, new_head_id):
+            if linked_id != 0:
+                self._update_links(linked_id)
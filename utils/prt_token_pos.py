@@ -1,45 +1,78 @@
+"""Allowed POS tags of particle and pronoun clitics.
 
-def get_prt_token_pos_dict():
-    return {
-        'أ+': ['PRT'],
-        
-        'ف+': ['PRT'],
-        'و+': ['PRT'],
-        
-        'ب+': ['PRT'],
-        'ك+': ['PRT'],
-        'ل+': ['PRT'],
-        
-        'س+': ['PRT'],
-        
-        'لا+': ['PRT'],
-        'ما+': ['PRT'],
-        
-        '+ني': ['NOM'],
-        '+ي': ['NOM'],
-        '+نا': ['NOM'],
-        
-        '+ك': ['NOM'],
-        '+كما': ['NOM'],
-        '+كم': ['NOM'],
-        '+كن': ['NOM'],
-        
-        '+ه': ['NOM'],
-        '+ها': ['NOM'],
-        '+هما': ['NOM'],
-        '+هم': ['NOM'],
-        '+هن': ['NOM'],
-        
-        '+من': ['NOM'],
-        '+ما': ['NOM', 'PRT'],
-        '+لا': ['PRT'],
-        '+م': ['NOM'],
-        '+كو': ['NOM'],
-        '+كي': ['NOM'],
-        '+ش': ['PRT'],
-        
-        '+ج': ['NOM'],
-        'ع+': ['PRT'],
-        'ش+': ['NOM'],
-        'ه+': ['NOM'],
-    }
\ No newline at end of file
+The table is shared by comma_fix (which changes the tags of clitics that do
+not have one of them) and the wellformedness checks (which flag them).
+"""
+from typing import Dict, List
+
+from pandas import Series
+
+# the first tag of each clitic is the one used when fixing its tag
+PRT_TOKEN_POS: Dict[str, List[str]] = {
+    'أ+': ['PRT'],
+    
+    'ف+': ['PRT'],
+    'و+': ['PRT'],
+    
+    'ب+': ['PRT'],
+    'ك+': ['PRT'],
+    'ل+': ['PRT'],
+    
+    'س+': ['PRT'],
+    
+    'لا+': ['PRT'],
+    'ما+': ['PRT'],
+    
+    '+ني': ['NOM'],
+    '+ي': ['NOM'],
+    '+نا': ['NOM'],
+    
+    '+ك': ['NOM'],
+    '+كما': ['NOM'],
+    '+كم': ['NOM'],
+    '+كن': ['NOM'],
+    
+    '+ه': ['NOM'],
+    '+ها': ['NOM'],
+    '+هما': ['NOM'],
+    '+هم': ['NOM'],
+    '+هن': ['NOM'],
+    
+    '+من': ['NOM'],
+    '+ما': ['NOM', 'PRT'],
+    '+لا': ['PRT'],
+    '+م': ['NOM'],
+    '+كو': ['NOM'],
+    '+كي': ['NOM'],
+    '+ش': ['PRT'],
+    
+    '+ج': ['NOM'],
+    'ع+': ['PRT'],
+    'ش+': ['NOM'],
+    'ه+': ['NOM'],
+}
+
+# "FORM\tUPOS" keys of the allowed pairs, to check a whole column at once
+ALLOWED_CLITIC_POS_KEYS = {f'{form}\t{pos}' for form, pos_tags in PRT_TOKEN_POS.items() for pos in pos_tags}
+DEFAULT_CLITIC_POS = {form: pos_tags[0] for form, pos_tags in PRT_TOKEN_POS.items()}
+
+def get_prt_token_pos_dict() -> Dict[str, List[str]]:
+    # the table is built once; it should not be changed by callers
+    return PRT_TOKEN_POS
+
+def get_clitic_pos_fixes(forms: Series, pos_tags: Series) -> Series:
+    """Returns the tag that each clitic with a tag that is not allowed should have.
+
+    Args:
+        forms (Series): FORM column
+        pos_tags (Series): UPOS column, with the same index
+
+    Returns:
+        Series: the new tag of each token to fix, indexed like forms
+    """
+    default_pos = forms.map(DEFAULT_CLITIC_POS)
+    is_clitic = default_pos.notna()
+    if not is_clitic.any():
+        return default_pos[is_clitic]
+    is_allowed = (forms[is_clitic] + '\t' + pos_tags[is_clitic]).isin(ALLOWED_CLITIC_POS_KEYS)
+    return default_pos[is_clitic][~is_allowed]
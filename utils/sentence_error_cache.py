@@ -0,0 +1,96 @@
+"""Cache of the errors found in sentences, keyed by a hash of their token
+columns, so that only new or changed sentences are checked again.
+
+The errors of a sentence are kept by check name, so that the checks' counts
+also cover the sentences that are not checked again.
+
+Entries are kept in memory for the run, which also covers sentences that
+appear more than once, and in an SQLite database across runs, shared by all
+workers. Every entry also belongs to a configuration (e.g. the version of
+the checks, the morphology database and the syntax patterns in use), and
+entries of other configurations are never returned.
+"""
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+from pandas import DataFrame
+
+from utils.conll_corpus import ConllCorpus
+from utils.conll_io import CONLL_COLUMNS
+
+DEFAULT_SENTENCE_ERROR_CACHE_PATH = Path.home() / '.cache' / 'camel_conll' / 'sentence_errors.sqlite'
+# seconds to wait for another process writing to the database
+DATABASE_TIMEOUT = 60
+
+def get_token_rows_hash(token_rows: Iterable[Sequence[str]]) -> str:
+    token_lines = '\n'.join('\t'.join(row) for row in token_rows)
+    return hashlib.blake2b(token_lines.encode('utf-8'), digest_size=16).hexdigest()
+
+def get_sentence_hash(sentence_df: DataFrame) -> str:
+    """Returns a hash of the token columns of a sentence; comments are not included."""
+    return get_token_rows_hash(sentence_df[CONLL_COLUMNS].astype(str).values.tolist())
+
+def get_corpus_sentence_hashes(corpus: ConllCorpus) -> List[str]:
+    """Returns the same hashes as get_sentence_hash for every sentence of a corpus, without building DataFrames."""
+    return [get_token_rows_hash(zip(*[sentence.get_strings(col) for col in CONLL_COLUMNS]))
+            for sentence in corpus.iter_sentences()]
+
+def encode_errors(errors: Dict[str, List[dict]]) -> str:
+    # numpy scalars are stored as the Python values they hold
+    return json.dumps(errors, ensure_ascii=False, default=lambda value: value.item())
+
+class SentenceErrorCache:
+    """The errors of sentences, by sentence hash.
+
+    Args:
+        cache_path (Path): the SQLite database
+        config (str): identifies everything besides the sentence that the errors depend on
+    """
+    def __init__(self, cache_path: Path, config: str):
+        self.cache_path = Path(cache_path)
+        self.config = config
+        self.errors: Dict[str, str] = {}
+        self.new_errors: Dict[str, str] = {}
+        self.connection = None
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(self.cache_path, timeout=DATABASE_TIMEOUT)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS sentence_errors '
+                                    '(config TEXT, sentence_hash TEXT, errors TEXT, PRIMARY KEY (config, sentence_hash))')
+        return self.connection
+
+    def get_encoded_errors(self, sentence_hash: str) -> str:
+        encoded_errors = self.errors.get(sentence_hash)
+        if encoded_errors is None:
+            row = self.connect().execute('SELECT errors FROM sentence_errors WHERE config = ? AND sentence_hash = ?',
+                                         (self.config, sentence_hash)).fetchone()
+            if row is None:
+                return None
+            encoded_errors = self.errors[sentence_hash] = row[0]
+        return encoded_errors
+
+    def __contains__(self, sentence_hash: str) -> bool:
+        return self.get_encoded_errors(sentence_hash) is not None
+
+    def get(self, sentence_hash: str) -> Dict[str, List[dict]]:
+        """Returns a new copy of the errors of the sentence by check name, or None if it has not been checked yet."""
+        encoded_errors = self.get_encoded_errors(sentence_hash)
+        return json.loads(encoded_errors) if encoded_errors is not None else None
+
+    def put(self, sentence_hash: str, errors: Dict[str, List[dict]]):
+        self.errors[sentence_hash] = self.new_errors[sentence_hash] = encode_errors(errors)
+
+    def save(self):
+        """Writes the errors of the sentences checked since the last save to the database."""
+        if not self.new_errors:
+            return
+        with self.connect() as connection:
+            connection.executemany('INSERT OR REPLACE INTO sentence_errors VALUES (?, ?, ?)',
+                                   [(self.config, sentence_hash, errors) for sentence_hash, errors in self.new_errors.items()])
+        self.new_errors.clear()
@@ -0,0 +1,180 @@
+"""Byte-offset index of the sentences of a CoNLL file, for random access.
+
+The index records where each sentence starts in the file and how many
+bytes it spans, plus its sent_id comment if it has one. It is saved next to
+the file (<file name>.index.npz) and rebuilt when the file's size or mtime
+changes, so any sentence can be read with a single seek.
+
+Sentence ids are 0-based, as in ConllxDf.get_df_by_id, while sentence
+numbers are 1-based, as in the wellformedness reports.
+"""
+import os
+import re
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from pandas import DataFrame
+
+from utils.conll_io import ConllSentence, get_sentence_df, get_text_line, iter_sentence_lines
+from utils.file_compression import is_compressed
+
+INDEX_SUFFIX = '.index.npz'
+# bump when the way sentences are indexed changes, so that saved indexes are rebuilt
+INDEX_VERSION = 2
+# only the sent_id comment itself, not e.g. # sent_id_orig = ...
+SENT_ID_PATTERN = re.compile(rb'# sent_id\s*=')
+
+def get_index_path(file_path) -> Path:
+    file_path = Path(file_path)
+    return file_path.parent / f'{file_path.name}{INDEX_SUFFIX}'
+
+def get_sent_id(comment: str) -> str:
+    return comment.split('=', 1)[-1].strip()
+
+class SentenceIndex:
+    """Reads single sentences of a CoNLL file through their byte offsets."""
+    def __init__(self, file_path, offsets: np.ndarray, lengths: np.ndarray, sent_ids: np.ndarray):
+        """
+        Args:
+            file_path (str): path of the CoNLL file
+            offsets (np.ndarray): byte offset of the first line of each sentence
+            lengths (np.ndarray): number of bytes of each sentence, excluding the blank line after it
+            sent_ids (np.ndarray): sent_id of each sentence, or an empty string if it has none
+        """
+        self.file_path = file_path
+        self.offsets = offsets
+        self.lengths = lengths
+        self.sent_ids = sent_ids
+        self._sentence_ids_by_sent_id = None
+
+    def get_sentence_count(self) -> int:
+        return len(self.offsets)
+
+    def get_sentence_lines(self, sentence_id: int) -> List[str]:
+        with open(self.file_path, 'rb') as binary_file:
+            binary_file.seek(int(self.offsets[sentence_id]))
+            sentence_text = binary_file.read(int(self.lengths[sentence_id])).decode('utf-8')
+        # split on newlines only, as when the file is read line by line; str.splitlines
+        # would also split on characters such as U+2028 inside a FORM or comment
+        return [line.rstrip('\r') for line in sentence_text.split('\n')]
+
+    def get_sentence(self, sentence_id: int) -> ConllSentence:
+        """Reads and parses a single sentence.
+
+        Args:
+            sentence_id (int): 0-based id of the sentence
+
+        Returns:
+            ConllSentence: the sentence
+        """
+        comments, token_lines = next(iter_sentence_lines(self.get_sentence_lines(sentence_id)))
+        return ConllSentence(sentence_id, comments, get_sentence_df(token_lines))
+
+    def get_sentence_by_number(self, sentence_number: int) -> ConllSentence:
+        # sentence numbers in the wellformedness reports start from 1
+        return self.get_sentence(sentence_number - 1)
+
+    def get_sentence_id(self, sent_id: str) -> int:
+        """Returns the 0-based id of the sentence with the given sent_id comment.
+
+        Raises:
+            KeyError: if no sentence has this sent_id
+        """
+        if self._sentence_ids_by_sent_id is None:
+            self._sentence_ids_by_sent_id = {sent_id: sentence_id for sentence_id, sent_id in enumerate(self.sent_ids.tolist()) if sent_id}
+        return self._sentence_ids_by_sent_id[sent_id]
+
+    ## same accessors as ConllxDf
+    def get_df_by_id(self, sentence_id: int) -> DataFrame:
+        return self.get_sentence(sentence_id).df
+
+    def get_comments_by_id(self, sentence_id: int) -> List[str]:
+        return self.get_sentence(sentence_id).comments
+
+    def get_text_line_by_id(self, sentence_id: int) -> str:
+        return get_text_line(self.get_sentence(sentence_id).comments)
+
+def build_sentence_index(file_path) -> SentenceIndex:
+    """Scans a CoNLL file once to find the byte range of every sentence.
+
+    Sentences are split the same way as in iter_sentence_lines: blank lines
+    end a sentence, and blocks made only of comments are not sentences.
+
+    Args:
+        file_path (str): path of the CoNLL file
+
+    Returns:
+        SentenceIndex: index of the file
+    """
+    if is_compressed(file_path):
+        raise ValueError(f'Compressed files cannot be read from an offset, so {file_path} cannot be indexed.')
+    offsets, lengths, sent_ids = [], [], []
+    start, end, sent_id, has_tokens = None, 0, '', False
+    position = 0
+    with open(file_path, 'rb') as binary_file:
+        for line in binary_file:
+            if not line.strip():
+                if has_tokens:
+                    offsets.append(start)
+                    lengths.append(end - start)
+                    sent_ids.append(sent_id)
+                start, sent_id, has_tokens = None, '', False
+            else:
+                if start is None:
+                    start = position
+                if line.startswith(b'#') and not has_tokens:
+                    if SENT_ID_PATTERN.match(line):
+                        sent_id = get_sent_id(line.decode('utf-8'))
+                else:
+                    has_tokens = True
+                end = position + len(line)
+            position += len(line)
+    if has_tokens:
+        offsets.append(start)
+        lengths.append(end - start)
+        sent_ids.append(sent_id)
+
+    return SentenceIndex(file_path,
+                         np.array(offsets, dtype=np.int64),
+                         np.array(lengths, dtype=np.int64),
+                         np.array(sent_ids, dtype=str))
+
+def save_sentence_index(sentence_index: SentenceIndex, file_stat: os.stat_result):
+    index_path = get_index_path(sentence_index.file_path)
+    # np.savez adds .npz to names without it, so the temporary file keeps the extension
+    temp_path = index_path.parent / f'.{index_path.name[:-len(".npz")]}.{os.getpid()}.npz'
+    np.savez(temp_path,
+             offsets=sentence_index.offsets,
+             lengths=sentence_index.lengths,
+             sent_ids=sentence_index.sent_ids,
+             file_stat=np.array([file_stat.st_size, file_stat.st_mtime_ns], dtype=np.int64),
+             version=np.array(INDEX_VERSION))
+    os.replace(temp_path, index_path)
+
+def load_sentence_index(file_path) -> SentenceIndex:
+    """Loads the index of a CoNLL file, building and saving it first if it is
+    missing or the file has changed since it was built.
+
+    Args:
+        file_path (str): path of the CoNLL file
+
+    Returns:
+        SentenceIndex: index of the file
+    """
+    file_stat = os.stat(file_path)
+    try:
+        with np.load(get_index_path(file_path)) as index_data:
+            if (index_data['version'] == INDEX_VERSION
+                    and index_data['file_stat'].tolist() == [file_stat.st_size, file_stat.st_mtime_ns]):
+                return SentenceIndex(file_path, index_data['offsets'], index_data['lengths'], index_data['sent_ids'])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sentence_index = build_sentence_index(file_path)
+    try:
+        save_sentence_index(sentence_index, file_stat)
+    except OSError as e:
+        # e.g. a read-only corpus directory; the index is still usable
+        print(f'Could not save the sentence index of {file_path}: {e}')
+    return sentence_index
@@ -6,38 +6,12 @@
     - a proclitic cannot be the last token
 """
 
+from typing import List, Tuple
+import numpy as np
+from pandas import DataFrame, concat
+from utils.conll_corpus import ConllCorpus
 from .common_functions import get_sentence_column_data
-import re
-
-def get_plus_toks_regex():
-    return re.compile(r'^\++$')
-
-def remove_elided_part(tok):
-    """ given a token that ends with (*), remove it.
-    """
-    return tok[:-3] if tok.endswith('(*)') else tok
-
-def is_clitic(tok, plus_toks=get_plus_toks_regex()):
-    """Checks to see if a + exists in the given token,
-    but the token is not one or more +'s (i.e. +, +++)
-    
-    Elided clitics are included.
-
-    Args:
-        tok (str): token
-        plus_toks (regex): compiled regex to match against
-
-    Returns:
-        bool: whether or not it's a clitic
-    """
-    tok = remove_elided_part(tok)
-    return (is_enclitic(tok) or is_proclitic(tok)) and not plus_toks.match(tok)
-
-def is_enclitic(tok):
-    return tok.startswith('+')
-
-def is_proclitic(tok):
-    return tok.endswith('+')
+from .token_classes import get_form_class, get_plus_toks_regex, is_clitic, is_enclitic, is_proclitic, remove_elided_part
 
 def is_prev_baseword(current_idx, token_col):
     """
@@ -75,36 +49,74 @@ def is_next_baseword(current_idx, token_col):
     return True
 
 
-def enclitic_check(token_col, plus_toks):
+def enclitic_check(token_col):
     return [
         {
             'token_id': idx + 1,
             "flagged_issue": "FLAG_ENCLITIC",
         }
         for idx, tok in enumerate(token_col)
-        if is_clitic(tok, plus_toks)
+        if get_form_class(tok).is_clitic
         and is_enclitic(tok)
         and not is_prev_baseword(idx, token_col)
     ]        
 
-def proclitic_check(token_col, plus_toks):
+def proclitic_check(token_col):
     return [
         {
             'token_id': idx + 1,
             "flagged_issue": "FLAG_PROCLITIC",
         }
         for idx, tok in enumerate(token_col)
-        if is_clitic(tok, plus_toks)
+        if get_form_class(tok).is_clitic
         and is_proclitic(tok)
         and not is_next_baseword(idx, token_col)
     ]  
 
 def clitic_checker(df):
-    # if a token with one or more +s exists i.e. +++, don't include as a clitic.
-    plus_toks = get_plus_toks_regex()
-    
+    # if a token with one or more +s exists i.e. +++, it is not a clitic (see is_clitic).
     token_col = get_sentence_column_data(df, "FORM")
     
-    enc_err_list = enclitic_check(token_col, plus_toks)
-    pro_err_list = proclitic_check(token_col, plus_toks)
-    return enc_err_list + pro_err_list
\ No newline at end of file
+    enc_err_list = enclitic_check(token_col)
+    pro_err_list = proclitic_check(token_col)
+    return enc_err_list + pro_err_list
+
+def get_form_clitic_types(forms: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns whether each form is a clitic, an enclitic, and a proclitic, as boolean arrays."""
+    form_classes = [get_form_class(form) for form in forms]
+    return (np.array([form_class.is_clitic for form_class in form_classes], dtype=bool),
+            np.array([form_class.is_enclitic for form_class in form_classes], dtype=bool),
+            np.array([form_class.is_proclitic for form_class in form_classes], dtype=bool))
+
+def get_corpus_clitic_errors(corpus: ConllCorpus) -> DataFrame:
+    """Same as clitic_checker, for all the sentences of a columnar corpus at once.
+
+    The clitic types are found once per unique FORM, and the tokens before
+    and after each token are compared by shifting these arrays by one.
+
+    Returns:
+        DataFrame: the sentence_number (starting from 1), token_id and flagged_issue
+            of each error; within a sentence, the enclitic errors come before the
+            proclitic errors, as in clitic_checker
+    """
+    is_clitic_form, is_enclitic_form, is_proclitic_form = get_form_clitic_types(corpus.vocabs['FORM'].strings)
+    form_codes = corpus.columns['FORM']
+    is_clitic_token, is_enclitic_token, is_proclitic_token = \
+        is_clitic_form[form_codes], is_enclitic_form[form_codes], is_proclitic_form[form_codes]
+    sentence_ids, token_indexes = corpus.get_token_sentence_ids(), corpus.get_token_indexes()
+    is_first = token_indexes == 0
+    is_last = token_indexes == corpus.get_sentence_lengths()[sentence_ids] - 1
+
+    # an enclitic after a token that is only a proclitic, and a proclitic before an enclitic
+    is_after_proclitic = np.concatenate([[False], is_proclitic_token[:-1] & ~is_enclitic_token[:-1]])
+    is_before_enclitic = np.concatenate([is_enclitic_token[1:], [False]])
+    is_enclitic_error = is_clitic_token & is_enclitic_token & (is_first | is_after_proclitic)
+    is_proclitic_error = is_clitic_token & is_proclitic_token & (is_last | is_before_enclitic)
+
+    errors = concat([DataFrame({
+        'sentence_number': sentence_ids[is_error] + 1,
+        'token_id': token_indexes[is_error] + 1,
+        'flagged_issue': flagged_issue})
+        for is_error, flagged_issue in [(is_enclitic_error, "FLAG_ENCLITIC"), (is_proclitic_error, "FLAG_PROCLITIC")]],
+        ignore_index=True)
+    return errors.sort_values('sentence_number', kind='stable', ignore_index=True)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 
 from pandas.core.frame import DataFrame
 from pandas.core.series import Series
@@ -20,6 +20,31 @@ def get_token_details(sen_df, tok_id) -> dict:
     else:
         return {}
 
+def get_token_details_by_id(sen_df) -> Dict[int, dict]:
+    """Returns the token details of a sentence by ID, so that tokens can be
+    looked up without filtering the DataFrame; like get_token_details, the
+    first token with an ID is the one returned.
+    """
+    token_details = {}
+    for details in sen_df.to_dict('records'):
+        token_details.setdefault(details["ID"], details)
+    return token_details
+
+def lookup_token_details(token_details: Dict[int, dict], tok_id) -> dict:
+    """Same as get_token_details, on the details returned by get_token_details_by_id"""
+    if type(tok_id) == int:
+        pass
+    elif tok_id.isdigit():
+        tok_id = int(tok_id)
+    else:
+        raise ValueError("invalid parent ID!")
+    if tok_id in token_details:
+        return token_details[tok_id]
+    elif tok_id == 0:
+        return {"ID": 0, "FORM": "ROOT", "UPOS": "ROOT", "HEAD": -1, "DEPREL": "---"}
+    else:
+        return {}
+
 def get_sentence_column_data(sen_df: DataFrame, column_name: str) -> List[Series]:
     """Given a sentence DataFrame, return the data of a column in a list
 
@@ -46,21 +71,6 @@ def get_children_ids_of(current_token_id, conllx_df) -> List[int]:
     # return list(conllx_df[conllx_df['HEAD'] == str(current_token_id)]["ID"])
     return list(conllx_df[conllx_df['HEAD'] == current_token_id]["ID"])
 
-def add_text_details(item: dict, text: str, text_id: int) -> dict:
-    """add text and text id to an invalid token dict
-
-    Args:
-        item (dict): erroneous token
-        text (str): text of a dependency tree
-        text_id (int): dependency tree number
-
-    Returns:
-        dict: erroneous token with added text and text_id items
-    """
-    item['text'] = text
-    item['sentence_number'] = text_id
-    return item
-
 def add_token_details(item, df_dict_item):
     assert df_dict_item, f'Missing token details! Check if the IDs of sentence number {item.sentence_number} are valid.'
     item['form'] = df_dict_item['FORM']
@@ -69,9 +79,9 @@ def add_token_details(item, df_dict_item):
     item['label'] = df_dict_item['DEPREL']
     
     
-def add_parent_details(item, df, token_id):
+def add_parent_details(item, token_details, token_id):
     # checks if parent exists and assigns it to parent_df_dict_item
-    if parent_df_dict_item := get_token_details(df, token_id):
+    if parent_df_dict_item := lookup_token_details(token_details, token_id):
         item['parent_id'] = parent_df_dict_item["ID"]
         item['parent_form'] = parent_df_dict_item["FORM"]
         if 'parent_pos_tag' not in item:
@@ -89,14 +99,18 @@ def add_token_level_details(conllx_df, dict_list) -> List[dict]:
     Returns:
         List[dict]: erroneous tokens with added details
     """
+    if not dict_list:
+        return dict_list
+    # indexed once per sentence, as the token and parent of every error are looked up
+    token_details = get_token_details_by_id(conllx_df)
     # for every erroneous token
     for item in dict_list:
-        df_dict_item = get_token_details(conllx_df, item["token_id"])
+        df_dict_item = lookup_token_details(token_details, item["token_id"])
         try:
             add_token_details(item, df_dict_item)
         except:
             import pdb; pdb.set_trace()
-        add_parent_details(item, conllx_df, df_dict_item["HEAD"])
+        add_parent_details(item, token_details, df_dict_item["HEAD"])
         # add direction
         item['direction'] = 'P-C' if item['parent_id'] < df_dict_item['ID'] else 'C-P'
     return dict_list
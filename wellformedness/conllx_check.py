@@ -2,6 +2,10 @@
 
 Checks if IDs are consecutive
 """
+import numpy as np
+from pandas import DataFrame
+
+from utils.conll_corpus import ConllCorpus
 from .common_functions import get_sentence_column_data
 
 def is_valid_id_list(conllx_df):
@@ -22,7 +26,7 @@ def is_valid_head_list(conllx_df):
         conllx_df (DataFrame): sentence DataFrame
     """
     # 0 added for when parent is root
-    id_col = get_sentence_column_data(conllx_df, 'ID') + [0]
+    id_col = set(get_sentence_column_data(conllx_df, 'ID') + [0])
     head_col = get_sentence_column_data(conllx_df, 'HEAD')
     return all(head in id_col for head in head_col)
 
@@ -33,3 +37,22 @@ def conllx_checker(conllx_df):
         return []
     else:
         return [{"flagged_issue": "FLAG_ID_OR_HEAD"}]
+
+def get_corpus_conllx_errors(corpus: ConllCorpus) -> DataFrame:
+    """Same as conllx_checker, for all the sentences of a columnar corpus at once.
+
+    The IDs of a valid sentence are its token positions plus 1, and its heads
+    are then valid if they are between 0 and the sentence length, so no ID
+    has to be searched for.
+
+    Returns:
+        DataFrame: the sentence_number (starting from 1) and flagged_issue of each error
+    """
+    sentence_ids = corpus.get_token_sentence_ids()
+    sentence_lengths = corpus.get_sentence_lengths()
+    is_bad_token = (corpus.ids != corpus.get_token_indexes() + 1) \
+        | (corpus.heads < 0) | (corpus.heads > sentence_lengths[sentence_ids])
+    is_flagged = np.bincount(sentence_ids[is_bad_token], minlength=len(sentence_lengths)) > 0
+    return DataFrame({
+        'sentence_number': np.flatnonzero(is_flagged) + 1,
+        'flagged_issue': "FLAG_ID_OR_HEAD"})
@@ -12,16 +12,19 @@ token-level error example:
     'parent_form': '+ما',
     'parent_pos_tag': '#NOM',
     'direction': 'P-C'
-    'text': 'مـا أبـصـرت عـينـاك أحـســـن مـــنـــظـــر فـــيمـــا يرى مـــــن ســـــــائر الأشـــــــياء',
 }
 
 sentence-level error example:
 {
     'flagged_issue': 'FLAG_NONPROJECTIVE',
     'sentence_number': 5
-    'text': 'لم يمش من يابس يوماً ولا وحل إلا بنور هداه تقى الزلقا',
 }
 
+The text of the sentence is kept once per sentence number (sentence_texts) and
+added to the report rows when the errors of a file are saved. Sentence-level
+errors can also carry details, e.g. the nonprojective_arcs of FLAG_NONPROJECTIVE
+when they are reported, which become extra report columns.
+
 
 """
 
@@ -45,6 +48,7 @@ class IssueType(Enum):
     FLAG_PNX_POSITION = "FLAG_PNX_POSITION"
     FLAG_NONPROJECTIVE = "FLAG_NONPROJECTIVE"
     FLAG_ROOT_ATT = "FLAG_ROOT_ATT"
+    FLAG_MULTIPLE_ROOTS = "FLAG_MULTIPLE_ROOTS"
 
 class CatibTag(Enum):
     NOM = 'NOM'
@@ -70,32 +74,50 @@ class DeprelLabel(Enum):
 
 
 class FlaggedIssue(ABC):
+    """An error found in a sentence. Files can have hundreds of thousands of
+    them, so they are slotted records, and the text of the sentence is not
+    copied into each one but looked up by sentence number when reporting.
+    """
+    __slots__ = ()
+
     @abstractmethod
     def to_dict(self):
         """Converts issue to a dictionary"""
 
+    @staticmethod
+    def from_dict(issue: dict, sentence_number: int) -> 'FlaggedIssue':
+        """Converts an error dict, as returned by the checks (with token details for token errors), to a record."""
+        if 'token_id' in issue:
+            return TokenFlaggedIssue(issue['flagged_issue'], sentence_number, issue['token_id'],
+                                     issue['form'], issue['pos_tag'], issue['label'],
+                                     issue['parent_id'], issue['parent_form'], issue['parent_pos_tag'],
+                                     issue['direction'])
+        details = {key: value for key, value in issue.items() if key != 'flagged_issue'}
+        return SentenceFlaggedIssue(issue['flagged_issue'], sentence_number, details or None)
+
 @dataclass
 class TokenFlaggedIssue(FlaggedIssue):
-    token_id: int
-    issue_type: IssueType
+    __slots__ = ('flagged_issue', 'sentence_number', 'token_id', 'form', 'pos_tag', 'label',
+                 'parent_id', 'parent_form', 'parent_pos_tag', 'direction')
+    flagged_issue: str
     sentence_number: int
+    token_id: int
     
     form: str
     pos_tag: str
-    label: DeprelLabel
+    label: str
     
     parent_id: int
     parent_form: str
     parent_pos_tag: str
     
     direction: str
-    text: str
     
     def to_dict(self):
         return {
-            "token_id": self.token_id,
-            "issue_type": self.issue_type,
+            "flagged_issue": self.flagged_issue,
             "sentence_number": self.sentence_number,
+            "token_id": self.token_id,
             "form": self.form,
             "pos_tag": self.pos_tag,
             "label": self.label,
@@ -103,17 +125,19 @@ class TokenFlaggedIssue(FlaggedIssue):
             "parent_form": self.parent_form,
             "parent_pos_tag": self.parent_pos_tag,
             "direction": self.direction,
-            "text": self.text,
             }
+
 @dataclass
 class SentenceFlaggedIssue(FlaggedIssue):
-    issue_type: IssueType
+    __slots__ = ('flagged_issue', 'sentence_number', 'details')
+    flagged_issue: str
     sentence_number: int
-    text: str
+    # optional report of the check, e.g. {'nonprojective_arcs': [(2, 5)]}
+    details: dict
     
     def to_dict(self):
         return {
-            "issue_type": self.issue_type,
+            "flagged_issue": self.flagged_issue,
             "sentence_number": self.sentence_number,
-            "text": self.text,
-            }
\ No newline at end of file
+            **(self.details or {}),
+            }
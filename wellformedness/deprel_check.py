@@ -1,8 +1,10 @@
 # number of relations a parent can have with children
 # eg: a parent can have at most 1 child with a SBJ relation
 # from wellformedness.common_functions import get_children_ids_of
+import numpy as np
+from pandas import DataFrame, Series
+from utils.conll_corpus import ConllCorpus
 from .common_functions import get_children_ids_of
-from pandas import Series
 
 # MOD, OBJ, and --- can be any number, and so they aren't included here
 # TPC could be multiple, so this is a strict check.
@@ -36,4 +38,38 @@ def deprel_checker(df):
         deprel_series = get_column_counts_by_id(df, child_id_list, 'DEPREL')
         # if not deprel_series.empty:
         err_list += get_deprel_errors(row['ID'], deprel_series)
-    return err_list
\ No newline at end of file
+    return err_list
+
+def get_corpus_deprel_errors(corpus: ConllCorpus) -> DataFrame:
+    """Same as deprel_checker, for all the sentences of a columnar corpus at once,
+    with a single count of the labels by (sentence, HEAD, DEPREL).
+
+    Args:
+        corpus (ConllCorpus): the sentences of a file
+
+    Returns:
+        DataFrame: the sentence_number (starting from 1), token_id and flagged_issue
+            of each error, in the order of the corpus; a head gets one error for each
+            label it has too many children with
+    """
+    tokens = DataFrame({
+        'sentence_id': corpus.get_token_sentence_ids(),
+        'ID': corpus.ids.astype(np.int64),
+        'HEAD': corpus.heads.astype(np.int64),
+        'DEPREL': corpus.get_strings('DEPREL')})
+    # as in get_column_counts_by_id, the children are all the tokens whose ID is the ID of a child
+    child_ids = tokens[['sentence_id', 'HEAD', 'ID']].drop_duplicates()
+    counted_tokens = tokens.loc[tokens['DEPREL'].isin(list(REL_COUNTS)), ['sentence_id', 'ID', 'DEPREL']]
+    children = child_ids.merge(counted_tokens, on=['sentence_id', 'ID'])
+    label_counts = children.groupby(['sentence_id', 'HEAD', 'DEPREL']).size().reset_index(name='count')
+    label_counts = label_counts[label_counts['count'] > label_counts['DEPREL'].map(REL_COUNTS)]
+    error_counts = label_counts.groupby(['sentence_id', 'HEAD']).size()
+
+    # every token with the ID of an offending head, in order
+    token_keys = tokens.set_index(['sentence_id', 'ID']).index
+    token_error_counts = error_counts.reindex(token_keys, fill_value=0).to_numpy()
+    positions = np.repeat(np.arange(len(tokens)), token_error_counts)
+    return DataFrame({
+        'sentence_number': tokens['sentence_id'].to_numpy()[positions] + 1,
+        'token_id': tokens['ID'].to_numpy()[positions],
+        'flagged_issue': 'FLAG_MULTIPLE_DEPREL_LABELS'})
\ No newline at end of file
@@ -9,8 +9,11 @@
 
 from typing import List
 
+import numpy as np
+from pandas import concat
 from pandas.core.frame import DataFrame
 
+from utils.conll_corpus import ConllCorpus
 from .common_functions import get_sentence_column_data
 
 TAG_SET = {
@@ -74,3 +77,26 @@ def element_checker(sen_df: DataFrame) -> dict:
     deprel_err = check_tags(get_sentence_column_data(sen_df, "DEPREL"), 'DEPREL_LABELS')
     # return id_err + catib_err + catibex_err + deprel_err
     return catib_err + deprel_err
+
+def get_corpus_tag_errors(corpus: ConllCorpus, column_name: str, tag_set: str) -> DataFrame:
+    """Same as check_tags, for a column of all the sentences of a columnar corpus at once;
+    each tag of the column's vocabulary is looked up in the tag set only once.
+    """
+    is_valid_code = np.array([tag in TAG_SET[tag_set] for tag in corpus.vocabs[column_name].strings], dtype=bool)
+    is_error = ~is_valid_code[corpus.columns[column_name]]
+    return DataFrame({
+        'sentence_number': corpus.get_token_sentence_ids()[is_error] + 1,
+        'token_id': corpus.get_token_indexes()[is_error] + 1,
+        'flagged_issue': f"FLAG_{tag_set}"})
+
+def get_corpus_element_errors(corpus: ConllCorpus) -> DataFrame:
+    """Same as element_checker, for all the sentences of a columnar corpus at once.
+
+    Returns:
+        DataFrame: the sentence_number (starting from 1), token_id and flagged_issue
+            of each error; within a sentence, the CATiB errors come before the
+            DEPREL errors, as in element_checker
+    """
+    errors = concat([get_corpus_tag_errors(corpus, "UPOS", 'CATIB_TAGS'),
+                     get_corpus_tag_errors(corpus, "DEPREL", 'DEPREL_LABELS')], ignore_index=True)
+    return errors.sort_values('sentence_number', kind='stable', ignore_index=True)
@@ -22,17 +22,19 @@ TODO: update documentation (TokenInfo type added)
 
 """
 from dataclasses import dataclass
-import re
-from typing import List
+from typing import List, Tuple
+import numpy as np
 from camel_tools.morphology.analyzer import Analyzer
 from camel_tools.utils.dediac import dediac_ar as camel_dediac
-from camel_tools.utils.charsets import AR_CHARSET
-from .clitic_check import is_clitic, remove_elided_part
+from utils.analysis_cache import FormAnalysisCache
+from utils.conll_corpus import ConllCorpus
 from .common_functions import get_sentence_column_data
-from .data_structures import CatibTag
+from .token_classes import get_token_class, remove_elided_part
 from .prt_token_pos_dict import prt_token_pos_dict
 
 FORM_EXCEPTION_LIST = ['إيا', 'لقد']
+# When set to true, do not perform token analysis, unless the analyzer
+# is a FormAnalysisCache, whose lookups are cheap
 IGNORE_ANALYSIS = True
 
 def is_matching_pos(original_pos: str, pos_analysis: str) -> bool:
@@ -88,56 +90,32 @@ def is_valid_clitic_and_pos(token_info: TokenInfo, prt_token_pos_dict: dict) ->
     else: # only valid pos
         return {"flagged_issue": 'FLAG_FORM_POS_MISMATCH', 'token_id': token_info.token_id+1}
 
-def token_contains_invalid_characters(token):
-    # Concatenate all Arabic characters into a string
-    ar_str = u''.join(AR_CHARSET)
-
-    # Compile a regular expression using above string
-    arabic_re = re.compile(f'^[{re.escape(ar_str)}]+$')
-
-    token = token.replace('(*)', '')
-    return not arabic_re.match(token)
-
-def is_float(token):
-    try:
-        float(token)
-        return True
-    except ValueError:
-        return False
-
-def is_empty_token(token):
-    return token == ''
-
-def is_number(token, pos_tag):
-    return bool(token.isdigit() or is_float(token)) and pos_tag in [CatibTag.NOM.name, CatibTag.PROP.name]
-
-def is_pnx(pos_tag):
-    return pos_tag == CatibTag.PNX.name
-
 def flag_form_pos_errors(token_info: TokenInfo, prt_token_pos_dict: dict, analyzer: Analyzer):
     """Generates errors for invalid clitics and base word tokens.
 
     Args:
         token_info (TokenInfo): contains the token, token POS tag, and id in the original list
         prt_token_pos_dict (dict): contains the list of particles to check if a clitic token is valid
-        analyzer (Analyzer): cameltools analyzer
+        analyzer (Analyzer): cameltools analyzer, or a FormAnalysisCache
 
     Returns:
         dict: either an out-of-vocab error, or form-pos mismatch error. Empty dict if no error exists
     """
-    if is_empty_token(token_info.token):
+    # classified once per distinct FORM/UPOS pair
+    token_class = get_token_class(token_info.token, token_info.pos_tag)
+    if token_class.is_empty:
         return {"flagged_issue": 'FLAG_FORM_OOV', 'token_id': token_info.token_id+1}
     
-    if is_clitic(token_info.token): # if it starts/ends with a +
+    if token_class.form_class.is_clitic: # if it starts/ends with a +
         return is_valid_clitic_and_pos(token_info, prt_token_pos_dict)
     
     # replacing - in VRB-PASS to VRB_PASS,
     # checking if pos tag exists in enum
-    if token_info.pos_tag == CatibTag.FOREIGN.name:
+    if token_class.is_foreign:
         return {} # FOREIGN is OOV by default, no issue returned
 
     # if it's a punctuation mark or a number then possibly no error
-    if is_pnx(token_info.pos_tag) or is_number(token_info.token, token_info.pos_tag):
+    if token_class.is_pnx or token_class.is_number:
         return {}
 
     # Non-foreign tokens (handled above) containing
@@ -145,26 +123,33 @@ def flag_form_pos_errors(token_info: TokenInfo, prt_token_pos_dict: dict, analyz
     # (*) are excluded
     # clitics have been handled above, so + was taken care of.
     # Example: و(+) the parens are not valid
-    if token_contains_invalid_characters(token_info.token):
+    if token_class.form_class.has_invalid_characters:
         return {"flagged_issue": 'FLAG_FORM_OOV', 'token_id': token_info.token_id+1}
-        
 
-    # When set to true, do not perform token analysis
-    if IGNORE_ANALYSIS:
+    # analyses from the persistent cache are always checked
+    if isinstance(analyzer, FormAnalysisCache):
+        analyses = analyzer.get_analyses(token_info.token)
+    elif IGNORE_ANALYSIS:
         return {}
+    else:
+        analyses = [(analysis['atbtok'], analysis['catib6']) for analysis in analyzer.analyze(token_info.token)]
+    return flag_analysis_errors(token_info, analyses)
 
-    analyses = analyzer.analyze(token_info.token)
-    # iterate analyzer list of the token
-    
+def flag_analysis_errors(token_info: TokenInfo, analyses: List[Tuple[str, str]]) -> dict:
+    """Checks a token against the (atbtok, catib6) pairs of the analyses of its form.
+
+    Returns:
+        dict: either an out-of-vocab error, or form-pos mismatch error. Empty dict if no error exists
+    """
     if not analyses: # no analysis found
         return {"flagged_issue": 'FLAG_FORM_OOV', 'token_id': token_info.token_id+1}
     
     form_match = False
     pos_match = False
-    for analysis in analyses:
-        if is_matching_form(token_info.token, analysis['atbtok']):
+    for atbtok, catib6 in analyses:
+        if is_matching_form(token_info.token, atbtok):
             form_match = True
-            if is_matching_pos(token_info.pos_tag, analysis['catib6']):
+            if is_matching_pos(token_info.pos_tag, catib6):
                 pos_match = True
                 break
     if not form_match and token_info.token not in FORM_EXCEPTION_LIST:
@@ -174,6 +159,19 @@ def flag_form_pos_errors(token_info: TokenInfo, prt_token_pos_dict: dict, analyz
     else: # token and pos match, no error
         return {}
 
+def analyze_corpus_forms(corpus: ConllCorpus, analysis_cache: FormAnalysisCache) -> int:
+    """Analyzes, in one batch, the unique forms of a corpus that the FORM/UPOS
+    check will look up and that are not in the cache yet, so that the check
+    itself only does lookups.
+
+    Returns:
+        int: the number of forms analyzed
+    """
+    forms, pos_tags = corpus.vocabs['FORM'].strings, corpus.vocabs['UPOS'].strings
+    form_pos_pairs = np.unique(np.stack([corpus.columns['FORM'], corpus.columns['UPOS']], axis=1), axis=0)
+    return analysis_cache.add_forms(forms[form_code] for form_code, pos_code in form_pos_pairs.tolist()
+                                    if get_token_class(forms[form_code], pos_tags[pos_code]).is_analyzed)
+
 
 def form_pos_checker(conllx_df, analyzer: Analyzer) -> List[dict]:
     # sourcery skip: for-append-to-extend, use-named-expression
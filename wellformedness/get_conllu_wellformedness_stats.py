@@ -17,6 +17,7 @@ ERR_LIST = [
     "FLAG_PNX_POSITION",
     "FLAG_NONPROJECTIVE",
     "FLAG_ROOT_ATT",
+    "FLAG_MULTIPLE_ROOTS",
     ]
 
 def get_flagged_issue_count(df):
@@ -36,7 +37,7 @@ def add_missing_error_types(df_err_per_file, ERR_LIST):
     df_err_per_file = df_err_per_file.reindex(new_column_order, axis=1)
     return df_err_per_file
 
-def save_stats(dir_path, df_list, stats_dict_list=None):
+def save_stats(dir_path, df_list, stats_dict_list=None, checker_stats_df=None):
     df = pd.concat(df_list)
     
     # move filename to beginning
@@ -59,5 +60,9 @@ def save_stats(dir_path, df_list, stats_dict_list=None):
     df.to_csv(f'{dir_path}/error_stats_overview.tsv', sep='\t', index=False)
     df_err_per_file.to_csv(f'{dir_path}/error_stats_per_file.tsv', sep='\t', index=False)
     df_flagged_issue_count.to_csv(f'{dir_path}/error_stats_flagged_issue_count.tsv', sep='\t', index=False)
+    if checker_stats_df is not None:
+        # cumulative wall time, calls and flagged issues of each check
+        checker_stats_df.to_csv(f'{dir_path}/error_stats_checker_times.tsv', sep='\t', index=False)
+        print(checker_stats_df.to_string(index=False))
     print(f'stats saved to {dir_path}')
     print("stat summaries files start with 'error_stats'")
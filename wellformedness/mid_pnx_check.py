@@ -27,7 +27,18 @@ tree is not flagged if:
 """
 
 import re
+from typing import List
+import numpy as np
+from pandas import DataFrame, factorize
+
+from utils.conll_corpus import ConllCorpus
 from .common_functions import get_sentence_column_data
+from .token_classes import MID_PNX_PATTERN, get_form_class
+
+OPENING_CHARS, ENDING_CHARS, CLOSING_CHARS = '«([{"\'', '.?!؟', '»)]}\'"'
+# an ending pnx mark between an opening and a closing mark; the first opening
+# mark and the first ending mark after it are matched without backtracking
+PAREN_PNX_PATTERN = re.compile(r'[^\«\(\[\{\"\']*[\«\(\[\{\"\'][^\.\?\!\؟]*[\.\?\!\؟].*[\»\)\]\}\'\"]')
 
 def do_tokens_before_connect_after_pnx(tokens_before, pnx_token_id):
     """Checks if tokens before the pnx don't attach after the pnx
@@ -106,20 +117,14 @@ def is_valid_token_attachments(df, end_pnx_id_list):
 
 def drop_last_pnx_marks(df, pnx_id_list):
     """Since we aren't interested in the last pnx mark (or marks in the case of ...),
-    they are dropped recursively from the DataFrame before the pnx mark check."""
-    if df.empty:
-        return df
-    elif int(df.tail(1)['ID'].iloc[0]) in pnx_id_list:
+    they are dropped from the DataFrame before the pnx mark check."""
+    while not df.empty and int(df.tail(1)['ID'].iloc[0]) in pnx_id_list:
         pnx_id_list.remove(int(df.tail(1)['ID'].iloc[0]))
         df.drop(df.tail(1).index, inplace=True) # drop from df
-        return drop_last_pnx_marks(df, pnx_id_list)
     return df
 
 def get_mid_pnx_ids(df):
-    # pnx_pattern = '|'.join(['\.*', '\?*', '\!*', '\؟*'])
-    pnx_pattern = '|'.join(['\.', '\?', '\!', '\؟'])
-    
-    pnx_id_list = list(df[df["FORM"].str.contains(pnx_pattern)]["ID"])
+    pnx_id_list = list(df[df["FORM"].str.contains(MID_PNX_PATTERN)]["ID"])
     df = drop_last_pnx_marks(df, pnx_id_list)
     # return list(df.drop(df.tail(1).index)[df["FORM"].str.contains(pnx_pattern)]["ID"])
     return pnx_id_list
@@ -130,22 +135,119 @@ def is_valid_paren_pnx(df):
     # 'closing_pnx': '»)]}'
     # 'either_pnx': '—"\'\`
     # reg_pattern = r'([\«\(\[\{\"\']).*[\.\.\,\;\:\?\!\؟\،\؛\!\.].*([\»\)\]\}\'\"])'
-    reg_pattern = r'([\«\(\[\{\"\']).*[\.\.\?\!\؟\!\.].*([\»\)\]\}\'\"])'
-    # reg = re.compile(reg_pattern)
     sent = ' '.join(get_sentence_column_data(df, 'FORM'))
 
     # if there is no match, the line below returns true
-    return not re.search(reg_pattern, sent)
+    return not PAREN_PNX_PATTERN.match(sent)
 
 
-def mid_pnx_checker(main_df):
+def is_valid_mid_pnx_df(main_df):
     df = main_df.copy()
     # just get the punctuation in the middle of the sentence
     mid_sentence_pnx_id_list = get_mid_pnx_ids(df)
     
-    if len(mid_sentence_pnx_id_list) == df.shape[0] or \
+    return len(mid_sentence_pnx_id_list) == df.shape[0] or \
         (is_valid_paren_pnx(df) and 
-        is_valid_token_attachments(df, mid_sentence_pnx_id_list)):
-        return []
-    else:
-        return [{"flagged_issue": "FLAG_MID_PNX_ATT"}]
\ No newline at end of file
+        is_valid_token_attachments(df, mid_sentence_pnx_id_list))
+
+def get_segment_prefix_max(values: np.ndarray, sentence_ids: np.ndarray, bound: int) -> np.ndarray:
+    """Returns the maximum of values from the start of the sentence up to every
+    token; values are between 0 and bound, so that the keys of a sentence are
+    above those of the sentences before it.
+    """
+    keys = sentence_ids * bound + values
+    return np.maximum.accumulate(keys) - sentence_ids * bound
+
+def get_segment_suffix_min(values: np.ndarray, sentence_ids: np.ndarray, bound: int) -> np.ndarray:
+    """Returns the minimum of values from every token to the end of the sentence."""
+    keys = sentence_ids * bound + values
+    return np.minimum.accumulate(keys[::-1])[::-1] - sentence_ids * bound
+
+def get_mid_pnx_attachment(ids: np.ndarray, heads: np.ndarray, form_codes: np.ndarray, forms: List[str],
+                           sentence_offsets: np.ndarray) -> np.ndarray:
+    """Checks the attachments around the mid-sentence punctuation of all the
+    sentences of a corpus at once, as is_valid_mid_pnx_df does for one sentence.
+
+    The punctuation marks of each unique form are found once. Whether a token
+    before a mark attaches after it, or a token after a mark attaches before it,
+    is read from the running maximum HEAD from the start of the sentence and the
+    running minimum HEAD to the end of it, so each mark is checked in constant time.
+    Sentences whose IDs are not 1 to n are checked with is_valid_mid_pnx_df.
+
+    Args:
+        ids (np.ndarray): ID of every token
+        heads (np.ndarray): HEAD of every token
+        form_codes (np.ndarray): code of the FORM of every token
+        forms (List[str]): the FORM of each code
+        sentence_offsets (np.ndarray): index of the first token of each sentence, plus the token count
+
+    Returns:
+        np.ndarray: whether each sentence has a FLAG_MID_PNX_ATT error
+    """
+    ids, heads = np.asarray(ids, dtype=np.int64), np.asarray(heads, dtype=np.int64)
+    sentence_lengths = np.diff(sentence_offsets)
+    sentence_count, token_count = len(sentence_lengths), len(ids)
+    sentence_ids = np.repeat(np.arange(sentence_count), sentence_lengths)
+    positions = np.arange(token_count)
+    token_indexes = positions - np.repeat(sentence_offsets[:-1], sentence_lengths)
+    is_pnx = np.array([get_form_class(form).is_mid_pnx for form in forms], dtype=bool)[form_codes]
+
+    # the sentence without its last pnx marks ends at its last other token
+    body_lengths = np.zeros(sentence_count, dtype=np.int64)
+    np.maximum.at(body_lengths, sentence_ids[~is_pnx], token_indexes[~is_pnx] + 1)
+    is_body = token_indexes < body_lengths[sentence_ids]
+    mark_positions = positions[is_pnx & is_body]
+    mark_indexes = token_indexes[mark_positions]
+    mark_ids = mark_indexes + 1
+    mark_codes, mark_lengths = form_codes[mark_positions], body_lengths[sentence_ids[mark_positions]]
+
+    # the tokens exactly before and after a mark can attach to it if they are the same mark
+    before, after = np.maximum(mark_positions - 1, 0), np.minimum(mark_positions + 1, token_count - 1)
+    is_before_valid = (mark_indexes == 0) | (form_codes[before] == mark_codes) | (heads[before] < mark_ids)
+    is_after_valid = (mark_indexes + 1 == mark_lengths) | (form_codes[after] == mark_codes) \
+        | (heads[after] == 0) | (heads[after] > mark_ids)
+    # the other tokens before a mark attach before it, and the other tokens of the body after it attach after it or to the root
+    bound = max(int(heads.max(initial=0)), int(sentence_lengths.max(initial=0))) + 2
+    prefix_max = get_segment_prefix_max(np.maximum(heads, 0), sentence_ids, bound)
+    suffix_min = get_segment_suffix_min(np.where(is_body & (heads != 0), np.clip(heads, 1, None), bound - 1), sentence_ids, bound)
+    far_before, far_after = np.maximum(mark_positions - 2, 0), np.minimum(mark_positions + 2, token_count - 1)
+    is_far_before_valid = (mark_indexes < 2) | (prefix_max[far_before] < mark_ids)
+    is_far_after_valid = (mark_indexes + 2 >= mark_lengths) | (suffix_min[far_after] > mark_ids)
+    is_mark_valid = is_before_valid & is_after_valid & is_far_before_valid & is_far_after_valid
+    is_attachment_valid = np.bincount(sentence_ids[mark_positions[~is_mark_valid]], minlength=sentence_count) == 0
+
+    # only sentences with an opening, an ending and a closing character in their body can have one between the others
+    has_chars = [np.array([any(char in chars for char in form) for form in forms], dtype=bool)[form_codes] & is_body
+                 for chars in [OPENING_CHARS, ENDING_CHARS, CLOSING_CHARS]]
+    may_match = np.all([np.bincount(sentence_ids[has], minlength=sentence_count) > 0 for has in has_chars], axis=0)
+    is_paren_valid = np.ones(sentence_count, dtype=bool)
+    for sentence_id in np.flatnonzero(may_match & is_attachment_valid).tolist():
+        start = sentence_offsets[sentence_id]
+        body_forms = [forms[code] for code in form_codes[start:start + body_lengths[sentence_id]].tolist()]
+        is_paren_valid[sentence_id] = not PAREN_PNX_PATTERN.match(' '.join(body_forms))
+
+    is_flagged = (body_lengths > 0) & ~(is_attachment_valid & is_paren_valid)
+    for sentence_id in np.unique(sentence_ids[ids != token_indexes + 1]).tolist():
+        start, end = sentence_offsets[sentence_id], sentence_offsets[sentence_id + 1]
+        sentence_df = DataFrame({'ID': ids[start:end], 'HEAD': heads[start:end],
+                                 'FORM': [forms[code] for code in form_codes[start:end].tolist()]})
+        is_flagged[sentence_id] = not is_valid_mid_pnx_df(sentence_df)
+    return is_flagged
+
+def mid_pnx_checker(main_df):
+    form_codes, forms = factorize(main_df["FORM"])
+    is_flagged = get_mid_pnx_attachment(main_df["ID"].to_numpy(dtype=np.int64), main_df["HEAD"].to_numpy(dtype=np.int64),
+                                        form_codes, list(forms), np.array([0, main_df.shape[0]]))
+    return [{"flagged_issue": "FLAG_MID_PNX_ATT"}] if is_flagged[0] else []
+
+def get_corpus_mid_pnx_errors(corpus: ConllCorpus) -> DataFrame:
+    """Same as mid_pnx_checker, for all the sentences of a columnar corpus at once.
+
+    Returns:
+        DataFrame: the sentence_number (starting from 1) and flagged_issue of each error
+    """
+    is_flagged = get_mid_pnx_attachment(corpus.ids, corpus.heads, corpus.columns['FORM'],
+                                        corpus.vocabs['FORM'].strings, corpus.sentence_offsets)
+    return DataFrame({
+        'sentence_number': np.flatnonzero(is_flagged) + 1,
+        'flagged_issue': "FLAG_MID_PNX_ATT"})
@@ -5,20 +5,19 @@
 """
 
 import pprint as pp
+from typing import List, Tuple
+import numpy as np
 import pandas as pd
-from .common_functions import get_sentence_column_data, get_token_details
+from utils.conll_corpus import MISSING_HEAD_POSITION, ROOT_HEAD_POSITION, ConllCorpus
+from .common_functions import get_sentence_column_data, get_token_details_by_id, lookup_token_details
+from .token_classes import get_form_class
 # from wellformedness.patterns_list import get_patterns_list
 # from wellformedness.token_tuple_utils.get_tuple_patterns import fix_after_merge, update_clitic_upos, update_prt_upos
-from .token_tuple_utils.get_tuple_patterns import fix_after_merge, update_clitic_upos, update_prt_upos
+from .token_tuple_utils.get_tuple_patterns import fix_after_merge, get_new_pnx_name, update_clitic_upos, update_prt_upos
+from .syntax_patterns import get_pattern_set, read_pattern_file
 
-def get_patterns_list():  # sourcery skip: use-fstring-for-concatenation
-    pattern_data = read_pattern_file()
-    
-    # get only valid patterns
-    pattern_data = pattern_data[pattern_data['Final'] == 'OK']
-    
-    patterns = pattern_data['UPOS_child'] + "_" + pattern_data['DEPREL_child'] + '_' + pattern_data['UPOS_parent'] + '_' + pattern_data['direction']
-    return list(patterns)
+def get_patterns_list():
+    return get_pattern_set().get_patterns()
 
 def update_patterns(patterns):
     patterns = patterns.str.replace('PROP', 'NOM')
@@ -29,7 +28,8 @@ def update_patterns(patterns):
 def pattern_checker(main_df):
     df = main_df.copy()
     # combine UPOS_child_DEPREL_child_UPOS_parent
-    parent_list = [get_token_details(df, x) for x in list(get_sentence_column_data(df, "HEAD"))]
+    token_details = get_token_details_by_id(df)
+    parent_list = [lookup_token_details(token_details, x) for x in list(get_sentence_column_data(df, "HEAD"))]
     parent_df = pd.DataFrame(parent_list)
     # import pdb; pdb.set_trace()
     
@@ -43,17 +43,15 @@ def pattern_checker(main_df):
     fix_after_merge(merged)
     update_prt_upos(merged)
     update_clitic_upos(merged)
-    patterns = merged['UPOS_child'] + '_' +  merged['DEPREL_child'] + '_' + merged['UPOS_parent'] + '_' + merged['direction']
-    patterns = update_patterns(patterns)
+    # none of the replaced tags contain '_', so each field is updated on its own
+    is_valid = get_pattern_set().contains(*[update_patterns(merged[field]) for field in ['UPOS_child', 'DEPREL_child', 'UPOS_parent', 'direction']])
     
     patterns_df = pd.DataFrame({
         'token_id': merged['ID_child'],
         'UPOS_child': merged['UPOS_child'], 
-        'UPOS_parent': merged['UPOS_parent'], 
-        'patterns': patterns})
+        'UPOS_parent': merged['UPOS_parent']})
     
-    valid_patterns_list = get_patterns_list()
-    err_tokens = patterns_df[patterns_df['patterns'].isin(valid_patterns_list) == False]
+    err_tokens = patterns_df[~is_valid]
     err_patterns = []
     for _, row in err_tokens.iterrows():
         temp_err = {
@@ -65,21 +63,70 @@ def pattern_checker(main_df):
         err_patterns.append(temp_err)
     return err_patterns
 
+def get_form_decorations(forms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns what update_prt_upos and update_clitic_upos add to the tag of a token, for each form:
+    the suffix of PNX tags (e.g. '-B', or '' for other punctuation), and 1 for proclitics,
+    2 for enclitics, or 0 for other forms.
+    """
+    pnx_suffixes = np.array([get_new_pnx_name(form, None, 'PNX')[len('PNX'):] for form in forms], dtype=object)
+    form_classes = [get_form_class(form) for form in forms]
+    clitic_types = np.array([(1 if form_class.is_proclitic else 2 if form_class.is_enclitic else 0) if form_class.is_clitic else 0
+                             for form_class in form_classes], dtype=np.int8)
+    return pnx_suffixes, clitic_types
+
+def decorate_upos(upos: np.ndarray, pnx_suffixes: np.ndarray, clitic_types: np.ndarray) -> np.ndarray:
+    upos = np.where(upos == 'PNX', upos + pnx_suffixes, upos)
+    return np.where(clitic_types == 1, upos + '#', np.where(clitic_types == 2, '#' + upos, upos))
+
+def update_unique_patterns(values: np.ndarray) -> pd.Series:
+    # update_patterns once per unique tag
+    unique_values, inverse = np.unique(values, return_inverse=True)
+    return pd.Series(update_patterns(pd.Series(unique_values, dtype=object)).to_numpy()[inverse])
+
+def get_corpus_pattern_errors(corpus: ConllCorpus) -> pd.DataFrame:
+    """Same as pattern_checker, for all the sentences of a columnar corpus at once.
+
+    Parents are joined through their positions in the corpus, and the PNX
+    and clitic decorations of the tags are computed once per unique FORM.
 
-def read_pattern_file():
-    return pd.read_csv(
-        'data/patterns/patb123_patterns_v4.tsv',
-        header=0,
-        usecols=list(range(1, 12)),
-        sep='\t',
-    )
+    Args:
+        corpus (ConllCorpus): the sentences of a file
+
+    Returns:
+        pd.DataFrame: the sentence_number (starting from 1), token_id, pos_tag,
+            parent_pos_tag and flagged_issue of each token with an unknown
+            pattern, in the order of the corpus
+    """
+    # forms of the parents that are not tokens are ROOT, or --- if they are missing
+    forms = corpus.vocabs['FORM'].strings + ['ROOT', '---']
+    pnx_suffixes, clitic_types = get_form_decorations(forms)
+
+    ids = corpus.ids.astype(np.int64)
+    form_codes = corpus.columns['FORM']
+    upos = corpus.get_strings('UPOS')
+    head_positions = corpus.get_head_positions()
+    is_token_head = head_positions >= 0
+    parent_positions = np.where(is_token_head, head_positions, 0)
+    parent_form_codes = np.where(is_token_head, form_codes[parent_positions],
+                                 np.where(head_positions == ROOT_HEAD_POSITION, len(forms) - 2, len(forms) - 1))
+    parent_upos = np.where(is_token_head, upos[parent_positions], 'ROOT').astype(object)
+    parent_ids = np.where(is_token_head, ids[parent_positions], 0)
+    direction = np.where((head_positions != MISSING_HEAD_POSITION) & (parent_ids > ids), 'C-P', 'P-C')
+
+    upos = decorate_upos(upos, pnx_suffixes[form_codes], clitic_types[form_codes])
+    parent_upos = decorate_upos(parent_upos, pnx_suffixes[parent_form_codes], clitic_types[parent_form_codes])
+    deprels = update_patterns(pd.Series(corpus.vocabs['DEPREL'].strings, dtype=object)).to_numpy()[corpus.columns['DEPREL']]
+    is_valid = get_pattern_set().contains(update_unique_patterns(upos), pd.Series(deprels),
+                                          update_unique_patterns(parent_upos), pd.Series(direction))
+
+    is_error = ~is_valid
+    return pd.DataFrame({
+        'sentence_number': corpus.get_token_sentence_ids()[is_error] + 1,
+        'token_id': ids[is_error],
+        'pos_tag': upos[is_error],
+        'parent_pos_tag': parent_upos[is_error],
+        'flagged_issue': 'FLAG_UNK_SYNTAX_PATTERN'})
 
-# sourcery skip: use-fstring-for-concatenation
 if __name__ == '__main__':
-    # this code block imitates the get_patterns_list function above
-    pattern_data = read_pattern_file()
-    pattern_data = pattern_data[pattern_data['Final'] == 'OK']
-    
-    patterns = pattern_data['UPOS_child'] + "_" + pattern_data['DEPREL_child'] + '_' + pattern_data['UPOS_parent'] + '_' + pattern_data['direction']
-    pp.pprint(list(patterns))
+    pp.pprint(get_patterns_list())
 
@@ -16,20 +16,15 @@ see if the type is consistent with the parent location
 if not, return an error dict
 """
 # check under which pnx type it falls
-from .common_functions import get_sentence_column_data, get_token_details
+from typing import List
+import numpy as np
+from pandas import DataFrame, factorize
 
-# TODO: enums looks better here
-def get_pnx_type(pnx_token_form: str):
-    pnx_types = {
-        'ending_pnx': '..,;:?!؟،؛!.', # parent should be backwards
-        'opening_pnx': '«([{', # parent should be forwards
-        'closing_pnx': '»)]}', # parent should be backwards
-        'either_pnx': '—"\'\`' # parent can be either
-    }
-    for k, v in pnx_types.items():
-        if pnx_token_form in v:
-            return k
-    return 'not_pnx'
+from utils.conll_corpus import ConllCorpus, get_head_positions
+from .token_classes import get_form_class, get_pnx_type
+
+BACKWARD_PNX_TYPES = ['ending_pnx', 'closing_pnx']
+FORWARD_PNX_TYPES = ['opening_pnx']
 
 def compare_pnx_type_to_parent(pnx_type: str,  pnx_id: int, pnx_parent_token_id: int):
     err_dict = {"flagged_issue": 'FLAG_PNX_POSITION', 'token_id': pnx_id}
@@ -51,18 +46,56 @@ def flag_pnx_errors(pnx_id, pnx_token_form, pnx_parent_token_id, pnx_parent_form
     if pnx_parent_form == pnx_token_form:
         return {}
     
-    pnx_type = get_pnx_type(pnx_token_form)
+    pnx_type = get_form_class(pnx_token_form).pnx_type
     return compare_pnx_type_to_parent(pnx_type, pnx_id, pnx_parent_token_id)
 
+def get_pnx_position_errors(ids: np.ndarray, heads: np.ndarray, form_codes: np.ndarray, forms: List[str],
+                            sentence_ids: np.ndarray) -> np.ndarray:
+    """Checks the direction of the parent of every punctuation token, for all
+    the sentences of a corpus at once, as flag_pnx_errors does for one token.
+
+    The punctuation type of each unique form is found once, and the parents
+    are found through their positions instead of a search per token.
+
+    Args:
+        ids (np.ndarray): ID of every token
+        heads (np.ndarray): HEAD of every token
+        form_codes (np.ndarray): code of the FORM of every token
+        forms (List[str]): the FORM of each code
+        sentence_ids (np.ndarray): sentence of every token; tokens of a sentence are contiguous
+
+    Returns:
+        np.ndarray: whether each token has a FLAG_PNX_POSITION error
+    """
+    ids, heads = np.asarray(ids, dtype=np.int64), np.asarray(heads, dtype=np.int64)
+    pnx_types = [get_form_class(form).pnx_type for form in forms]
+    is_backward = np.array([pnx_type in BACKWARD_PNX_TYPES for pnx_type in pnx_types], dtype=bool)[form_codes]
+    is_forward = np.array([pnx_type in FORWARD_PNX_TYPES for pnx_type in pnx_types], dtype=bool)[form_codes]
+
+    # a parent with the same form can be on either side
+    head_positions = get_head_positions(ids, heads, sentence_ids)
+    is_token_head = head_positions >= 0
+    is_same_form = is_token_head & (form_codes[np.where(is_token_head, head_positions, 0)] == form_codes)
+    return ~is_same_form & ((is_backward & (heads > ids)) | (is_forward & (heads < ids)))
+
 def pnx_checker(df):
-    token_id_col = get_sentence_column_data(df, "ID")
-    token_form_col = get_sentence_column_data(df, "FORM")
-    token_parent_id_col = get_sentence_column_data(df, "HEAD")
-    
-    err_list = []
-    for tok_id, tok_form, token_parent_id in zip(token_id_col, token_form_col, token_parent_id_col):
-        token_parent = get_token_details(df, token_parent_id)
-        err_dict = flag_pnx_errors(tok_id, tok_form, token_parent_id, token_parent['FORM'])
-        if err_dict:
-            err_list.append(err_dict)
-    return err_list
\ No newline at end of file
+    form_codes, forms = factorize(df["FORM"])
+    ids = df["ID"].to_numpy(dtype=np.int64)
+    is_error = get_pnx_position_errors(ids, df["HEAD"].to_numpy(dtype=np.int64), form_codes, list(forms),
+                                       np.zeros(len(ids), dtype=np.int64))
+    return [{"flagged_issue": 'FLAG_PNX_POSITION', 'token_id': token_id} for token_id in ids[is_error].tolist()]
+
+def get_corpus_pnx_errors(corpus: ConllCorpus) -> DataFrame:
+    """Same as pnx_checker, for all the sentences of a columnar corpus at once.
+
+    Returns:
+        DataFrame: the sentence_number (starting from 1), flagged_issue and token_id
+            of each error, in the order of the corpus
+    """
+    sentence_ids = corpus.get_token_sentence_ids()
+    is_error = get_pnx_position_errors(corpus.ids, corpus.heads, corpus.columns['FORM'],
+                                       corpus.vocabs['FORM'].strings, sentence_ids)
+    return DataFrame({
+        'sentence_number': sentence_ids[is_error] + 1,
+        'flagged_issue': 'FLAG_PNX_POSITION',
+        'token_id': corpus.ids[is_error].astype(np.int64)})
@@ -1,14 +1,20 @@
 """
 2) ROOT (HEAD = 0) constraints
     - There exists exactly one root
+        (no root: FLAG_ROOT_ATT; more than one: FLAG_MULTIPLE_ROOTS)
     - The root has at least one child
         corollary: at least one child has the root as its parent
     - A path can be drawn from the root to every token in the tree
 """
-from typing import List
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
 from pandas import DataFrame
 
-from .common_functions import get_token_details
+from utils.conll_corpus import ConllCorpus, get_head_positions
+
+TOKEN_CONNECTED, TOKEN_IN_CYCLE, TOKEN_DISCONNECTED = 0, 1, 2
+TOKEN_REPORT_COLUMNS = ['root_ids', 'cycle_token_ids', 'disconnected_token_ids']
 
 def root_exists(df: DataFrame) -> bool:
     """Given a tree, check if at least one token contains root as a parent.
@@ -23,36 +29,158 @@ def root_exists(df: DataFrame) -> bool:
     return len(df[df["HEAD"] == 0].to_records('dict')) > 0 # and len(list(df[df["DEPREL"] == '---'])) > 0
 
 
-def is_connected(df: DataFrame, cur_node: dict, visited: List[int], to_root: List[int]) -> bool:
-    if cur_node["HEAD"] == 0 or int(cur_node["HEAD"]) in to_root:
-        visited.append(cur_node["ID"])
-        return to_root + visited
-    elif cur_node["ID"] in visited:
-        return False
-    else:
-        visited.append(cur_node["ID"])
-        return is_connected(df, get_token_details(df, cur_node["HEAD"]), visited, to_root)
-
 def all_connected_to_root(df: DataFrame) -> bool:
     """For each token, the token should either
         - point to the root
         - point to a token that recursively points to the root
-    
+
+    Heads are followed to the first token with their ID, and the walk from
+    a token stops at a token already known to reach the root, so each
+    token is visited about once.
+
     Args:
         df (DataFrame): dependency tree DataFrame
     """
-    to_root = []
-    for _, row in df.iterrows():
-        to_root = is_connected(df, row.to_dict(), [], to_root)
-        if not to_root:
-            return False
+    ids, heads = df['ID'].tolist(), df['HEAD'].tolist()
+    first_positions = {}
+    for position, token_id in enumerate(ids):
+        first_positions.setdefault(token_id, position)
+    to_root = set()
+    for position in range(len(ids)):
+        visited = set()
+        while heads[position] != 0 and int(heads[position]) not in to_root:
+            if ids[position] in visited or heads[position] not in first_positions:
+                # a cycle, or a head that is not a token
+                return False
+            visited.add(ids[position])
+            position = first_positions[heads[position]]
+        to_root.update(visited)
+        to_root.add(ids[position])
     return True
-    # return all(is_connected(df, row.to_dict(), [], []) for _, row in df.iterrows())
-
-def root_checker(df) -> List[dict]:
-    # check if a root exists
-    # check if tokens recursively reach the root
-    if root_exists(df) and all_connected_to_root(df):
-        return []
-    else:
-        return [{"flagged_issue": "FLAG_ROOT_ATT"}]
\ No newline at end of file
+
+def get_token_root_status(heads: np.ndarray, head_positions: np.ndarray, sentence_lengths: np.ndarray) -> np.ndarray:
+    """Finds which tokens reach the root, for all the sentences of a corpus at once.
+
+    Every token points to its head, and the pointers are doubled (each
+    token then points to the head of its head, and so on) until they have
+    jumped over the longest sentence, so each token ends up at the root, at
+    a head that is not a token, or in a cycle. The tokens that do not reach
+    the root are then walked once to find the cycles.
+
+    Args:
+        heads (np.ndarray): HEAD of every token
+        head_positions (np.ndarray): position of the head of every token, as returned by get_head_positions
+        sentence_lengths (np.ndarray): number of tokens of each sentence
+
+    Returns:
+        np.ndarray: TOKEN_CONNECTED, TOKEN_IN_CYCLE, or TOKEN_DISCONNECTED (for tokens
+            that lead to a cycle or to a head that is not a token) for every token
+    """
+    token_count = len(heads)
+    root_position, missing_position = token_count, token_count + 1
+    next_positions = np.where(heads == 0, root_position, np.where(head_positions >= 0, head_positions, missing_position))
+    next_positions = np.append(next_positions, [root_position, missing_position])
+    last_positions = next_positions
+    # 2 ** bit_length(n) > n jumps are enough for a path through n tokens
+    for _ in range(int(sentence_lengths.max(initial=0)).bit_length()):
+        last_positions = last_positions[last_positions]
+
+    status = np.where(last_positions[:token_count] == root_position, TOKEN_CONNECTED, TOKEN_DISCONNECTED).astype(np.int8)
+    # every token that ends up on a token is in a cycle, so walk each of these cycles once
+    for position in np.unique(last_positions[:token_count][last_positions[:token_count] < token_count]).tolist():
+        while status[position] != TOKEN_IN_CYCLE:
+            status[position] = TOKEN_IN_CYCLE
+            position = next_positions[position]
+    return status
+
+def get_root_attachment(ids: np.ndarray, heads: np.ndarray, sentence_offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Checks the ROOT constraints of all the sentences of a corpus at once.
+
+    Args:
+        ids (np.ndarray): ID of every token
+        heads (np.ndarray): HEAD of every token
+        sentence_offsets (np.ndarray): index of the first token of each sentence, plus the token count
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: whether each sentence has a FLAG_ROOT_ATT error,
+            and the status of every token (see get_token_root_status)
+    """
+    ids, heads = np.asarray(ids, dtype=np.int64), np.asarray(heads, dtype=np.int64)
+    sentence_lengths = np.diff(sentence_offsets)
+    sentence_ids = np.repeat(np.arange(len(sentence_lengths)), sentence_lengths)
+    status = get_token_root_status(heads, get_head_positions(ids, heads, sentence_ids), sentence_lengths)
+
+    root_counts = np.bincount(sentence_ids[heads == 0], minlength=len(sentence_lengths))
+    disconnected_counts = np.bincount(sentence_ids[status != TOKEN_CONNECTED], minlength=len(sentence_lengths))
+    is_flagged = (root_counts == 0) | (disconnected_counts > 0)
+    # with repeated IDs, which tokens reach the root depends on the order they are checked in
+    low, span = ids.min(initial=0), ids.max(initial=0) - ids.min(initial=0) + 1
+    id_keys = np.sort(sentence_ids * span + ids - low)
+    for sentence_id in np.unique(id_keys[1:][id_keys[1:] == id_keys[:-1]] // span).tolist():
+        start, end = sentence_offsets[sentence_id], sentence_offsets[sentence_id + 1]
+        sentence_df = DataFrame({'ID': ids[start:end], 'HEAD': heads[start:end]})
+        is_flagged[sentence_id] = not (root_exists(sentence_df) and all_connected_to_root(sentence_df))
+    return is_flagged, status
+
+def get_root_error(ids: np.ndarray, heads: np.ndarray, status: np.ndarray, report_tokens: bool) -> dict:
+    root_error = {"flagged_issue": "FLAG_ROOT_ATT"}
+    if report_tokens:
+        root_error["root_ids"] = ids[heads == 0].tolist()
+        root_error["cycle_token_ids"] = ids[status == TOKEN_IN_CYCLE].tolist()
+        root_error["disconnected_token_ids"] = ids[status == TOKEN_DISCONNECTED].tolist()
+    return root_error
+
+def get_multiple_roots_error(ids: np.ndarray, heads: np.ndarray, report_tokens: bool) -> dict:
+    multiple_roots_error = {"flagged_issue": "FLAG_MULTIPLE_ROOTS"}
+    if report_tokens:
+        multiple_roots_error["root_ids"] = ids[heads == 0].tolist()
+    return multiple_roots_error
+
+def root_checker(df, report_tokens: bool = False) -> List[dict]:
+    """Checks that a root exists, and that every token reaches it (FLAG_ROOT_ATT),
+    and that only one token is attached to the root (FLAG_MULTIPLE_ROOTS).
+
+    Args:
+        df (DataFrame): the dependency tree
+        report_tokens (bool, optional): also list the ids of the tokens attached to the
+            root (root_ids; more than one is not an error on its own), of the tokens in
+            a cycle (cycle_token_ids) and of the other tokens that do not reach the
+            root (disconnected_token_ids). Defaults to False.
+
+    Returns:
+        List[dict]: a FLAG_ROOT_ATT error, a FLAG_MULTIPLE_ROOTS error (also with
+            root_ids if report_tokens is True), both, or an empty list
+    """
+    ids, heads = df['ID'].to_numpy(dtype=np.int64), df['HEAD'].to_numpy(dtype=np.int64)
+    is_flagged, status = get_root_attachment(ids, heads, np.array([0, len(ids)]))
+    root_errors = [get_root_error(ids, heads, status, report_tokens)] if is_flagged[0] else []
+    if np.count_nonzero(heads == 0) > 1:
+        root_errors.append(get_multiple_roots_error(ids, heads, report_tokens))
+    return root_errors
+
+def get_corpus_root_errors(corpus: ConllCorpus, report_tokens: bool = False) -> DataFrame:
+    """Same as root_checker, for all the sentences of a columnar corpus at once.
+
+    Returns:
+        DataFrame: the sentence_number (starting from 1) and flagged_issue of each
+            error (and the token ids of root_checker if report_tokens is True; the
+            FLAG_MULTIPLE_ROOTS rows only have root_ids)
+    """
+    is_flagged, status = get_root_attachment(corpus.ids, corpus.heads, corpus.sentence_offsets)
+    sentence_ids = np.flatnonzero(is_flagged)
+    offsets = corpus.sentence_offsets
+    errors = DataFrame([get_root_error(corpus.ids[offsets[i]:offsets[i + 1]], corpus.heads[offsets[i]:offsets[i + 1]],
+                                       status[offsets[i]:offsets[i + 1]], report_tokens) for i in sentence_ids.tolist()],
+                       columns=['flagged_issue'] + (TOKEN_REPORT_COLUMNS if report_tokens else []))
+    errors.insert(0, 'sentence_number', sentence_ids + 1)
+
+    heads = np.asarray(corpus.heads, dtype=np.int64)
+    root_counts = np.bincount(corpus.get_token_sentence_ids()[heads == 0], minlength=corpus.get_sentence_count())
+    multiple_root_ids = np.flatnonzero(root_counts > 1)
+    multiple_roots_errors = DataFrame([get_multiple_roots_error(corpus.ids[offsets[i]:offsets[i + 1]], heads[offsets[i]:offsets[i + 1]],
+                                                                report_tokens) for i in multiple_root_ids.tolist()],
+                                      columns=['flagged_issue'] + (['root_ids'] if report_tokens else []))
+    multiple_roots_errors.insert(0, 'sentence_number', multiple_root_ids + 1)
+    # the FLAG_ROOT_ATT error of a sentence comes first, as in root_checker
+    return pd.concat([errors, multiple_roots_errors], ignore_index=True)\
+        .sort_values('sentence_number', kind='stable', ignore_index=True)
@@ -0,0 +1,364 @@
+"""Runs the token-level and sentence-level checks of a dependency tree,
+and collects the errors and counts of a file.
+"""
+from dataclasses import dataclass
+import os
+import pathlib
+import time
+from typing import Callable, Dict, Iterable, List, Sequence
+import numpy as np
+import pandas as pd
+
+from utils.analysis_cache import FormAnalysisCache
+from utils.conll_corpus import ConllCorpus
+from utils.conll_io import ConllSentence
+from utils.corpus_cache import get_file_hash
+from utils.dir_utils import remove_file_name_extension
+from utils.sentence_error_cache import SentenceErrorCache, get_corpus_sentence_hashes, get_sentence_hash
+from wellformedness.clitic_check import clitic_checker, get_corpus_clitic_errors
+from wellformedness.common_functions import add_token_level_details
+from wellformedness.data_structures import FlaggedIssue
+from wellformedness.conllx_check import conllx_checker, get_corpus_conllx_errors
+from wellformedness.element_check import element_checker, get_corpus_element_errors
+from wellformedness.form_pos_check import analyze_corpus_forms, form_pos_checker
+from wellformedness.pattern_check import get_corpus_pattern_errors, pattern_checker
+from wellformedness.mid_pnx_check import get_corpus_mid_pnx_errors, mid_pnx_checker
+from wellformedness.pnx_position_check import get_corpus_pnx_errors, pnx_checker
+from wellformedness.projectivity_check import projective_checker
+from wellformedness.root_check import get_corpus_root_errors, root_checker
+from wellformedness.deprel_check import deprel_checker, get_corpus_deprel_errors
+from wellformedness.syntax_patterns import PATTERN_FILE_PATH
+
+# increase when a check (or the format of cached errors) changes, so that errors cached by an earlier version are not used
+CHECKS_VERSION = 3
+
+@dataclass
+class Checker:
+    """A check of the tree of a sentence.
+
+    Attributes:
+        name (str): name used to select the check (--checks/--skip_checks)
+        check (Callable): returns the errors of a sentence DataFrame; checks that
+            use the morphological analyzer also take it as a second argument
+        is_token_level (bool): whether the errors are about tokens, which get token details
+        uses_analyzer (bool): whether check takes the analyzer
+        corpus_check (Callable): same check for all the sentences of a columnar corpus at once,
+            returning a table of errors with a sentence_number column, if there is one
+        details_argument (str): keyword argument of check (and corpus_check) that adds
+            details to its errors, set when details are reported, if there is one
+    """
+    name: str
+    check: Callable
+    is_token_level: bool
+    uses_analyzer: bool = False
+    corpus_check: Callable = None
+    details_argument: str = None
+
+# all the checks, in the order their errors are reported
+CHECKERS = [
+    Checker('element', element_checker, True, corpus_check=get_corpus_element_errors),
+    Checker('clitic', clitic_checker, True, corpus_check=get_corpus_clitic_errors),
+    Checker('form_pos', form_pos_checker, True, uses_analyzer=True),
+    Checker('pnx', pnx_checker, True, corpus_check=get_corpus_pnx_errors),
+    Checker('pattern', pattern_checker, True, corpus_check=get_corpus_pattern_errors),
+    Checker('deprel', deprel_checker, True, corpus_check=get_corpus_deprel_errors),
+    Checker('projectivity', projective_checker, False, details_argument='report_arcs'),
+    Checker('root', root_checker, False, corpus_check=get_corpus_root_errors, details_argument='report_tokens'),
+    Checker('mid_pnx', mid_pnx_checker, False, corpus_check=get_corpus_mid_pnx_errors),
+    Checker('conllx', conllx_checker, False, corpus_check=get_corpus_conllx_errors),
+]
+CHECKER_NAMES = [checker.name for checker in CHECKERS]
+# checks that can also run on all the sentences of a columnar corpus at once, by name
+CORPUS_CHECKERS = {checker.name: checker.corpus_check for checker in CHECKERS if checker.corpus_check is not None}
+
+def get_checker_names(checks: str = None, skip_checks: str = None) -> List[str]:
+    """Returns the names of the checks to run, in the order of CHECKERS.
+
+    Args:
+        checks (str, optional): comma-separated names of the checks to run. Defaults to None, for all of them.
+        skip_checks (str, optional): comma-separated names of the checks not to run. Defaults to None.
+    """
+    def split_names(names: str) -> List[str]:
+        names = [name.strip() for name in names.split(',') if name.strip()]
+        for name in names:
+            if name not in CHECKER_NAMES:
+                raise ValueError(f'Unknown check {name}. Use one of: {", ".join(CHECKER_NAMES)}')
+        return names
+
+    selected_names = split_names(checks) if checks else CHECKER_NAMES
+    skipped_names = split_names(skip_checks) if skip_checks else []
+    return [name for name in CHECKER_NAMES if name in selected_names and name not in skipped_names]
+
+@dataclass
+class CheckerStats:
+    calls: int = 0
+    seconds: float = 0
+    flagged_issues: int = 0
+
+class CheckerSet:
+    """The checks to run, with the cumulative wall time they take, how many
+    times they run, and how many issues they flag.
+
+    Args:
+        names (List[str], optional): names of the checks, as returned by get_checker_names.
+            Defaults to None, for all of them.
+        report_details (bool, optional): have the checks that can add details to their
+            errors (see Checker.details_argument) do so. Defaults to False.
+    """
+    def __init__(self, names: List[str] = None, report_details: bool = False):
+        self.checkers = [checker for checker in CHECKERS if names is None or checker.name in names]
+        self.names = [checker.name for checker in self.checkers]
+        self.report_details = report_details
+        self.reset_stats()
+
+    def get_check_kwargs(self, checker: Checker) -> dict:
+        return {checker.details_argument: True} if self.report_details and checker.details_argument else {}
+
+    def reset_stats(self):
+        self.stats = {name: CheckerStats() for name in self.names}
+
+    def get_stats(self) -> Dict[str, CheckerStats]:
+        return dict(self.stats)
+
+    def run(self, checker: Checker, conllx_df, analyzer, corpus_errors: Dict[str, List[dict]] = None) -> List[dict]:
+        """Returns the errors of the sentence found by the corpus version of a check, or runs the check on the sentence."""
+        stats = self.stats[checker.name]
+        if corpus_errors is not None and checker.name in corpus_errors:
+            errors = corpus_errors[checker.name]
+        else:
+            start_time = time.perf_counter()
+            check_args = (conllx_df, analyzer) if checker.uses_analyzer else (conllx_df,)
+            errors = checker.check(*check_args, **self.get_check_kwargs(checker))
+            stats.seconds += time.perf_counter() - start_time
+            stats.calls += 1
+        stats.flagged_issues += len(errors)
+        return errors
+
+    def add_cached_errors(self, checker_errors: Dict[str, List[dict]]):
+        """Counts the errors of a sentence taken from a SentenceErrorCache instead of running the checks,
+        so that flagged_issues covers every sentence of the reports."""
+        for name, errors in checker_errors.items():
+            if name in self.stats:
+                self.stats[name].flagged_issues += len(errors)
+
+    def run_corpus_checkers(self, corpus: ConllCorpus) -> Dict[str, Dict[int, List[dict]]]:
+        """Runs the selected checks that have a corpus version on all the sentences of a corpus.
+
+        Returns:
+            Dict[str, Dict[int, List[dict]]]: errors by check name, then by sentence number
+        """
+        corpus_errors = {}
+        for checker in self.checkers:
+            if checker.corpus_check is not None:
+                start_time = time.perf_counter()
+                corpus_errors[checker.name] = group_sentence_errors(checker.corpus_check(corpus, **self.get_check_kwargs(checker)))
+                self.stats[checker.name].seconds += time.perf_counter() - start_time
+                self.stats[checker.name].calls += 1
+        return corpus_errors
+
+# used when no CheckerSet is given
+ALL_CHECKERS = CheckerSet()
+
+def merge_checker_stats(stats_list: Iterable[Dict[str, CheckerStats]]) -> Dict[str, CheckerStats]:
+    """Adds up the stats of the checks over several files (or processes)."""
+    merged_stats = {}
+    for checker_stats in stats_list:
+        for name, stats in checker_stats.items():
+            total = merged_stats.setdefault(name, CheckerStats())
+            total.calls += stats.calls
+            total.seconds += stats.seconds
+            total.flagged_issues += stats.flagged_issues
+    return merged_stats
+
+def get_checker_stats_df(checker_stats: Dict[str, CheckerStats]) -> pd.DataFrame:
+    """Returns the stats of the checks as a table, slowest check first."""
+    df = pd.DataFrame([{'check': name, 'calls': stats.calls, 'seconds': stats.seconds, 'flagged_issues': stats.flagged_issues}
+                       for name, stats in checker_stats.items()],
+                      columns=['check', 'calls', 'seconds', 'flagged_issues'])
+    return df.sort_values('seconds', ascending=False, ignore_index=True)
+
+def get_checker_errors(conllx_df, analyzer, corpus_errors: Dict[str, List[dict]] = None,
+                       checkers: CheckerSet = None) -> Dict[str, List[dict]]:
+    """Runs the checks on a sentence.
+
+    Returns:
+        Dict[str, List[dict]]: the errors of each check by name, token errors (with their
+            token details) first, then sentence errors, in the order of CHECKERS
+    """
+    checkers = checkers or ALL_CHECKERS
+    checker_errors = {}
+    for is_token_level in [True, False]:
+        for checker in checkers.checkers:
+            if checker.is_token_level == is_token_level:
+                errors = checkers.run(checker, conllx_df, analyzer, corpus_errors)
+                checker_errors[checker.name] = add_token_level_details(conllx_df, errors) if is_token_level else errors
+    return checker_errors
+
+def get_error_cache_config(morphology_db_type: str, analyze: bool, checker_names: List[str] = CHECKER_NAMES,
+                           report_details: bool = False) -> str:
+    """Returns the SentenceErrorCache configuration of the current checks: their version, selection
+    and details, the morphology analysis in use, and the content of the syntax pattern file.
+    """
+    return (f'{CHECKS_VERSION}:{",".join(checker_names)}{":details" if report_details else ""}:'
+            f'{morphology_db_type if analyze else "no_analysis"}:{get_file_hash(PATTERN_FILE_PATH)}')
+
+def get_sentence_all_errors(sentence: ConllSentence, analyzer, corpus_errors: Dict[str, List[dict]] = None,
+                            error_cache: SentenceErrorCache = None, checkers: CheckerSet = None,
+                            sentence_hash: str = None) -> List[FlaggedIssue]:
+    conllx_df = sentence.df
+    conllx_df.reset_index(drop=True, inplace=True)
+    
+    if error_cache is not None and sentence_hash is None:
+        sentence_hash = get_sentence_hash(conllx_df)
+    checker_errors = error_cache.get(sentence_hash) if error_cache is not None else None
+    if checker_errors is None:
+        checker_errors = get_checker_errors(conllx_df, analyzer, corpus_errors, checkers)
+        if error_cache is not None:
+            error_cache.put(sentence_hash, checker_errors)
+    else:
+        (checkers or ALL_CHECKERS).add_cached_errors(checker_errors)
+
+    return [FlaggedIssue.from_dict(one_err, sentence.sentence_id+1)
+            for errors in checker_errors.values() for one_err in errors]
+
+def get_all_errors(sentences: Iterable[ConllSentence], analyzer, corpus_errors: Dict[str, Dict[int, List[dict]]] = None,
+                   error_cache: SentenceErrorCache = None, checkers: CheckerSet = None,
+                   sentence_hashes: Sequence[str] = None) -> dict:
+    """Checks every sentence, counting sentences, tokens, and words along the way,
+    so that the sentences can be read one at a time.
+
+    Args:
+        sentences (Iterable[ConllSentence]): sentences of a CoNLL file
+        analyzer (Analyzer): cameltools analyzer
+        corpus_errors (Dict[str, Dict[int, List[dict]]], optional): errors already found
+            for the whole file by the checks in CORPUS_CHECKERS, by check name then by
+            sentence number. Defaults to None, which runs every check on each sentence.
+        error_cache (SentenceErrorCache, optional): errors of the sentences already
+            checked; only the other sentences are checked, and added to it. Defaults to None.
+        checkers (CheckerSet, optional): the checks to run, which also keeps their timings.
+            Defaults to None, for all the checks.
+        sentence_hashes (Sequence[str], optional): hash of each sentence for error_cache, by
+            sentence id, if already computed. Defaults to None.
+
+    Returns:
+        dict: errors of all sentences, the text of the sentences with errors by
+            sentence number, and counts of the file
+    """
+    all_errors = []
+    sentence_texts = {}
+    conllx_counts = {"sentence_count": 0, "token_count": 0, "word_count": 0}
+    for sentence in sentences:
+        sentence_errors = None if corpus_errors is None else \
+            {name: errors.get(sentence.sentence_id + 1, []) for name, errors in corpus_errors.items()}
+        sentence_hash = sentence_hashes[sentence.sentence_id] if sentence_hashes is not None else None
+        sentence_errors = get_sentence_all_errors(sentence, analyzer, sentence_errors, error_cache, checkers, sentence_hash)
+        if sentence_errors:
+            sentence_texts[sentence.sentence_id + 1] = sentence.text_line
+        all_errors += sentence_errors
+        update_conllx_counts(conllx_counts, sentence.df)
+    return {
+        "conllx_errors": all_errors,
+        "sentence_texts": sentence_texts,
+        "conllx_counts": conllx_counts
+        }
+
+def group_sentence_errors(errors_df: pd.DataFrame) -> Dict[int, List[dict]]:
+    """Splits a table of errors with a sentence_number column into lists of error dicts, by sentence number."""
+    sentence_errors = {}
+    for error in errors_df.to_dict('records'):
+        sentence_errors.setdefault(error.pop('sentence_number'), []).append(error)
+    return sentence_errors
+
+def get_corpus_all_errors(corpus: ConllCorpus, analyzer, error_cache: SentenceErrorCache = None,
+                          checkers: CheckerSet = None) -> dict:
+    """Same as get_all_errors, with the checks in CORPUS_CHECKERS run on the whole file at once.
+
+    Args:
+        corpus (ConllCorpus): the sentences of a CoNLL file
+        analyzer (Analyzer): cameltools analyzer; the forms of a FormAnalysisCache
+            are analyzed in one batch before the checks
+        error_cache (SentenceErrorCache, optional): see get_all_errors; the whole-file
+            checks and the batch analysis only cover the sentences it does not have.
+            Defaults to None.
+        checkers (CheckerSet, optional): see get_all_errors. Defaults to None.
+
+    Returns:
+        dict: errors of all sentences and counts of the file
+    """
+    checkers = checkers or ALL_CHECKERS
+    sentence_hashes, checked_ids, checked_corpus = None, None, corpus
+    if error_cache is not None:
+        sentence_hashes = get_corpus_sentence_hashes(corpus)
+        checked_ids = np.array([sentence_id for sentence_id, sentence_hash in enumerate(sentence_hashes)
+                                if sentence_hash not in error_cache], dtype=np.int64)
+        checked_corpus = corpus.select_sentences(checked_ids)
+
+    corpus_errors = {}
+    if checked_corpus.get_sentence_count():
+        if isinstance(analyzer, FormAnalysisCache) and 'form_pos' in checkers.names:
+            analyze_corpus_forms(checked_corpus, analyzer)
+        corpus_errors = checkers.run_corpus_checkers(checked_corpus)
+        if checked_ids is not None:
+            # back to the sentence numbers of the whole file
+            corpus_errors = {name: {int(checked_ids[sentence_number - 1]) + 1: errors
+                                    for sentence_number, errors in sentence_errors.items()}
+                             for name, sentence_errors in corpus_errors.items()}
+    return get_all_errors(corpus.get_conll_sentences(), analyzer, corpus_errors, error_cache, checkers, sentence_hashes)
+
+def format_error_detail(value):
+    # lists of token ids as 1,4,7 and lists of (head, dependent) arcs as 2-5,3-6
+    if isinstance(value, (list, tuple)):
+        return ','.join('-'.join(str(part) for part in item) if isinstance(item, (list, tuple)) else str(item)
+                        for item in value)
+    return value
+
+def update_df_columns(all_errors: List[FlaggedIssue], sentence_texts: Dict[int, str], file_name):
+    df = pd.DataFrame([error.to_dict() for error in all_errors])
+    if not df.empty:
+        df['text'] = df['sentence_number'].map(sentence_texts)
+    
+    # columns may be missing if either no token errors were encountered or sentence errors
+    cols = ["flagged_issue", "sentence_number", "token_id", "form", "pos_tag", "label", "parent_id", "parent_form" ,"parent_pos_tag", "direction", "text"]
+    # details reported by some checks (see SentenceFlaggedIssue) follow the usual columns
+    detail_cols = [col for col in df.columns if col not in cols]
+    df = df.reindex(df.columns.union(cols, sort=False), axis=1, fill_value=0)
+    
+    df = df[["flagged_issue", "sentence_number", "token_id", "form", "pos_tag", "label", "parent_id", "parent_form" ,"parent_pos_tag", "direction", "text"] + detail_cols]
+    for col in detail_cols:
+        df[col] = df[col].map(format_error_detail)
+    df['file_name'] = file_name
+    return df
+
+# TODO, generate correct number of words using a proper token check function
+def update_conllx_counts(conllx_counts: dict, conllx_df) -> dict:
+    conllx_counts["sentence_count"] += 1
+    conllx_counts["token_count"] += conllx_df.shape[0]
+    conllx_counts["word_count"] += conllx_df[~conllx_df['FORM'].str.contains('\+')].shape[0]
+    return conllx_counts
+
+def save_file_errors(conll_file: str, errors_and_stats: dict, output_path, relative_dir: str = '') -> tuple:
+    """Saves the errors of a file in a tsv file in the output directory.
+
+    Args:
+        conll_file (str): path of the CoNLL file
+        errors_and_stats (dict): errors and counts of the whole file
+        output_path (str): directory to save the tsv file in
+        relative_dir (str, optional): subdirectory of output_path to save the tsv file in
+            (see get_relative_output_dir), which is also part of the file name in the
+            reports. Defaults to ''.
+
+    Returns:
+        tuple: the file's errors DataFrame and its counts
+    """
+    file_name = os.path.join(relative_dir, pathlib.Path(conll_file).name)
+    (pathlib.Path(output_path) / relative_dir).mkdir(parents=True, exist_ok=True)
+    stats_dict = {'file_name': remove_file_name_extension(file_name), 
+                'sentence_count': errors_and_stats["conllx_counts"]["sentence_count"],
+                'tok_count': errors_and_stats["conllx_counts"]["token_count"],
+                'word_count': errors_and_stats["conllx_counts"]["word_count"]}
+
+    df = update_df_columns(errors_and_stats["conllx_errors"], errors_and_stats["sentence_texts"],
+                           remove_file_name_extension(file_name))
+    # will save errors per file in separate tsv files.
+    df.to_csv(f"{output_path}/{remove_file_name_extension(file_name)}.tsv", sep='\t', index=False)
+    return df, stats_dict
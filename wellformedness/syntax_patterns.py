@@ -0,0 +1,144 @@
+"""Valid (child UPOS, DEPREL, parent UPOS, direction) patterns, compiled once.
+
+Each field of a pattern is mapped to a small integer code, and the valid
+patterns are kept as a bitmap indexed by the codes of their four fields, so
+checking the tokens of a sentence is a few dictionary lookups and one array
+index, without reading the pattern file again.
+
+The pattern file is found relative to the package, not the working
+directory. It is compiled in memory the first time it is needed, or loaded
+from a precompiled artifact (<pattern file name>.npz, next to it) if one was
+saved for the current version of the file:
+
+    python -m wellformedness.syntax_patterns
+"""
+import os
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from pandas import Series
+
+PATTERN_FILE_PATH = Path(__file__).resolve().parent.parent / 'data' / 'patterns' / 'patb123_patterns_v4.tsv'
+PATTERN_FIELDS = ['UPOS_child', 'DEPREL_child', 'UPOS_parent', 'direction']
+
+def get_compiled_pattern_path(pattern_file_path=PATTERN_FILE_PATH) -> Path:
+    pattern_file_path = Path(pattern_file_path)
+    return pattern_file_path.parent / f'{pattern_file_path.name}.npz'
+
+def read_pattern_file(pattern_file_path=PATTERN_FILE_PATH) -> pd.DataFrame:
+    return pd.read_csv(
+        pattern_file_path,
+        header=0,
+        usecols=list(range(1, 12)),
+        sep='\t',
+    )
+
+def get_valid_pattern_data(pattern_file_path=PATTERN_FILE_PATH) -> pd.DataFrame:
+    pattern_data = read_pattern_file(pattern_file_path)
+    # get only valid patterns
+    return pattern_data[pattern_data['Final'] == 'OK']
+
+class SyntaxPatternSet:
+    """Set of valid patterns, with the values of each field coded as integers."""
+    def __init__(self, field_values: List[List[str]], pattern_codes: np.ndarray):
+        """
+        Args:
+            field_values (List[List[str]]): values of each field, in the order of PATTERN_FIELDS;
+                the code of a value is its position in the list
+            pattern_codes (np.ndarray): codes of the fields of each valid pattern, one row per pattern
+        """
+        self.field_values = field_values
+        self.field_codes: List[Dict[str, int]] = [{value: code for code, value in enumerate(values)} for values in field_values]
+        self.shape = tuple(len(values) for values in field_values)
+        self.pattern_codes = pattern_codes
+        self.bitmap = np.zeros(self.shape, dtype=bool)
+        if len(pattern_codes):
+            self.bitmap[tuple(pattern_codes.T)] = True
+
+    @classmethod
+    def from_pattern_data(cls, pattern_data: pd.DataFrame) -> 'SyntaxPatternSet':
+        field_values, field_codes = [], []
+        for field in PATTERN_FIELDS:
+            codes, values = pd.factorize(pattern_data[field], sort=True)
+            field_values.append(list(values))
+            field_codes.append(codes)
+        pattern_codes = np.stack(field_codes, axis=1) if field_codes[0].size else np.empty((0, len(PATTERN_FIELDS)), dtype=np.int64)
+        return cls(field_values, pattern_codes.astype(np.int64))
+
+    def __len__(self) -> int:
+        return int(self.bitmap.sum())
+
+    def __contains__(self, pattern) -> bool:
+        codes = tuple(field_codes.get(value) for field_codes, value in zip(self.field_codes, pattern))
+        return None not in codes and bool(self.bitmap[codes])
+
+    def get_patterns(self) -> List[str]:
+        return ['_'.join(self.field_values[i][code] for i, code in enumerate(codes)) for codes in self.pattern_codes.tolist()]
+
+    def contains(self, upos_child: Series, deprel_child: Series, upos_parent: Series, direction: Series) -> np.ndarray:
+        """Checks the patterns of many tokens at once.
+
+        Args:
+            upos_child (Series): UPOS of each token
+            deprel_child (Series): DEPREL of each token
+            upos_parent (Series): UPOS of the parent of each token
+            direction (Series): C-P or P-C for each token
+
+        Returns:
+            np.ndarray: whether the pattern of each token is valid; patterns with
+                a value that no valid pattern has (including NaN) are not
+        """
+        columns = [upos_child, deprel_child, upos_parent, direction]
+        codes = [column.map(field_codes).to_numpy(dtype=float, na_value=np.nan) for column, field_codes in zip(columns, self.field_codes)]
+        is_known = np.logical_and.reduce([~np.isnan(field_codes) for field_codes in codes])
+        is_valid = np.zeros(len(is_known), dtype=bool)
+        known_codes = tuple(field_codes[is_known].astype(np.int64) for field_codes in codes)
+        is_valid[is_known] = self.bitmap[known_codes]
+        return is_valid
+
+def save_pattern_set(pattern_set: SyntaxPatternSet, pattern_file_path=PATTERN_FILE_PATH):
+    """Saves a compiled pattern set next to its pattern file, with the file's size
+    and mtime so that it is not used once the file changes."""
+    file_stat = os.stat(pattern_file_path)
+    compiled_path = get_compiled_pattern_path(pattern_file_path)
+    # np.savez adds .npz to names without it, so the temporary file keeps the extension
+    temp_path = compiled_path.parent / f'.{compiled_path.name[:-len(".npz")]}.{os.getpid()}.npz'
+    np.savez(temp_path,
+             pattern_codes=pattern_set.pattern_codes,
+             file_stat=np.array([file_stat.st_size, file_stat.st_mtime_ns], dtype=np.int64),
+             **{field: np.array(values, dtype=str) for field, values in zip(PATTERN_FIELDS, pattern_set.field_values)})
+    os.replace(temp_path, compiled_path)
+
+def load_pattern_set(pattern_file_path=PATTERN_FILE_PATH) -> SyntaxPatternSet:
+    """Loads the compiled pattern set if it is up to date, or compiles the pattern file.
+
+    Args:
+        pattern_file_path (str, optional): the pattern TSV file. Defaults to PATTERN_FILE_PATH.
+
+    Returns:
+        SyntaxPatternSet: the valid patterns
+    """
+    file_stat = os.stat(pattern_file_path)
+    try:
+        with np.load(get_compiled_pattern_path(pattern_file_path)) as compiled_data:
+            if compiled_data['file_stat'].tolist() == [file_stat.st_size, file_stat.st_mtime_ns]:
+                return SyntaxPatternSet([compiled_data[field].tolist() for field in PATTERN_FIELDS], compiled_data['pattern_codes'])
+    except (OSError, ValueError, KeyError):
+        pass
+    return SyntaxPatternSet.from_pattern_data(get_valid_pattern_data(pattern_file_path))
+
+# loaded once per process by get_pattern_set
+_pattern_set = None
+
+def get_pattern_set() -> SyntaxPatternSet:
+    global _pattern_set
+    if _pattern_set is None:
+        _pattern_set = load_pattern_set()
+    return _pattern_set
+
+if __name__ == '__main__':
+    pattern_set = SyntaxPatternSet.from_pattern_data(get_valid_pattern_data())
+    save_pattern_set(pattern_set)
+    print(f'Saved {len(pattern_set)} patterns to {get_compiled_pattern_path()}')
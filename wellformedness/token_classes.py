@@ -0,0 +1,129 @@
+"""What kind of token a FORM (and UPOS) is: clitic, punctuation, number,
+or a form with non-Arabic characters.
+
+The form_pos, clitic and pnx checks all ask these questions about every
+token, and corpora repeat the same forms over and over, so each distinct
+form, and each distinct (FORM, UPOS) pair, is classified once per process
+by get_form_class and get_token_class, and looked up afterwards.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+import re
+
+from camel_tools.utils.charsets import AR_CHARSET
+
+from .data_structures import CatibTag
+
+# distinct forms (or FORM/UPOS pairs) kept; more than any corpus has in practice
+TOKEN_CLASS_CACHE_SIZE = 1 << 20
+ARABIC_RE = re.compile(f'^[{re.escape(u"".join(AR_CHARSET))}]+$')
+# ending punctuation that may appear in the middle of a sentence
+MID_PNX_PATTERN = re.compile('|'.join(['\\.', '\\?', '\\!', '\\؟']))
+NUMBER_POS_TAGS = [CatibTag.NOM.name, CatibTag.PROP.name]
+
+def get_plus_toks_regex():
+    return re.compile(r'^\++$')
+
+def remove_elided_part(tok):
+    """ given a token that ends with (*), remove it.
+    """
+    return tok[:-3] if tok.endswith('(*)') else tok
+
+def is_clitic(tok, plus_toks=get_plus_toks_regex()):
+    """Checks to see if a + exists in the given token,
+    but the token is not one or more +'s (i.e. +, +++)
+    
+    Elided clitics are included.
+
+    Args:
+        tok (str): token
+        plus_toks (regex): compiled regex to match against
+
+    Returns:
+        bool: whether or not it's a clitic
+    """
+    tok = remove_elided_part(tok)
+    return (is_enclitic(tok) or is_proclitic(tok)) and not plus_toks.match(tok)
+
+def is_enclitic(tok):
+    return tok.startswith('+')
+
+def is_proclitic(tok):
+    return tok.endswith('+')
+
+# TODO: enums looks better here
+PNX_TYPES = {
+    'ending_pnx': '..,;:?!؟،؛!.', # parent should be backwards
+    'opening_pnx': '«([{', # parent should be forwards
+    'closing_pnx': '»)]}', # parent should be backwards
+    'either_pnx': '—"\'\`' # parent can be either
+}
+
+def get_pnx_type(pnx_token_form: str):
+    for k, v in PNX_TYPES.items():
+        if pnx_token_form in v:
+            return k
+    return 'not_pnx'
+
+def token_contains_invalid_characters(token):
+    token = token.replace('(*)', '')
+    return not ARABIC_RE.match(token)
+
+def is_float(token):
+    try:
+        float(token)
+        return True
+    except ValueError:
+        return False
+
+def is_empty_token(token):
+    return token == ''
+
+def is_number(token, pos_tag):
+    return bool(token.isdigit() or is_float(token)) and pos_tag in NUMBER_POS_TAGS
+
+def is_pnx(pos_tag):
+    return pos_tag == CatibTag.PNX.name
+
+@dataclass(frozen=True)
+class FormClass:
+    is_clitic: bool
+    is_enclitic: bool
+    is_proclitic: bool
+    pnx_type: str
+    is_mid_pnx: bool
+    is_number: bool
+    has_invalid_characters: bool
+
+@dataclass(frozen=True)
+class TokenClass:
+    form_class: FormClass
+    is_empty: bool
+    is_foreign: bool
+    is_pnx: bool
+    is_number: bool
+
+    @property
+    def is_analyzed(self) -> bool:
+        """Whether the FORM/UPOS check needs the morphological analyses of the token, i.e. none of its other checks apply."""
+        return not (self.is_empty or self.form_class.is_clitic or self.is_foreign or self.is_pnx
+                    or self.is_number or self.form_class.has_invalid_characters)
+
+@lru_cache(maxsize=TOKEN_CLASS_CACHE_SIZE)
+def get_form_class(form: str) -> FormClass:
+    return FormClass(is_clitic=is_clitic(form),
+                     is_enclitic=is_enclitic(form),
+                     is_proclitic=is_proclitic(form),
+                     pnx_type=get_pnx_type(form),
+                     is_mid_pnx=bool(MID_PNX_PATTERN.search(form)),
+                     is_number=bool(form.isdigit() or is_float(form)),
+                     has_invalid_characters=token_contains_invalid_characters(form))
+
+@lru_cache(maxsize=TOKEN_CLASS_CACHE_SIZE)
+def get_token_class(form: str, pos_tag: str) -> TokenClass:
+    form_class = get_form_class(form)
+    return TokenClass(form_class=form_class,
+                      is_empty=is_empty_token(form),
+                      is_foreign=pos_tag == CatibTag.FOREIGN.name,
+                      is_pnx=is_pnx(pos_tag),
+                      is_number=form_class.is_number and pos_tag in NUMBER_POS_TAGS)
@@ -2,142 +2,206 @@
 to help with annotation.
 
 Usage:
-    text_to_conll_cli (-i <input> | --input=<input>)
+    text_to_conll_cli (-i <input> | --input=<input> | --manifest=<manifest>)
+        [-r | --recursive] [--include=<glob>]... [--exclude=<glob>]...
         (-o <output> | --output=<output>)
         [-b <morphology_db_type> | --morphology_db_type=<morphology_db_type>]
+        [--analyze] [--analysis_cache=<analysis_cache>]
+        [--incremental] [--error_cache=<error_cache>]
+        [--checks=<checks>] [--skip_checks=<skip_checks>] [--report_details]
+        [--stream | --columnar | --cache]
+        [-j <jobs> | --jobs=<jobs>]
+        [--shards=<shards>]
     text_to_conll_cli (-h | --help)
 
 Options:
     -i <input> --input=<input>
         A CoNLL-U/X file or a directory containing CoNLL-U/X files
+    --manifest=<manifest>
+        A file listing the CoNLL-U/X files to process, one path per line
+        (relative paths are relative to the manifest's directory); used instead of --input
+    -r --recursive
+        Also process the CoNLL-U/X files in subdirectories of the input directory
+    --include=<glob>
+        Only process files whose name or relative path matches this pattern (can be repeated)
+    --exclude=<glob>
+        Skip files and subdirectories whose name or relative path matches this pattern (can be repeated)
     -o <output> --output=<output>
         The directory to fixed CoNLL files
     -b <morphology_db_type> --morphology_db_type=<morphology_db_type>
         The morphology database to use; will use camel_tools built-in by default [default: r13]
+    --analyze
+        Also check FORM/UPOS pairs against the analyses of the morphology database. Analyses are
+        kept in a persistent cache, so each unique form is only analyzed once across runs
+    --analysis_cache=<analysis_cache>
+        Directory of the analysis cache used by --analyze (default: ~/.cache/camel_conll/analyses)
+    --incremental
+        Keep the errors of every sentence in a persistent cache, keyed by its tokens, and only check
+        sentences that are new or changed since the last run (or repeated within the run)
+    --error_cache=<error_cache>
+        Database of the sentence errors used by --incremental (default: ~/.cache/camel_conll/sentence_errors.sqlite)
+    --checks=<checks>
+        Comma-separated names of the checks to run (default: all of them): element, clitic, form_pos,
+        pnx, pattern, deprel, projectivity, root, mid_pnx, conllx
+    --skip_checks=<skip_checks>
+        Comma-separated names of checks not to run
+    --report_details
+        Add the details some checks give about their errors to the reports, as extra columns:
+        the non-projective (head-dependent) arcs of FLAG_NONPROJECTIVE, and the tokens attached
+        to the root, in a cycle, or otherwise disconnected from the root of FLAG_ROOT_ATT
+    --stream
+        Check one sentence at a time instead of loading whole files into memory
+    --columnar
+        Load each file into an array-backed corpus and run the checks that support it
+        on all its sentences at once
+    --cache
+        Same as --columnar, but keep the parsed corpus in a <file name>.cache directory next to
+        each file, so that unchanged files are not parsed again on the next run
+    -j <jobs> --jobs=<jobs>
+        Number of files to process in parallel; 0 uses one process per CPU core [default: 1]
+    --shards=<shards>
+        Split each file at sentence boundaries into this many parts, processed as separate jobs
+        (use with --jobs for single large files; parts are always read one sentence at a time) [default: 1]
     -h --help
         Show this screen.
 """
 import pathlib
+import sqlite3
 from typing import List
-import pandas as pd
 from docopt import docopt
 
+from utils.analysis_cache import FormAnalysisCache, set_up_analysis_cache
 from utils.analyzer import set_up_analyzer
-from conllx_df.conllx_df import ConllxDf
 
-from utils.dir_utils import get_conll_files, remove_file_name_extension
+from utils.conll_io import get_conll_sentences
+from utils.corpus_cache import load_conll_corpus
+from utils.conll_shards import FileShard, get_file_shards, get_shard_count, group_shard_results
+from utils.dir_utils import get_input_files, get_mirrored_input_dir, get_relative_output_dir
+from utils.parallel import exit_if_failed, get_jobs, report_error, run_file_jobs
+from utils.sentence_error_cache import DEFAULT_SENTENCE_ERROR_CACHE_PATH, SentenceErrorCache
 from wellformedness.get_conllu_wellformedness_stats import save_stats
-from wellformedness.clitic_check import clitic_checker
-from wellformedness.common_functions import add_token_level_details, add_text_details
-from wellformedness.conllx_check import conllx_checker
-from wellformedness.element_check import element_checker
-from wellformedness.form_pos_check import form_pos_checker
-from wellformedness.pattern_check import pattern_checker
-from wellformedness.mid_pnx_check import mid_pnx_checker
-from wellformedness.pnx_position_check import pnx_checker
-from wellformedness.projectivity_check import projective_checker
-from wellformedness.root_check import root_checker
-from wellformedness.deprel_check import deprel_checker
+from wellformedness.sentence_errors import (CheckerSet, get_all_errors, get_checker_names, get_checker_stats_df, get_corpus_all_errors,
+                                            get_error_cache_config, merge_checker_stats, save_file_errors)
 
 arguments = docopt(__doc__)
 
-def get_sentence_errors(conllx_df):
-    projectivity_errors = projective_checker(conllx_df)
-    root_errors = root_checker(conllx_df)
-    period_errors = mid_pnx_checker(conllx_df)
-    conllx_errors = conllx_checker(conllx_df)
-    
-    return projectivity_errors + root_errors + period_errors + conllx_errors
-
-def get_token_errors(conllx_df, analyzer):
-    element_errors = element_checker(conllx_df)
-    clitic_errors = clitic_checker(conllx_df)
-    form_pos_errors = form_pos_checker(conllx_df, analyzer)
-    pnx_errors = pnx_checker(conllx_df)
-    pattern_errors = pattern_checker(conllx_df)
-    children_deprel_errors = deprel_checker(conllx_df)
-    
-    return element_errors + clitic_errors + form_pos_errors + pnx_errors + pattern_errors + children_deprel_errors
-
-def get_all_errors(conllx, analyzer, conllx_file_name) -> List[dict]:
+# set up once per process by init_checker
+analyzer = None
+error_cache = None
+checkers = None
+
+def init_checker(morphology_db_type: str, analyze: bool, analysis_cache_dir: str, incremental: bool, error_cache_path: str,
+                 checker_names: List[str], report_details: bool = False):
+    global analyzer, error_cache, checkers
+    checkers = CheckerSet(checker_names, report_details)
+    if analyze:
+        analyzer = set_up_analysis_cache(morphology_db_type, analysis_cache_dir)
+    else:
+        analyzer = set_up_analyzer(morphology_db_type)
+    if incremental:
+        error_cache = SentenceErrorCache(error_cache_path or DEFAULT_SENTENCE_ERROR_CACHE_PATH,
+                                         get_error_cache_config(morphology_db_type, analyze, checker_names, report_details))
+
+def save_caches():
+    """Adds the forms analyzed and the sentences checked by this process to the
+    persistent caches, for the other workers and later runs.
+    """
+    if isinstance(analyzer, FormAnalysisCache):
+        try:
+            analyzer.save()
+        except OSError as e:
+            print(f'Could not write analysis cache {analyzer.cache_path}: {e}')
+    if error_cache is not None:
+        try:
+            error_cache.save()
+        except (OSError, sqlite3.Error) as e:
+            print(f'Could not write sentence error cache {error_cache.cache_path}: {e}')
+
+def check_file(shard: FileShard) -> dict:
+    """Checks a file, or a shard of it.
+
+    Args:
+        shard (FileShard): the file or shard to check
+
+    Returns:
+        dict: errors and counts, as returned by get_all_errors
+    """
+    full_path = pathlib.Path(shard.file_path)
+    if shard.shard_id == 0:
+        print(f'Processing file {full_path.name}')
+    checkers.reset_stats()
+    if not shard.is_whole_file():
+        errors_and_stats = get_all_errors(shard.read_sentences(), analyzer, error_cache=error_cache, checkers=checkers)
+    elif arguments['--columnar'] or arguments['--cache']:
+        errors_and_stats = get_corpus_all_errors(load_conll_corpus(full_path, arguments['--cache']), analyzer, error_cache, checkers)
+    else:
+        errors_and_stats = get_all_errors(get_conll_sentences(full_path, arguments['--stream']), analyzer,
+                                          error_cache=error_cache, checkers=checkers)
+    errors_and_stats["checker_stats"] = checkers.get_stats()
+    save_caches()
+    return errors_and_stats
+
+def merge_shard_errors(shard_errors: List[dict]) -> dict:
+    """Merges the errors and counts of the shards of a file, in order.
+
+    Sentence numbers of each shard start from 1, so they are offset by the
+    number of sentences in the shards before it.
+    """
     all_errors = []
-    for idx in range(conllx.get_sentence_count()):
-        conllx_df = conllx.get_df_by_id(idx)
-        conllx_df.reset_index(drop=True, inplace=True)
-        
-        current_sentence_errors = []
-        # append token errors
-        token_errors = get_token_errors(conllx_df, analyzer)
-        # print(sentence.text)
-        current_sentence_errors += add_token_level_details(conllx_df, token_errors)
-        # append sentence errors
-        current_sentence_errors += get_sentence_errors(conllx_df)
-        
-        # text = conllx.get_comments_by_id(idx)[0] # the first comment is usually the text line
-        text_line = conllx.get_text_line_by_id(idx)
-
-        all_errors += [add_text_details(one_err, text_line, idx+1) for one_err in current_sentence_errors]
-    return all_errors
-
-def update_df_columns(all_errors, file_name):
-    df = pd.DataFrame(all_errors)    
-    
-    # columns may be missing if either no token errors were encountered or sentence errors
-    cols = ["flagged_issue", "sentence_number", "token_id", "form", "pos_tag", "label", "parent_id", "parent_form" ,"parent_pos_tag", "direction", "text"]
-    df = df.reindex(df.columns.union(cols, sort=False), axis=1, fill_value=0)
-    
-    df = df[["flagged_issue", "sentence_number", "token_id", "form", "pos_tag", "label", "parent_id", "parent_form" ,"parent_pos_tag", "direction", "text"]]
-    df['file_name'] = file_name
-    return df
-
-# TODO, generate correct number of words using a proper token check function
-def get_conllx_counts(conllx) -> dict:
-    sentence_count = conllx.get_sentence_count()
-    token_count = conllx.df.shape[0]
-    word_count = conllx.df[~conllx.df['FORM'].str.contains('\+')].shape[0]
-    
+    sentence_texts = {}
+    conllx_counts = {"sentence_count": 0, "token_count": 0, "word_count": 0}
+    for errors_and_stats in shard_errors:
+        for error in errors_and_stats["conllx_errors"]:
+            error.sentence_number += conllx_counts["sentence_count"]
+        all_errors += errors_and_stats["conllx_errors"]
+        sentence_texts.update((sentence_number + conllx_counts["sentence_count"], text)
+                              for sentence_number, text in errors_and_stats["sentence_texts"].items())
+        for count_name, count in errors_and_stats["conllx_counts"].items():
+            conllx_counts[count_name] += count
     return {
-        "sentence_count": sentence_count,
-        "token_count": token_count, 
-        "word_count": word_count
-    }
-
+        "conllx_errors": all_errors,
+        "sentence_texts": sentence_texts,
+        "conllx_counts": conllx_counts,
+        "checker_stats": merge_checker_stats(errors_and_stats["checker_stats"] for errors_and_stats in shard_errors)
+        }
 
 def main():
     output_path = arguments['--output']
     morphology_db_type = arguments['--morphology_db_type']
 
-
-    analyzer = set_up_analyzer(morphology_db_type)
-
-    files = get_conll_files(arguments['--input'])
+    files = get_input_files(arguments, unique_output_names=True)
+    checker_names = get_checker_names(arguments['--checks'], arguments['--skip_checks'])
 
     stats_dict_list = []
+    checker_stats_list = []
     # get errors then save errors per conllx file
     df_list = []
-    for conll_file in files:
-        full_path = pathlib.Path(conll_file)
-        file_name = full_path.name
-        print(f'Processing file {file_name}')
-        conllx = ConllxDf(file_path=full_path)
-        
-
-        errors_and_stats = {
-            "conllx_errors": get_all_errors(conllx, analyzer, file_name),
-            "conllx_counts": get_conllx_counts(conllx)
-            }
-        
-        stats_dict_list.append({'file_name': remove_file_name_extension(file_name), 
-                    'sentence_count': errors_and_stats["conllx_counts"]["sentence_count"],
-                    'tok_count': errors_and_stats["conllx_counts"]["token_count"],
-                    'word_count': errors_and_stats["conllx_counts"]["word_count"]})
-
-        df = update_df_columns(errors_and_stats["conllx_errors"], remove_file_name_extension(file_name))
+    failed_files = 0
+    shards = get_file_shards(files, get_shard_count(arguments))
+    file_results = run_file_jobs(check_file, shards, get_jobs(arguments),
+                                 initializer=init_checker,
+                                 initargs=(morphology_db_type, arguments['--analyze'], arguments['--analysis_cache'],
+                                           arguments['--incremental'], arguments['--error_cache'], checker_names,
+                                           arguments['--report_details']))
+    for conll_file, shard_results, failed_shards in group_shard_results(file_results):
+        if failed_shards:
+            for file_result in failed_shards:
+                report_error(file_result)
+            failed_files += 1
+            continue
+        errors_and_stats = merge_shard_errors(shard_results)
+        # with --recursive, in the same subdirectory of the output directory as the file
+        df, stats_dict = save_file_errors(conll_file, errors_and_stats, output_path,
+                                          get_relative_output_dir(conll_file, get_mirrored_input_dir(arguments)))
         df_list.append(df)
-        # will save errors per file in separate tsv files.
-        df.to_csv(f"{output_path}/{remove_file_name_extension(file_name)}.tsv", sep='\t', index=False)
+        stats_dict_list.append(stats_dict)
+        checker_stats_list.append(errors_and_stats["checker_stats"])
     
-    save_stats(pathlib.Path(output_path), df_list, stats_dict_list)
+    # there are no stats to save if every file failed
+    if df_list:
+        save_stats(pathlib.Path(output_path), df_list, stats_dict_list,
+                   get_checker_stats_df(merge_checker_stats(checker_stats_list)))
+    exit_if_failed(failed_files)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file